@@ -0,0 +1,475 @@
+# aggregates.py — pre-aggregated cube the dashboard tabs read instead of raw rows
+import os
+from dataclasses import dataclass
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+
+EXPECTED = {"crossover","link_click","signup","improvement"}
+DIMENSIONS = ["event_type", "browser", "program_destination"]
+# Columns of the per-day prefix sums: one per expected event type, then all rows and rows with a traffic_source.
+EVENT_TYPES = ["crossover", "link_click", "signup", "improvement"]
+PREFIX_COLUMNS = EVENT_TYPES + ["rows", "traffic"]
+
+# "on" also builds HyperLogLog sketches at load time so the page can offer approximate unique
+# counts, one per (day, event_type, browser, program_destination) group.
+SKETCHES = os.environ.get("DASHBOARD_SKETCHES", "off").strip().lower() in ("1", "on", "true", "yes")
+HLL_PRECISION = int(os.environ.get("DASHBOARD_HLL_PRECISION", "11"))
+SKETCH_KEYS = ["event_date", *DIMENSIONS]
+EVENT_KEYS = ["event_date", "event_type", "browser"]
+# Groups with more than 2**precision / DENSE_DIVISOR registers set are stored densely (3 bytes per
+# sparse pair against 1 per dense register).
+DENSE_DIVISOR = 4
+# user_ids first seen in appended rows are folded into the base ids once they are this fraction of them.
+ADDED_IDS_DIVISOR = 4
+# Trend chart granularity -> pandas period; each period is labelled by its first day (weeks start on Monday).
+GRANULARITIES = {"day": "D", "week": "W", "month": "M"}
+_POW2 = np.left_shift(np.uint64(1), np.arange(64, dtype=np.uint64))
+
+
+# ---------- Date index ----------
+@dataclass(frozen=True)
+class DateIndex:
+    """searchsorted bounds over a frame sorted by event_date, overall and per browser.
+
+    ``browser_pos`` maps each browser to its row positions; positions are ascending, so the
+    matching ``browser_dates`` are sorted too and a window is two binary searches.
+    """
+    dates: np.ndarray
+    browser_pos: dict
+    browser_dates: dict
+
+def _as_datetime64(ts) -> np.datetime64:
+    return pd.Timestamp(ts).to_datetime64()
+
+def build_date_index(frame: pd.DataFrame) -> DateIndex:
+    dates = frame["event_date"].to_numpy()
+    browser_pos = dict(frame.groupby("browser", observed=True).indices)
+    return DateIndex(dates=dates, browser_pos=browser_pos,
+                     browser_dates={b: dates[pos] for b, pos in browser_pos.items()})
+
+def window_positions(index: DateIndex, start, end, browser: str = "All") -> Union[slice, np.ndarray]:
+    """Row positions with start <= event_date <= end (a slice when no browser is selected)"""
+    s, e = _as_datetime64(start), _as_datetime64(end)
+    if browser == "All":
+        return slice(np.searchsorted(index.dates, s, "left"), np.searchsorted(index.dates, e, "right"))
+    if browser not in index.browser_pos:
+        return np.empty(0, dtype=np.intp)
+    dates = index.browser_dates[browser]
+    return index.browser_pos[browser][np.searchsorted(dates, s, "left"):np.searchsorted(dates, e, "right")]
+
+
+# ---------- Distinct-count sketches ----------
+@dataclass(frozen=True)
+class Sketches:
+    """HyperLogLog registers of user_id per (event_date, event_type, browser, program_destination).
+
+    Most groups hold a handful of users, so a group keeps its non-zero registers as explicit
+    (bucket, rank) pairs, ``buckets``/``ranks`` from ``offsets[g]`` to ``offsets[g + 1]``; only
+    groups with more than ``2**precision // DENSE_DIVISOR`` of them get a full row of
+    ``dense`` (``dense_row[g]``, else -1). Sketches thus stay smaller than the exact users table.
+
+    ``keys`` is sorted by event_date and ``index`` slices it like a segment's index does its
+    users, so a window's unique count merges only the registers of its groups.
+    """
+    keys: pd.DataFrame
+    offsets: np.ndarray
+    buckets: np.ndarray
+    ranks: np.ndarray
+    dense_row: np.ndarray
+    dense: np.ndarray
+    index: DateIndex
+    precision: int
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.offsets, self.buckets, self.ranks, self.dense_row, self.dense)
+        return sum(a.nbytes for a in arrays) + int(self.keys.memory_usage(deep=True).sum())
+
+def hll_error(precision: int = HLL_PRECISION) -> float:
+    """Relative standard error of a HyperLogLog estimate with 2**precision registers"""
+    return 1.04 / np.sqrt(1 << precision)
+
+def _user_hashes(user_id: pd.Series) -> np.ndarray:
+    if isinstance(user_id.dtype, pd.CategoricalDtype):
+        # Hash each distinct id once; rows just index into it.
+        return pd.util.hash_array(user_id.cat.categories.to_numpy(dtype=object))[user_id.cat.codes.to_numpy()]
+    return pd.util.hash_array(user_id.astype("string").to_numpy(dtype=object))
+
+def _from_pairs(keys: pd.DataFrame, gid: np.ndarray, bucket: np.ndarray, rank: np.ndarray,
+                precision: int) -> Sketches:
+    """Sketches for ``keys`` from (group, bucket, rank) triples, keeping the highest rank per register"""
+    m = 1 << precision
+    # Sorted by register, then rank: the last triple of each register holds its maximum.
+    reg = gid.astype(np.int64) * m + bucket
+    order = np.lexsort((rank, reg))
+    reg, rank = reg[order], rank[order]
+    last = np.r_[reg[1:] != reg[:-1], True] if len(reg) else np.zeros(0, bool)
+    reg, rank = reg[last], rank[last]
+    gid, bucket = reg // m, (reg % m).astype(np.uint16)
+    counts = np.bincount(gid, minlength=len(keys))
+    is_dense = counts > m // DENSE_DIVISOR
+    dense_row = np.full(len(keys), -1, dtype=np.int32)
+    dense_row[is_dense] = np.arange(is_dense.sum(), dtype=np.int32)
+    dense = np.zeros((int(is_dense.sum()), m), dtype=np.uint8)
+    to_dense = is_dense[gid]
+    dense[dense_row[gid[to_dense]], bucket[to_dense]] = rank[to_dense]
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum(np.where(is_dense, 0, counts), out=offsets[1:])
+    return Sketches(keys=keys, offsets=offsets, buckets=bucket[~to_dense], ranks=rank[~to_dense],
+                    dense_row=dense_row, dense=dense, index=build_date_index(keys), precision=precision)
+
+def _to_pairs(sk: Sketches):
+    """(group, bucket, rank) triples of every non-zero register, sparse and dense groups alike"""
+    sparse_gid = np.repeat(np.arange(len(sk.keys)), np.diff(sk.offsets))
+    row, bucket = np.nonzero(sk.dense)
+    groups = np.flatnonzero(sk.dense_row >= 0)
+    return (np.concatenate([sparse_gid, groups[row]]), np.concatenate([sk.buckets, bucket.astype(np.uint16)]),
+            np.concatenate([sk.ranks, sk.dense[row, bucket]]))
+
+def build_sketches(users: pd.DataFrame, precision: int = HLL_PRECISION) -> Sketches:
+    users = users.loc[users["user_id"].notna()]
+    grouped = users.groupby(SKETCH_KEYS, dropna=False, observed=True, sort=True)
+    gid = grouped.ngroup().to_numpy()
+    h = _user_hashes(users["user_id"])
+    # Top ``precision`` bits pick the register; the rank is the position of the first 1 bit after them.
+    bucket = (h >> np.uint64(64 - precision)).astype(np.int64)
+    rest = h & np.uint64((1 << (64 - precision)) - 1)
+    rank = ((64 - precision) + 1 - np.searchsorted(_POW2, rest, "right")).astype(np.uint8)
+    keys = grouped.size().reset_index()[SKETCH_KEYS]
+    return _from_pairs(keys, gid, bucket, rank, precision)
+
+def merge_sketches(a: Sketches, b: Sketches) -> Sketches:
+    """Union of two sketch sets; registers of groups present in both are max-merged"""
+    if not len(b.keys):
+        return a
+    both = data_loader.concat_encoded([a.keys, b.keys])
+    grouped = both.groupby(SKETCH_KEYS, dropna=False, observed=True, sort=True)
+    new_gid = grouped.ngroup().to_numpy()
+    (ga, ba, ra), (gb, bb, rb) = _to_pairs(a), _to_pairs(b)
+    gid = np.concatenate([new_gid[ga], new_gid[len(a.keys) + gb]])
+    keys = grouped.size().reset_index()[SKETCH_KEYS]
+    return _from_pairs(keys, gid, np.concatenate([ba, bb]).astype(np.int64), np.concatenate([ra, rb]), a.precision)
+
+def merge_registers(sk: Sketches, groups: np.ndarray, out_id: np.ndarray, n_out: int) -> np.ndarray:
+    """Registers of ``n_out`` unions: group ``groups[i]`` is merged into row ``out_id[i]``"""
+    out = np.zeros((n_out, 1 << sk.precision), dtype=np.uint8)
+    rows = sk.dense_row[groups]
+    d = rows >= 0
+    if d.any():
+        np.maximum.at(out, out_id[d], sk.dense[rows[d]])
+    starts, ends = sk.offsets[groups[~d]], sk.offsets[groups[~d] + 1]
+    lengths = ends - starts
+    if lengths.sum():
+        # Positions of every selected group's pairs, without a Python loop over groups.
+        pos = np.repeat(starts - np.r_[0, np.cumsum(lengths)[:-1]], lengths) + np.arange(lengths.sum())
+        target = np.repeat(out_id[~d].astype(np.int64), lengths) * out.shape[1] + sk.buckets[pos]
+        np.maximum.at(out.reshape(-1), target, sk.ranks[pos])
+    return out
+
+def hll_estimate(registers: np.ndarray) -> np.ndarray:
+    """Cardinality estimate per row of registers, with linear counting for small ranges"""
+    m = registers.shape[-1]
+    raw = (0.7213 / (1 + 1.079 / m)) * m * m / np.ldexp(1.0, -registers.astype(np.int64)).sum(axis=-1)
+    zeros = (registers == 0).sum(axis=-1)
+    with np.errstate(divide="ignore"):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+# ---------- Interned user ids ----------
+@dataclass(frozen=True)
+class UserIds:
+    """user_id values as the integers every users segment stores: id ``i`` is ``base[i]``, then ``added[i - len(base)]``.
+
+    ``base`` starts as the loaded frame's user_id categories. pandas keeps the hash table for
+    looking values up on the Index, so it is built once, and an append only hashes its own ids;
+    ids first seen in appended rows go to ``added``, folded into ``base`` once it is a
+    1/ADDED_IDS_DIVISOR of it.
+    """
+    base: pd.Index
+    added: pd.Index
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.added)
+
+    def values(self) -> pd.Index:
+        """Every interned value, in id order"""
+        return self.base.append(self.added) if len(self.added) else self.base
+
+def _id_array(codes: np.ndarray) -> pd.arrays.IntegerArray:
+    """Int32 ids with -1 (no user_id) as NA, so nunique skips them as it skips a missing category"""
+    codes = np.asarray(codes, dtype=np.int32)
+    return pd.arrays.IntegerArray(codes, codes < 0)
+
+def intern_user_ids(ids: UserIds, values: pd.Index) -> tuple:
+    """(``ids`` with the unseen ``values`` added, the id of each value); ``values`` must be distinct"""
+    found = ids.base.get_indexer(values)
+    miss = found < 0
+    if miss.any() and len(ids.added):
+        again = ids.added.get_indexer(values[miss])
+        found[np.flatnonzero(miss)[again >= 0]] = again[again >= 0] + len(ids.base)
+        miss = found < 0
+    if not miss.any():
+        return ids, found
+    found[miss] = len(ids) + np.arange(miss.sum())
+    added = ids.added.append(values[miss])
+    if len(added) * ADDED_IDS_DIVISOR < len(ids.base):
+        return UserIds(ids.base, added), found
+    return UserIds(ids.base.append(added), ids.base[:0]), found
+
+
+# ---------- Cube ----------
+@dataclass(frozen=True)
+class Segment:
+    """A date-sorted part of the users table, its date index and (DASHBOARD_SKETCHES) its sketches"""
+    users: pd.DataFrame
+    index: DateIndex
+    sketches: Optional[Sketches] = None
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+def _segment(users: pd.DataFrame, sketches: Optional[Sketches] = None) -> Segment:
+    return Segment(users=users, index=build_date_index(users), sketches=sketches)
+
+def _merge_segments(a: Segment, b: Segment) -> Segment:
+    users = (data_loader.concat_encoded([a.users, b.users]).drop_duplicates()
+                        .sort_values("event_date", kind="stable", ignore_index=True))
+    sketches = None if a.sketches is None or b.sketches is None else merge_sketches(a.sketches, b.sketches)
+    return _segment(users, sketches)
+
+@dataclass(frozen=True)
+class Cube:
+    """Per-day aggregates built once per data load and extended by each append.
+
+    ``events`` has one row per (event_date, event_type, browser) with the row count and the
+    number of rows with a traffic_source, which is all the KPI tiles need.
+
+    ``segments`` hold the users table: the distinct (event_date, event_type, browser,
+    program_destination, user_id) tuples, i.e. the per-day distinct-user sets, with user_id
+    interned as ``user_ids``. Rolling up to months or date ranges is a nunique over the
+    window's tuples, so distinct counts stay exact instead of summing daily counts. Each
+    segment is sorted by event_date and its ``index`` slices it without building masks. The
+    loaded rows make one segment and every append adds one, folded together by merge_tiers.
+
+    ``prefix`` maps "All" and each browser to cumulative per-day counts over ``days`` (one row
+    more than ``days``, columns PREFIX_COLUMNS), so any window's KPI counts are one subtraction.
+    """
+    events: pd.DataFrame
+    segments: tuple
+    user_ids: UserIds
+    days: np.ndarray
+    prefix: dict
+
+    @property
+    def precision(self) -> Optional[int]:
+        """HyperLogLog precision of the segments' sketches (DASHBOARD_SKETCHES), or None without them"""
+        sk = self.segments[0].sketches
+        return None if sk is None else sk.precision
+
+
+def _tables(data: pd.DataFrame) -> tuple:
+    """(events, users) of rows, the users table still holding user_id as a categorical"""
+    if data.empty:
+        data = data_loader.empty_frame()
+    dated = data.loc[data["event_date"].notna()]
+    events = (dated.assign(traffic=dated["traffic_source"].notna())
+                   .groupby(EVENT_KEYS, dropna=False, observed=True)
+                   .agg(rows=("traffic", "size"), traffic=("traffic", "sum"))
+                   .reset_index())
+    users = (dated[["event_date", *DIMENSIONS, "user_id"]].drop_duplicates()
+                  .sort_values("event_date", kind="stable").reset_index(drop=True))
+    if not isinstance(users["user_id"].dtype, pd.CategoricalDtype):
+        users["user_id"] = data_loader.encode_categorical(users["user_id"].astype("string"))
+    return events, users
+
+def build_cube(data: pd.DataFrame) -> Cube:
+    # Empty data gives an empty cube, not None: appended rows merge into it like into any other.
+    return assemble_cube(*_tables(data))
+
+def merge_cube(cube: Cube, rows: pd.DataFrame) -> Cube:
+    """Fold newly appended raw rows into an existing cube.
+
+    Only the new rows are grouped: their users become a new segment (merged with the newest
+    ones by merge_tiers), their ids are looked up in ``user_ids``, and the events and prefix
+    sums change from the first day they touch.
+    """
+    if rows is None or rows.empty:
+        return cube
+    events, users = _tables(rows)
+    user_id = users["user_id"]
+    ids, found = intern_user_ids(cube.user_ids, user_id.cat.categories)
+    sketches = None if cube.precision is None else build_sketches(users, cube.precision)
+    users = users.assign(user_id=_id_array(np.append(found, -1)[user_id.cat.codes.to_numpy()]))
+    days, prefix = _merge_prefix(cube.days, cube.prefix, events)
+    segments = data_loader.merge_tiers(cube.segments + (_segment(users, sketches),), _merge_segments)
+    return Cube(events=_merge_events(cube.events, events), segments=segments, user_ids=ids, days=days,
+                prefix=prefix)
+
+def assemble_cube(events: pd.DataFrame, users: pd.DataFrame, sketches: Optional[Sketches] = None) -> Cube:
+    """Cube from its ``events`` and ``users`` tables (user_id categorical); indexes, prefix sums and sketches are derived here"""
+    days = np.unique(events["event_date"].to_numpy())
+    if sketches is None and SKETCHES:
+        sketches = build_sketches(users)
+    categories = users["user_id"].cat.categories
+    users = users.assign(user_id=_id_array(users["user_id"].cat.codes.to_numpy()))
+    return Cube(events=events, segments=(_segment(users, sketches),), user_ids=UserIds(categories, categories[:0]),
+                days=days, prefix=_prefixes(events, days))
+
+def users_table(cube: Cube) -> pd.DataFrame:
+    """The users table in one frame with user_id categorical again, as snapshot.py stores it"""
+    users = data_loader.concat_encoded([s.users for s in cube.segments])
+    if len(cube.segments) > 1:
+        users = users.drop_duplicates().sort_values("event_date", kind="stable", ignore_index=True)
+    codes = users["user_id"].to_numpy(dtype=np.int32, na_value=-1)
+    return users.assign(user_id=pd.Categorical.from_codes(codes, categories=cube.user_ids.values()))
+
+def _merge_events(events: pd.DataFrame, add: pd.DataFrame) -> pd.DataFrame:
+    """``events`` with ``add`` summed in; only the days from add's first one on are regrouped"""
+    if add.empty:
+        return events
+    start = np.searchsorted(events["event_date"].to_numpy(), _as_datetime64(add["event_date"].min()), "left")
+    tail = (data_loader.concat_encoded([events.iloc[start:], add])
+                       .groupby(EVENT_KEYS, dropna=False, observed=True)[["rows", "traffic"]].sum().reset_index())
+    return data_loader.concat_encoded([events.iloc[:start], tail])
+
+def _prefixes(events: pd.DataFrame, days: np.ndarray) -> dict:
+    prefix = {"All": _prefix_sums(events, days)}
+    for b, ev in events.groupby("browser", observed=True):
+        prefix[b] = _prefix_sums(ev, days)
+    return prefix
+
+def _merge_prefix(days: np.ndarray, prefix: dict, add: pd.DataFrame) -> tuple:
+    """(days, prefix) over both day sets, the per-day counts of ``add`` (the new rows' events) added in"""
+    add_days = np.unique(add["event_date"].to_numpy())
+    if not len(add_days):
+        return days, prefix
+    added = _prefixes(add, add_days)
+    out_days = np.union1d(days, add_days)
+    # Cumulative counts through each day of out_days: the old ones carried over, the new ones added.
+    old_at, add_at = np.searchsorted(days, out_days, "right"), np.searchsorted(add_days, out_days, "right")
+    out = {}
+    for b in [*prefix, *(b for b in added if b not in prefix)]:
+        p = np.zeros((len(out_days) + 1, len(PREFIX_COLUMNS)), dtype=np.int64)
+        if b in prefix:
+            p[1:] += prefix[b][old_at]
+        if b in added:
+            p[1:] += added[b][add_at]
+        out[b] = p
+    return out_days, out
+
+def _prefix_sums(events: pd.DataFrame, days: np.ndarray) -> np.ndarray:
+    pos = np.searchsorted(days, events["event_date"].to_numpy())
+    rows = events["rows"].to_numpy(np.int64)
+    per_day = np.zeros((len(days), len(PREFIX_COLUMNS)), dtype=np.int64)
+    for i, t in enumerate(EVENT_TYPES):
+        m = events["event_type"].eq(t).fillna(False).to_numpy(bool)
+        np.add.at(per_day[:, i], pos[m], rows[m])
+    np.add.at(per_day[:, PREFIX_COLUMNS.index("rows")], pos, rows)
+    np.add.at(per_day[:, PREFIX_COLUMNS.index("traffic")], pos, events["traffic"].to_numpy(np.int64))
+    out = np.zeros((len(days) + 1, len(PREFIX_COLUMNS)), dtype=np.int64)
+    np.cumsum(per_day, axis=0, out=out[1:])
+    return out
+
+
+# ---------- Queries ----------
+def _window(cube: Cube, start, end, browser: str = "All", event_type: Optional[str] = None):
+    parts = [s.users.iloc[window_positions(s.index, start, end, browser)] for s in cube.segments]
+    # A user seen on one day in two segments is one tuple twice: harmless to nunique and notna.
+    u = parts[0] if len(parts) == 1 else data_loader.concat_encoded(parts)
+    if event_type:
+        u = u.loc[u["event_type"].eq(event_type.lower())]
+    return u
+
+def date_bounds(cube: Cube):
+    """(min, max) event_date, or (NaT, NaT) when no row has a date"""
+    if not len(cube.days):
+        return pd.NaT, pd.NaT
+    return pd.Timestamp(cube.days[0]), pd.Timestamp(cube.days[-1])
+
+def kpi_counts(cube: Cube, start, end, browser: str = "All") -> dict:
+    """Event counts for the KPI tiles; falls back to row-based estimates without known event types"""
+    if browser not in cube.prefix:
+        c = dict.fromkeys(PREFIX_COLUMNS, 0)
+    else:
+        p = cube.prefix[browser]
+        i = np.searchsorted(cube.days, _as_datetime64(start), "left")
+        j = max(i, np.searchsorted(cube.days, _as_datetime64(end), "right"))
+        c = dict(zip(PREFIX_COLUMNS, (p[j] - p[i]).tolist()))
+    return counts_from_totals(c)
+
+def counts_from_totals(c: dict) -> dict:
+    """KPI counts from window totals keyed by PREFIX_COLUMNS"""
+    if any(c[t] for t in EVENT_TYPES):
+        return {
+            "crossover": c["crossover"],
+            "link_click": c["link_click"],
+            "signup":    c["signup"],
+            "improve":   c["improvement"],
+        }
+    total = c["rows"]
+    clicks = c["traffic"]
+    signups = int(0.05*total)
+    improve = 0
+    return {"crossover": total, "link_click": clicks, "signup": signups, "improve": improve}
+
+def _sketch_window(cube: Cube, start, end, browser: str = "All", event_type: Optional[str] = None):
+    """(keys, [(sketches, group numbers)]) of the sketch groups in the window, keys segment after segment"""
+    keys, picks = [], []
+    for sk in (s.sketches for s in cube.segments):
+        groups = np.arange(len(sk.keys))[window_positions(sk.index, start, end, browser)]
+        k = sk.keys.iloc[groups]
+        if event_type:
+            m = k["event_type"].eq(event_type.lower()).fillna(False).to_numpy(bool)
+            k, groups = k.loc[m], groups[m]
+        keys.append(k)
+        picks.append((sk, groups))
+    return data_loader.concat_encoded(keys), picks
+
+def _approx_unique(keys: pd.DataFrame, picks: list, by: list) -> pd.DataFrame:
+    grouped = keys.groupby(by, observed=True, sort=True)
+    # Rows in a dropped (NA) group get NaN from ngroup().
+    out_ids = np.split(grouped.ngroup().fillna(-1).to_numpy(np.intp), np.cumsum([len(g) for _, g in picks])[:-1])
+    merged = np.zeros((grouped.ngroups, 1 << picks[0][0].precision), dtype=np.uint8)
+    for (sk, groups), out_id in zip(picks, out_ids):
+        keep = out_id >= 0
+        np.maximum(merged, merge_registers(sk, groups[keep], out_id[keep], grouped.ngroups), out=merged)
+    return grouped.size().reset_index()[by].assign(unique_ids=np.rint(hll_estimate(merged)).astype(np.int64))
+
+def period_start(dates: pd.Series, freq: str = "month") -> pd.Series:
+    # Nanoseconds whatever unit pandas picks (pandas 3 returns microseconds), as DuckDB's periods are cast.
+    return dates.dt.to_period(GRANULARITIES[freq]).dt.to_timestamp().astype("datetime64[ns]")
+
+def monthly_unique(cube: Cube, start, end, browser: str = "All", event_type: Optional[str] = None,
+                   by: Optional[str] = None, approximate: bool = False, freq: str = "month") -> pd.DataFrame:
+    """Unique user_id counts per month, or per day/week with ``freq`` (and per ``by`` dimension when given)"""
+    keys = ["period"] + ([by] if by else [])
+    if approximate:
+        k, picks = _sketch_window(cube, start, end, browser, event_type)
+        out = _approx_unique(k.assign(period=period_start(k["event_date"], freq)), picks, keys)
+    else:
+        u = _window(cube, start, end, browser, event_type)
+        out = (u.assign(period=period_start(u["event_date"], freq))
+                .groupby(keys, observed=True)["user_id"].nunique().reset_index(name="unique_ids"))
+    if by:
+        out[by] = out[by].astype("string")
+    return out
+
+def unique_by(cube: Cube, by: str, start, end, browser: str = "All",
+              event_type: Optional[str] = None, approximate: bool = False) -> pd.DataFrame:
+    """Unique user_id counts per value of ``by`` over the whole window, largest first"""
+    if approximate:
+        out = _approx_unique(*_sketch_window(cube, start, end, browser, event_type), [by])
+    else:
+        u = _window(cube, start, end, browser, event_type)
+        out = u.groupby(by, observed=True)["user_id"].nunique().reset_index(name="unique_ids")
+    out[by] = out[by].astype("string")
+    return out.sort_values("unique_ids", ascending=False)
+
+def has_values(cube: Cube, column: str, start, end, browser: str = "All",
+               event_type: Optional[str] = None) -> bool:
+    return bool(_window(cube, start, end, browser, event_type)[column].notna().any())
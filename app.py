@@ -0,0 +1,55 @@
+# app.py — server entry point: the dashboard page plus a startup hook that warms the process
+#
+#   streamlit run app.py --server.port=8000
+#
+# Runs streamlit_csv.py unchanged. When the server process starts, it kicks off the shared
+# background load of the dataset (from the snapshot when present), then imports Plotly and
+# builds every tab for the default filters, so the first visitor gets cached figures instead
+# of a cold start.
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import pandas as pd
+import streamlit as st
+
+import charts
+import metrics
+import query_engine
+
+log = logging.getLogger("dashboard.warmup")
+metrics.setup_logging()
+
+
+def warm_up():
+    """Wait for the shared load and fill the tab cache for the page's default view"""
+    t0 = time.perf_counter()
+    try:
+        load = query_engine.shared_load()
+        if not load.wait():
+            return  # the load logged its error, and the page shows it
+        q = load.engine.view()
+        # An empty dataset has no date bounds to ask for (both engines raise), so stop first.
+        if q.is_empty():
+            return
+        start, end = q.date_bounds()
+        if pd.isna(start) or pd.isna(end):
+            return
+        q.options("browser")
+        for tab in charts.TABS:
+            charts.tab_view(q, tab, start, end)
+        log.info("warmed up in %.2fs (data version %s)", time.perf_counter() - t0, q.version)
+    except Exception:
+        # The page reports load errors to visitors; a failed warm-up only costs the first one time.
+        log.exception("warm-up failed")
+
+@asynccontextmanager
+async def lifespan(_app):
+    # A thread, not an await: the server accepts connections (and health checks) while it runs,
+    # and a visitor arriving early sees the same load's preview instead of starting another.
+    threading.Thread(target=warm_up, name="dashboard-warmup", daemon=True).start()
+    yield
+
+
+app = st.App("streamlit_csv.py", lifespan=lifespan)
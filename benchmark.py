@@ -0,0 +1,236 @@
+# benchmark.py — time and measure each stage of the dashboard pipeline, end to end
+#
+#   python benchmark.py --rows 1000000 --out bench.json          # generate data, then benchmark
+#   python benchmark.py --csv data.csv --baseline bench.json     # compare against an earlier run
+#
+# Every stage reports wall time (best and median of --repeat runs), the growth of the process's
+# peak RSS during its first run (native Arrow/DuckDB buffers included; Linux only) and peak
+# Python-heap allocations (tracemalloc, one extra run) as JSON, so runs from different versions
+# can be diffed.
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Optional
+
+import pandas as pd
+
+import aggregates
+import charts
+import data_loader
+import generate_data
+import metrics
+import query_engine
+import snapshot
+
+SCHEMA = 2
+# Sub-millisecond stages are all noise; a slowdown must also exceed this to count.
+MIN_DELTA_S = 0.001
+
+
+def _reset_peak_rss() -> Optional[int]:
+    """Restart the kernel's RSS high-water mark (VmHWM) and return the current RSS, or None where that is not possible"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return None
+    return metrics.process_rss()
+
+def _peak_rss() -> int:
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmHWM:"))
+
+def measure(name: str, fn, repeat: int = 1, memory: bool = True, **info) -> tuple:
+    """Run ``fn`` ``repeat`` times for wall time and once more under tracemalloc; returns (record, result)"""
+    times, result, peak_rss = [], None, None
+    start_rss = _reset_peak_rss() if memory else None
+    for i in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t)
+        if i == 0 and start_rss is not None:
+            # tracemalloc only sees the Python heap; RSS also counts Arrow, DuckDB and numpy buffers.
+            peak_rss = max(0, _peak_rss() - start_rss)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    record = {"stage": name, "wall_s": min(times), "wall_s_median": statistics.median(times),
+              "runs": repeat, "peak_rss_bytes": peak_rss, "peak_py_heap_bytes": peak, **info}
+    mib = "  ".join(f"{label} {v / 2**20:>8.1f} MiB" for label, v in (("rss", peak_rss), ("py", peak)) if v is not None)
+    print(f"{name:<40} {min(times) * 1000:>10.1f} ms  {mib}", file=sys.stderr)
+    return record, result
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=data_loader.SCRIPT_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def _stage_csv(csv_path: str, workdir: str) -> str:
+    """Link the CSV into ``workdir`` so sidecars and engine files land there, not next to the original"""
+    path = os.path.join(workdir, "data.csv")
+    try:
+        os.symlink(os.path.abspath(csv_path), path)
+    except OSError:
+        shutil.copyfile(csv_path, path)
+    return path
+
+
+def run(csv_path: str, repeat: int = 5, memory: bool = True, engine: str = "pandas", states=None) -> dict:
+    states = data_loader.resolve_ingest(None, states)[1]
+    records = []
+    def stage(name, fn, n=1, **info):
+        record, result = measure(name, fn, n, memory, **info)
+        records.append(record)
+        return result
+
+    with tempfile.TemporaryDirectory(prefix="dashboard-bench-") as workdir:
+        path = _stage_csv(csv_path, workdir)
+
+        # ---------- Ingest, stage by stage (the "full" path) ----------
+        raw = stage("parse_csv", lambda: pd.read_csv(path))
+        raw_rows = len(raw)
+        norm = stage("normalize", lambda: data_loader.normalize(raw.copy()))
+        # Released with None, not del: the stage lambdas still name them.
+        raw = None
+        kept = stage("state_filter", lambda: data_loader.drop_unused_categories(data_loader.filter_states(norm, states)))
+        norm = None
+
+        # ---------- Ingest as the dashboard runs it ----------
+        for parser in ("pandas", "arrow"):
+            stage(f"ingest_chunked[{parser}]", lambda: data_loader.read_csv_chunked(path, states, parser=parser))
+        stage("sort_by_date", lambda: kept.sort_values("event_date", kind="stable", na_position="last", ignore_index=True))
+        def cold():
+            if os.path.exists(data_loader.sidecar_path(path)):
+                os.remove(data_loader.sidecar_path(path))
+            return data_loader.load_dataset(path, states=states)
+        stage("load_dataset_cold", cold)
+        df = stage("load_dataset_sidecar", lambda: data_loader.load_dataset(path, states=states))
+        cube = stage("build_cube", lambda: aggregates.build_cube(df))
+        # Built here whatever DASHBOARD_SKETCHES says, so exact and approximate counts are always compared.
+        users = aggregates.users_table(cube)
+        sketches = stage("build_sketches", lambda: aggregates.build_sketches(users))
+        records[-1].update(sketch_bytes=sketches.nbytes, users_bytes=int(users.memory_usage(deep=True).sum()))
+        sketched = aggregates.assemble_cube(cube.events, users, sketches)
+        stage("snapshot_build", lambda: snapshot.build(path, states=states))
+        stage("snapshot_load", lambda: snapshot.load(path, states=states))
+
+        # ---------- Queries ----------
+        if engine == "duckdb":
+            eng = query_engine.DuckDBEngine(path)
+            q = stage("engine_build", eng.view)
+        else:
+            q = query_engine.PandasView(1, df, cube)
+        start, end = q.date_bounds()
+        browser = next((b for b in q.options("browser") if b != "All"), "All")
+        for b in ("All", browser):
+            if engine == "pandas":
+                stage(f"window_mask[{b}]", lambda: aggregates.window_positions(cube.segments[0].index, start, end, b), repeat)
+            stage(f"kpi_counts[{b}]", lambda: q.kpi_counts(start, end, b), repeat)
+            stage(f"monthly_unique[{b}]", lambda: q.monthly_unique(start, end, b, "crossover"), repeat)
+            stage(f"unique_by[{b}]", lambda: q.unique_by("program_destination", start, end, b, "link_click"), repeat)
+            if engine == "pandas":
+                stage(f"monthly_unique_approx[{b}]",
+                      lambda: aggregates.monthly_unique(sketched, start, end, b, "crossover", approximate=True), repeat)
+                stage(f"unique_by_approx[{b}]", lambda: aggregates.unique_by(
+                    sketched, "program_destination", start, end, b, "link_click", approximate=True), repeat)
+
+        # ---------- Tabs ----------
+        for tab in charts.TABS:
+            d = stage(f"tab_data[{tab}]", lambda: charts.tab_data(q, tab, start, end), repeat)
+            figs = stage(f"figures[{tab}]", lambda: charts.tab_figures(tab, d), repeat)
+            stage(f"figure_json[{tab}]", lambda: [f.to_json() for f in figs], repeat,
+                  json_bytes=sum(charts.figure_bytes(f) for f in figs))
+            charts.tab_view(q, tab, start, end)
+            stage(f"tab_view_cached[{tab}]", lambda: charts.tab_view(q, tab, start, end), repeat)
+            # Daily trends: the densest series, downsampled past charts.MAX_POINTS
+            d = stage(f"tab_data[{tab}|day]", lambda: charts.tab_data(q, tab, start, end, freq="day"), repeat)
+            figs = stage(f"figures[{tab}|day]", lambda: charts.tab_figures(tab, d, "day"), repeat)
+            stage(f"figure_json[{tab}|day]", lambda: [f.to_json() for f in figs], repeat,
+                  json_bytes=sum(charts.figure_bytes(f) for f in figs))
+
+    return {
+        "schema": SCHEMA,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "engine": engine,
+        "csv_bytes": os.path.getsize(csv_path),
+        "csv_rows": raw_rows,
+        "kept_rows": len(df),
+        "states": list(states),
+        "process_peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "stages": records,
+    }
+
+def compare(current: dict, baseline: dict, threshold: float, min_delta: float = MIN_DELTA_S) -> list:
+    """Stages whose best wall time grew by more than ``threshold`` (a ratio) over the baseline"""
+    if baseline.get("engine") != current["engine"]:
+        print(f"note: baseline used the {baseline.get('engine')} engine, this run {current['engine']}", file=sys.stderr)
+    before = {r["stage"]: r for r in baseline.get("stages", [])}
+    slower = []
+    for r in current["stages"]:
+        b = before.get(r["stage"])
+        if (b and b["wall_s"] > 0 and r["wall_s"] - b["wall_s"] > min_delta
+                and r["wall_s"] / b["wall_s"] > threshold):
+            slower.append({"stage": r["stage"], "before_s": b["wall_s"], "after_s": r["wall_s"],
+                           "ratio": r["wall_s"] / b["wall_s"]})
+    return slower
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the dashboard pipeline stage by stage")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--csv", help="benchmark this CSV (default data.csv)")
+    src.add_argument("--rows", type=int, help="generate a synthetic CSV with this many rows first")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=5, help="runs per query/figure stage (ingest stages run once)")
+    ap.add_argument("--engine", choices=["pandas", "duckdb"], default="pandas")
+    ap.add_argument("--no-memory", action="store_true", help="skip the RSS and tracemalloc measurements")
+    ap.add_argument("--out", help="write the JSON report here instead of stdout")
+    ap.add_argument("--baseline", help="earlier JSON report to compare against; exits 1 on regressions")
+    ap.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio that counts as a regression")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="dashboard-data-") as tmp:
+        csv_path = args.csv or data_loader.CSV_PATH
+        if args.rows:
+            csv_path = os.path.join(tmp, "data.csv")
+            generate_data.generate(csv_path, args.rows, seed=args.seed)
+        report = run(csv_path, args.repeat, not args.no_memory, args.engine)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f), args.threshold)
+        for r in report["regressions"]:
+            print(f"REGRESSION {r['stage']}: {r['before_s']:.4f}s -> {r['after_s']:.4f}s ({r['ratio']:.2f}x)",
+                  file=sys.stderr)
+        status = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    sys.exit(status)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+# charts.py — per-tab aggregations and Plotly figures, importable without running the page
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import metrics
+
+# ---------- Brand ----------
+BRAND = {
+    "primary":     "#436DB3",
+    "light_blue":  "#BFD0EE",
+    "danger":      "#F4454E",
+    "bg_soft":     "#F7F3EF",
+    "border":      "#EDEDED",
+    "ink":         "#0B1221",
+    "ok":          "#1A8E3B",
+    "link_blue":   "#0071BC",
+}
+BLUES = ["#436DB3", "#5B84C7", "#87A9DA", "#AFC5E8", "#D3E1F5"]
+CHART_TITLE_SIZE = 18
+PLOT_HEIGHT = 380  # same height for paired charts
+TABS = ["Executive Overview", "Website Crossovers", "Link Clicks"]
+# The event types each tab's charts count; exports of a tab keep the same rows.
+TAB_EVENT_TYPES = dict(zip(TABS, [["crossover", "link_click"], ["crossover"], ["link_click"]]))
+# Finished (aggregations, figures) kept per (dataset version, date range, browser, tab, granularity,
+# distinct mode); 0 disables.
+TAB_CACHE_SIZE = int(os.environ.get("DASHBOARD_TAB_CACHE", "64"))
+# Trend series longer than this are downsampled (LTTB) before they are sent to the browser, and
+# series still longer than WEBGL_POINTS are drawn with WebGL traces instead of SVG.
+MAX_POINTS = int(os.environ.get("DASHBOARD_CHART_POINTS", "1000"))
+WEBGL_POINTS = int(os.environ.get("DASHBOARD_WEBGL_POINTS", "500"))
+GRANULARITIES = list(aggregates.GRANULARITIES)
+PERIOD_LABELS = {"day": "Day", "week": "Week", "month": "Month"}
+X_HOVER = {"day": "%{x|%b %d, %Y}", "week": "Week of %{x|%b %d, %Y}", "month": "%{x|%b %Y}"}
+
+# ---------- Plotly helpers ----------
+# Plotly takes a noticeable share of a cold start to import, so it is loaded with the first figure
+# template rather than with this module: the page paints its header and KPIs first.
+px = go = None
+
+def load_plotly():
+    global px, go
+    if go is None:
+        import plotly.express as px
+        import plotly.graph_objects as go
+        px.defaults.template = "plotly_white"
+
+def style_layout(fig, title=None, *, legend_pos="top-right", hide_grid=True, bottom_legend=False, height=PLOT_HEIGHT):
+    if bottom_legend:
+        legend = dict(orientation="h", y=-0.25, x=0.5, xanchor="center"); bmargin = 70
+    elif legend_pos == "top-right":
+        legend = dict(orientation="h", y=1.02, x=1.0, xanchor="right"); bmargin = 10
+    else:
+        legend = dict(orientation="h", y=1.02, x=0.0, xanchor="left"); bmargin = 10
+
+    fig.update_layout(
+        title=title,
+        title_font=dict(size=CHART_TITLE_SIZE, family="Roboto", color=BRAND["ink"]),
+        font=dict(family="Roboto", size=12, color=BRAND["ink"]),
+        plot_bgcolor="#fff", paper_bgcolor="#fff",
+        margin=dict(l=8, r=8, t=45, b=bmargin),
+        legend=legend,
+        height=height
+    )
+    fig.update_xaxes(showgrid=(not hide_grid), gridcolor=BRAND["border"])
+    fig.update_yaxes(showgrid=(not hide_grid), gridcolor=BRAND["border"])
+    return fig
+
+def smooth_line(df_line, y_cols, title, color_seq=None, height=PLOT_HEIGHT, gl=False):
+    # WebGL lines have no spline shape
+    fig = px.line(
+        df_line if "period" in df_line.columns else df_line.reset_index(),
+        x="period", y=y_cols, markers=True,
+        line_shape="linear" if gl else "spline", render_mode="webgl" if gl else "svg",
+        color_discrete_sequence=color_seq or [BRAND["primary"], BRAND["light_blue"], BRAND["danger"]]
+    )
+    fig.update_traces(line=dict(width=2.6))
+    fig.update_xaxes(title="")
+    return style_layout(fig, title, legend_pos="top-right", hide_grid=True, height=height)
+
+
+# ---------- Dense series ----------
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Positions of ``n`` points of (x, y) chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept; every bucket in between keeps the point forming the
+    largest triangle with the previously kept point and the next bucket's average, so peaks
+    and dips survive where plain decimation would drop them.
+    """
+    size = len(y)
+    if n >= size or n < 3:
+        return np.arange(size)
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    edges = (np.arange(n - 1) * (size - 2) / (n - 2)).astype(np.intp) + 1
+    keep = np.empty(n, dtype=np.intp)
+    keep[0], keep[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < n - 1:
+            nx, ny = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            nx, ny = x[-1], y[-1]
+        area = np.abs((x[a] - nx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (ny - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+def downsample(frame: pd.DataFrame, y_cols: list, max_points: int = MAX_POINTS) -> pd.DataFrame:
+    """At most ``max_points`` rows of a per-period frame, picked by LTTB over the sum of ``y_cols``.
+
+    Every trace of a figure plots the same kept periods, so overlaid bars stay aligned.
+    """
+    if len(frame) <= max_points:
+        return frame
+    x = frame["period"].to_numpy().astype("datetime64[ns]").astype(np.int64)
+    return frame.iloc[lttb(x, frame[y_cols].sum(axis=1).to_numpy(), max_points)]
+
+def use_webgl(points: int) -> bool:
+    return points > WEBGL_POINTS
+
+
+# ---------- Figure templates ----------
+class FigureTemplate:
+    """A figure styled once; ``render`` fills in each trace's data arrays and skips Plotly's re-validation"""
+
+    def __init__(self, fig: "go.Figure"):
+        self.spec = fig.to_dict()
+
+    def render(self, traces: list) -> "go.Figure":
+        """A new figure with ``traces[i]`` (x/y arrays, labels, ...) set on trace i; nested dicts are merged"""
+        data = []
+        for t, arrays in zip(self.spec["data"], traces):
+            data.append({**t, **{k: {**t[k], **v} if isinstance(v, dict) and k in t else v for k, v in arrays.items()}})
+        return go.Figure(data=data, layout=self.spec["layout"], _validate=False)
+
+_templates = {}
+
+def template(build, *args) -> FigureTemplate:
+    """The template ``build(*args)`` makes, built on first use (a racing duplicate build is harmless)"""
+    key = (build.__name__, *args)
+    t = _templates.get(key)
+    if t is None:
+        load_plotly()
+        t = _templates[key] = FigureTemplate(build(*args))
+    return t
+
+def slice_colors(labels, sequence: list, mapping: Optional[dict] = None) -> list:
+    """Donut slice colors: ``mapping`` where given, else ``sequence`` in order of appearance"""
+    mapping, colors, seen = mapping or {}, [], {}
+    for label in labels:
+        if label not in mapping and label not in seen:
+            seen[label] = sequence[len(seen) % len(sequence)]
+        colors.append(mapping.get(label, seen.get(label)))
+    return colors
+
+
+# ---------- Tab aggregations ----------
+# Each returns the frames its tab plots, from a query_engine view for the selected window;
+# trend frames have one row per ``freq`` period (day, week or month).
+def overview_data(q, start, end, browser="All", freq="month") -> dict:
+    return {
+        "crossover": q.monthly_unique(start, end, browser, "crossover", freq=freq),
+        "link_click": q.monthly_unique(start, end, browser, "link_click", freq=freq),
+    }
+
+def crossovers_data(q, start, end, browser="All", freq="month") -> dict:
+    monthly = q.monthly_unique(start, end, browser, "crossover", freq=freq)
+    if q.has_values("browser", start, end, browser):
+        # Count unique IDs by browser over crossover events
+        by_browser = q.unique_by("browser", start, end, browser, "crossover")
+    else:
+        # Fallback data
+        by_browser = pd.DataFrame({
+            "browser": ["Chrome", "Safari", "Edge", "Firefox"],
+            "unique_ids": [45, 30, 15, 10]
+        })
+    return {"monthly": monthly, "by_browser": by_browser}
+
+def link_clicks_data(q, start, end, browser="All", freq="month") -> dict:
+    if q.has_values("program_destination", start, end, browser, "link_click"):
+        return {
+            "monthly_by_destination": q.monthly_unique(start, end, browser, "link_click", by="program_destination", freq=freq),
+            "by_destination": q.unique_by("program_destination", start, end, browser, "link_click"),
+        }
+    return {
+        "monthly": q.monthly_unique(start, end, browser, "link_click", freq=freq),
+        # Fallback data
+        "by_destination": pd.DataFrame({
+            "program_destination": ["Virta", "Kansas"],
+            "unique_ids": [50, 35]
+        }),
+    }
+
+TAB_DATA = dict(zip(TABS, [overview_data, crossovers_data, link_clicks_data]))
+
+def tab_data(q, tab, start, end, browser="All", freq="month") -> dict:
+    return TAB_DATA[tab](q, start, end, browser, freq)
+
+
+# ---------- Tab figure templates ----------
+# Styling only: built once per granularity and trace type, then filled by the figure functions below.
+def overview_template(freq: str, gl: bool) -> "go.Figure":
+    # Create overlapping bar chart
+    fig = go.Figure()
+    x_hover = X_HOVER[freq]
+
+    # Add Website Crossovers bars (lighter color, in the back)
+    fig.add_trace(go.Bar(
+        x=[], y=[],
+        name="Website Crossovers",
+        marker=dict(color=BRAND["light_blue"]),
+        hovertemplate=f"<b>{x_hover}</b><br>Website Crossovers: %{{y:,.0f}}<extra></extra>"
+    ))
+
+    # Add Link Clicks bars (darker color, in the front, overlapping)
+    fig.add_trace(go.Bar(
+        x=[], y=[],
+        name="Link Clicks",
+        marker=dict(color=BRAND["primary"]),
+        hovertemplate=f"<b>{x_hover}</b><br>Link Clicks: %{{y:,.0f}}<extra></extra>"
+    ))
+
+    # Add Conversion Rate line on secondary axis
+    scatter = go.Scattergl if gl else go.Scatter
+    fig.add_trace(scatter(
+        x=[], y=[],
+        name="Click Conversion",
+        line=dict(color=BRAND["danger"], width=2.6),
+        mode="lines+markers",
+        yaxis="y2",
+        hovertemplate=f"<b>{x_hover}</b><br>Click Conversion: %{{y:.1f}}%<extra></extra>"
+    ))
+
+    fig.update_layout(
+        barmode="overlay",
+        yaxis=dict(title="Unique Users", showgrid=True, gridcolor=BRAND["border"]),
+        yaxis2=dict(
+            title="% Conversion Rate",
+            overlaying="y",
+            side="right",
+            showgrid=False,
+            range=[0, 100]
+        ),
+        margin=dict(l=60, r=90, t=60, b=100),
+        xaxis=dict(tickangle=-45, showgrid=False)
+    )
+
+    return style_layout(fig, "Conversion Trend", legend_pos="top-right", hide_grid=True, height=PLOT_HEIGHT, bottom_legend=True)
+
+def crossovers_line_template(freq: str, gl: bool) -> "go.Figure":
+    # Trending line chart of website crossovers (unique IDs per period)
+    return smooth_line(pd.DataFrame({"period": [pd.Timestamp("2000-01-01")], "unique_ids": [0]}), ["unique_ids"],
+                       f"Website Crossovers (Unique IDs per {PERIOD_LABELS[freq]})",
+                       color_seq=[BRAND["primary"]], height=PLOT_HEIGHT, gl=gl)
+
+def crossovers_donut_template() -> "go.Figure":
+    # Donut chart showing % by Browser (total count by unique IDs)
+    fig = px.pie(
+        pd.DataFrame({"browser": ["Chrome"], "unique_ids": [1]}), values="unique_ids", names="browser", hole=0.62,
+        color="browser",
+        color_discrete_sequence=BLUES
+    )
+    fig.update_traces(textinfo="percent+label")
+    return style_layout(fig, "Crossovers by Browser", bottom_legend=True, height=PLOT_HEIGHT)
+
+def link_clicks_template(freq: str, gl: bool, by_destination: bool) -> "go.Figure":
+    # Trending line chart of link clicks to Virta and Kansas using program_destination column
+    fig = go.Figure()
+    scatter = go.Scattergl if gl else go.Scatter
+    if by_destination:
+        fig.add_trace(scatter(
+            x=[], y=[],
+            name="Kansas",
+            line=dict(color=BRAND["primary"], width=2.6),
+            mode="lines+markers",
+            hovertemplate=f"<b>{X_HOVER[freq]}</b><br>Kansas: %{{y:,.0f}}<extra></extra>"
+        ))
+
+        fig.add_trace(scatter(
+            x=[], y=[],
+            name="Virta",
+            line=dict(color=BRAND["danger"], width=2.6),
+            mode="lines+markers",
+            hovertemplate=f"<b>{X_HOVER[freq]}</b><br>Virta: %{{y:,.0f}}<extra></extra>"
+        ))
+    else:
+        # Fallback: simple line chart
+        fig.add_trace(scatter(
+            x=[], y=[],
+            name="Link Clicks",
+            line=dict(color=BRAND["primary"], width=2.6),
+            mode="lines+markers"
+        ))
+
+    fig.update_layout(
+        margin=dict(l=50, r=50, t=60, b=70)
+    )
+    return style_layout(fig, "Link Clicks Trends", legend_pos="top-right", hide_grid=True, height=PLOT_HEIGHT, bottom_legend=True)
+
+DESTINATION_COLORS = {"Kansas": BRAND["primary"], "Virta": BRAND["danger"]}
+
+def link_clicks_donut_template() -> "go.Figure":
+    # Donut chart showing % by Virta vs Kansas using program_destination column
+    # Custom colors matching line chart: Kansas=primary blue, Virta=danger red
+    fig = px.pie(
+        pd.DataFrame({"program_destination": ["Kansas"], "unique_ids": [1]}), values="unique_ids",
+        names="program_destination", hole=0.62,
+        color="program_destination",
+        color_discrete_map=DESTINATION_COLORS
+    )
+    fig.update_traces(
+        textinfo="percent+label",
+        textfont=dict(size=14),
+        hovertemplate="<b>%{label}</b><br>Count: %{value:,.0f}<br>Percentage: %{percent}<extra></extra>"
+    )
+    fig.update_layout(
+        margin=dict(l=20, r=20, t=60, b=70)
+    )
+    return style_layout(fig, "Link Clicks by Program", bottom_legend=True, height=PLOT_HEIGHT)
+
+
+# ---------- Tab figures ----------
+def series(frame: pd.DataFrame, y: str) -> dict:
+    # Periods start at midnight: "2025-01-06" instead of "2025-01-06T00:00:00" for every point
+    return {"x": np.datetime_as_string(frame["period"].to_numpy(), unit="D"), "y": frame[y].to_numpy()}
+
+def slices(frame: pd.DataFrame, names: str, colors: list) -> dict:
+    labels = frame[names].to_numpy(dtype=object)
+    return {"labels": labels, "values": frame["unique_ids"].to_numpy(), "customdata": labels[:, None],
+            "marker": {"colors": colors}}
+
+def overview_figures(d: dict, freq: str = "month") -> list:
+    # Merge the two dataframes
+    monthly_data = d["crossover"].merge(d["link_click"], on="period", how="outer", suffixes=("_crossover", "_click")).fillna(0)
+    monthly_data.columns = ["period", "Website Crossovers", "Link Clicks"]
+    monthly_data = downsample(monthly_data, ["Website Crossovers", "Link Clicks"])
+    monthly_data["Click Conversion"] = (monthly_data["Link Clicks"] / monthly_data["Website Crossovers"] * 100).fillna(0)
+    fig = template(overview_template, freq, use_webgl(len(monthly_data))).render(
+        [series(monthly_data, c) for c in ["Website Crossovers", "Link Clicks", "Click Conversion"]])
+    return [fig]
+
+def crossovers_figures(d: dict, freq: str = "month") -> list:
+    monthly = downsample(d["monthly"], ["unique_ids"])
+    line = template(crossovers_line_template, freq, use_webgl(len(monthly))).render([series(monthly, "unique_ids")])
+    by_browser = d["by_browser"]
+    donut = template(crossovers_donut_template).render(
+        [slices(by_browser, "browser", slice_colors(by_browser["browser"], BLUES))])
+    return [line, donut]
+
+def link_clicks_figures(d: dict, freq: str = "month") -> list:
+    if "monthly_by_destination" in d:
+        # Pivot to get Virta and Kansas columns
+        monthly_pivot = d["monthly_by_destination"].pivot(index="period", columns="program_destination", values="unique_ids").fillna(0).reset_index()
+
+        # Ensure we have Virta and Kansas columns
+        for col in ["Virta", "Kansas"]:
+            if col not in monthly_pivot.columns:
+                monthly_pivot[col] = 0
+        monthly_pivot = downsample(monthly_pivot, ["Kansas", "Virta"])
+        trend = template(link_clicks_template, freq, use_webgl(len(monthly_pivot)), True).render(
+            [series(monthly_pivot, "Kansas"), series(monthly_pivot, "Virta")])
+    else:
+        monthly = downsample(d["monthly"], ["unique_ids"])
+        trend = template(link_clicks_template, freq, use_webgl(len(monthly)), False).render([series(monthly, "unique_ids")])
+
+    by_destination = d["by_destination"]
+    donut = template(link_clicks_donut_template).render([slices(
+        by_destination, "program_destination",
+        slice_colors(by_destination["program_destination"], BLUES, DESTINATION_COLORS))])
+    return [trend, donut]
+
+TAB_FIGURES = dict(zip(TABS, [overview_figures, crossovers_figures, link_clicks_figures]))
+
+def tab_figures(tab, d: dict, freq: str = "month") -> list:
+    return TAB_FIGURES[tab](d, freq)
+
+def figure_bytes(fig: "go.Figure") -> int:
+    """Size of the figure JSON Streamlit sends to the browser"""
+    return len(fig.to_json())
+
+
+# ---------- Tab cache ----------
+class LRUCache:
+    """Bounded, thread-safe LRU shared by every session; cached values must be treated as read-only"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def discard_older(self, version: int):
+        """Drop entries built from datasets older than ``version`` (keys start with the version)"""
+        with self._lock:
+            for key in [k for k in self._items if k[0] < version]:
+                del self._items[key]
+
+    def __len__(self):
+        return len(self._items)
+
+TAB_CACHE = LRUCache(TAB_CACHE_SIZE)
+
+def tab_view(q, tab, start, end, browser="All", freq="month", cache: LRUCache = TAB_CACHE):
+    """(frames, figures) for one tab, computed once per dataset version and filter combination"""
+    key = (q.version, pd.Timestamp(start), pd.Timestamp(end), browser, tab, freq, q.distinct)
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+    with metrics.stage("tab_data") as s:
+        frames = tab_data(q, tab, start, end, browser, freq)
+        s.add_rows(sum(len(f) for f in frames.values()))
+    with metrics.stage("figures"):
+        figs = tab_figures(tab, frames, freq)
+    cache.discard_older(q.version)
+    cache.put(key, (frames, figs))
+    return frames, figs
@@ -0,0 +1,653 @@
+# data_loader.py — CSV ingest and normalization for the Member Health Records dashboard
+import hashlib
+import json
+import logging
+import io
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from pandas.tseries.api import guess_datetime_format
+
+import metrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:  # sidecar cache is an optimization; plain CSV still works without pyarrow
+    pa = pc = pacsv = pq = None
+
+log = logging.getLogger("dashboard.loader")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# A CSV file, or a directory of date partitions (data/event_date=YYYY-MM/*.csv|*.parquet, see partitions.py).
+CSV_PATH = os.path.join(SCRIPT_DIR, os.environ.get("DASHBOARD_DATA", "data.csv"))
+
+# Bump whenever normalize() changes so sidecars written by older code are rebuilt.
+LOADER_VERSION = 5
+SIDECAR_SUFFIX = ".cache.parquet"
+SIDECAR_META_KEY = b"dashboard_sidecar"
+HASH_BLOCK = 1 << 20
+TAIL_BYTES = 1 << 16
+# How much of the end of data.csv the preview parses while the full load runs.
+PREVIEW_BYTES = 32 << 20
+# Rewrite the sidecar once this fraction of the CSV has been appended since it was written.
+SIDECAR_REWRITE_RATIO = 0.1
+
+# ---------- Ingest config (App Service application settings) ----------
+# "chunked" streams the CSV and keeps only rows for STATES; "full" parses everything first.
+INGEST_MODE = os.environ.get("DASHBOARD_INGEST", "chunked").strip().lower()
+STATES = tuple(s.strip().lower() for s in os.environ.get("DASHBOARD_STATES", "kansas,ks").split(",") if s.strip())
+CHUNK_SIZE = int(os.environ.get("DASHBOARD_CHUNK_SIZE", "250000"))
+# Parser for chunked ingest: "arrow" (multithreaded, driven by INGEST_SCHEMA) or "pandas".
+CSV_PARSER = os.environ.get("DASHBOARD_CSV_PARSER", "arrow").strip().lower()
+ARROW_SEGMENT_BYTES = 256 << 20  # the Arrow parser reads the CSV in whole-line segments of about this size
+
+COALESCE = [
+    ("state", ["state", "member_state", "state_code"]),
+    ("city", ["city", "member_city"]),
+    ("zipcode", ["zipcode", "zip", "member_zip"]),
+]
+STRING_COLUMNS = ["event_type","traffic_source","utm_campaign","device_type","browser",
+                  "zipcode","retention_status","program_activity","user_id","program_destination"]
+# Low-cardinality columns stored as categoricals; LOWERCASE ones are compared case-insensitively.
+CATEGORY_COLUMNS = ["event_type","browser","traffic_source","device_type","program_destination",
+                    "retention_status","utm_campaign","program_activity","state","city","zipcode"]
+LOWERCASE_CATEGORIES = {"event_type", "state"}
+# Columns streamlit_csv.py actually reads; chunked ingest skips everything else.
+DASHBOARD_COLUMNS = ["event_date","event_type","state","browser","user_id",
+                     "program_destination","traffic_source"]
+# The same columns declared for the Arrow parser: the (normalized) headers each is read from,
+# first non-missing wins, and its type. Categories are stripped, and lower-cased when "lower".
+INGEST_SCHEMA = {
+    "event_date":          {"aliases": ["event_date"], "type": "datetime", "formats": ["%Y-%m-%d"]},
+    "event_type":          {"aliases": ["event_type"], "type": "category", "lower": True},
+    "state":               {"aliases": ["state", "member_state", "state_code"], "type": "category", "lower": True},
+    "browser":             {"aliases": ["browser"], "type": "category"},
+    "user_id":             {"aliases": ["user_id"], "type": "category"},
+    "program_destination": {"aliases": ["program_destination"], "type": "category"},
+    "traffic_source":      {"aliases": ["traffic_source"], "type": "category"},
+}
+# pd.read_csv's default missing-value markers, so both parsers agree on what is missing.
+NA_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+             "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+
+
+# ---------- Normalization ----------
+def make_unique(cols):
+    seen, out = {}, []
+    for c in cols:
+        c = str(c).strip()
+        if c not in seen: seen[c]=1; out.append(c)
+        else: seen[c]+=1; out.append(f"{c}_{seen[c]}")
+    return out
+
+def lower_unique(cols):
+    seen, out = {}, []
+    for c in cols:
+        lc = c.lower().strip()
+        if lc not in seen: seen[lc]=1; out.append(lc)
+        else: seen[lc]+=1; out.append(f"{lc}_{seen[lc]}")
+    return out
+
+def normalize_headers(cols) -> list:
+    return lower_unique(make_unique(cols))
+
+def coalesce_columns(df: pd.DataFrame) -> pd.DataFrame:
+    for new_col, candidates in COALESCE:
+        found = [c for c in candidates if c in df.columns]
+        if found:
+            # First non-missing value across the candidates, filled column by column; a row-wise
+            # bfill(axis=1) over object columns is orders of magnitude slower on large frames.
+            out = df[found[0]]
+            for c in found[1:]:
+                out = out.where(out.notna(), df[c])
+            df[new_col] = out
+        elif new_col not in df.columns:
+            df[new_col] = pd.NA
+
+    if "state" in df.columns:
+        df["state"] = df["state"].astype("string")
+    if "city" in df.columns:
+        df["city"] = df["city"].astype("string")
+    return df
+
+def cast_columns(df: pd.DataFrame) -> pd.DataFrame:
+    if "weight" in df.columns and "height" in df.columns:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            df["bmi"] = df["weight"] / (df["height"]**2)
+
+    for c in STRING_COLUMNS:
+        if c not in df.columns: df[c] = pd.NA
+        df[c] = df[c].astype("string")
+
+    df["event_date"] = pd.to_datetime(df["event_date"], errors="coerce")
+    if "event_timestamp" in df.columns:
+        df["event_timestamp"] = pd.to_datetime(df["event_timestamp"], errors="coerce")
+    return df
+
+# ---------- Encoding ----------
+def encode_categorical(values: pd.Series, lower: bool = False) -> pd.Categorical:
+    """Dictionary-encode a string column, normalizing the distinct values rather than every row"""
+    codes, uniques = pd.factorize(values)
+    labels = pd.Index(uniques, dtype="string").str.strip()
+    if lower:
+        labels = labels.str.lower()
+    # Plain str categories, the same dtype a Parquet round trip gives back, so frames concat cleanly.
+    categories = labels.unique().sort_values().astype(str)
+    # Trailing -1 so missing values (code -1) stay missing after the remap.
+    codes = np.append(categories.get_indexer(labels), -1)[codes]
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+def encode_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Store low-cardinality columns as categoricals and intern user_id.
+
+    Filters then compare integer codes and options_from reads the category list. user_id is
+    encoded the same way: its codes are the interned ids and its categories the reverse lookup.
+    """
+    return df.assign(**{c: encode_categorical(df[c], lower=c in LOWERCASE_CATEGORIES)
+                        for c in CATEGORY_COLUMNS + ["user_id"] if c in df.columns})
+
+def concat_encoded(parts: list) -> pd.DataFrame:
+    """Concatenate encoded frames, unioning categories so columns stay categorical"""
+    if len(parts) == 1:
+        return parts[0].reset_index(drop=True)
+    cols = {}
+    for c in parts[0].columns:
+        # An all-missing column comes back from Parquet as object, so not every part may be encoded.
+        if all(isinstance(p[c].dtype, pd.CategoricalDtype) for p in parts):
+            cols[c] = union_categoricals([p[c] for p in parts], sort_categories=True)
+        else:
+            cols[c] = pd.concat([p[c] for p in parts], ignore_index=True)
+    return pd.DataFrame(cols)
+
+def empty_frame(attrs: Optional[dict] = None) -> pd.DataFrame:
+    """No rows, but DASHBOARD_COLUMNS with the dtypes a load gives them, so a cube builds and appended rows merge"""
+    # Parsed, not declared: the datetime unit is whatever pd.to_datetime gives real dates.
+    dates = pd.to_datetime(pd.Series(["2000-01-01"], dtype="string"))[:0]
+    df = pd.DataFrame({c: dates if c == "event_date" else encode_categorical(pd.Series(dtype="string"))
+                       for c in DASHBOARD_COLUMNS})
+    df.attrs.update(attrs or {})
+    return df
+
+def drop_unused_categories(df: pd.DataFrame) -> pd.DataFrame:
+    return df.assign(**{c: df[c].cat.remove_unused_categories() for c in df.columns
+                        if isinstance(df[c].dtype, pd.CategoricalDtype)})
+
+def normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Clean headers, coalesce location columns, cast and encode the columns the dashboard reads"""
+    if df.empty:
+        return df
+    df.columns = normalize_headers(df.columns)
+    return encode_columns(cast_columns(coalesce_columns(df)))
+
+def filter_states(df: pd.DataFrame, states=None) -> pd.DataFrame:
+    """Keep rows whose coalesced state is in ``states``; empty keeps all.
+
+    Values are compared stripped and lower-cased, as encode_categorical stores them, so every
+    parser and ingest mode keeps the same rows ("kansas " included).
+    """
+    states = STATES if states is None else states
+    if not states or "state" not in df.columns:
+        return df
+    if isinstance(df["state"].dtype, pd.CategoricalDtype):
+        return df.loc[df["state"].isin([c for c in df["state"].cat.categories if c.strip().lower() in states])]
+    return df.loc[df["state"].astype("string").str.strip().str.lower().isin(states)]
+
+def _filter_states_timed(df: pd.DataFrame, states) -> pd.DataFrame:
+    with metrics.stage("state_filter") as s:
+        df = filter_states(df, states)
+        s.add_rows(len(df))
+    return df
+
+def read_csv(csv_path: str, states=None, size: Optional[int] = None) -> pd.DataFrame:
+    """Parse the whole CSV, normalize it and apply the state filter (the slow path)"""
+    with open_prefix(csv_path, size) as f:
+        df = normalize(pd.read_csv(f))
+    return drop_unused_categories(_filter_states_timed(df, states))
+
+def read_csv_chunked(csv_path: str, states=None, chunk_size: Optional[int] = None,
+                     size: Optional[int] = None, parser: Optional[str] = None) -> pd.DataFrame:
+    """Stream the CSV in chunks, pushing the state filter down before normalization.
+
+    Only the columns the dashboard reads are parsed, and each chunk is dropped as soon as
+    its surviving rows are kept, so peak memory follows the filtered slice rather than
+    the full file.
+    """
+    return _read_chunks(lambda: open_prefix(csv_path, size), read_header(csv_path), states, chunk_size,
+                        has_header=True, parser=parser)
+
+def read_header(csv_path: str) -> list:
+    return normalize_headers(pd.read_csv(csv_path, nrows=0).columns)
+
+def _read_chunks(open_source, header: list, states, chunk_size: Optional[int], has_header: bool,
+                 parser: Optional[str] = None) -> pd.DataFrame:
+    if (parser or CSV_PARSER) == "arrow" and pacsv is not None and "event_date" in header:
+        try:
+            with open_source() as f:
+                return read_csv_arrow(f, header, states, has_header)
+        except pa.ArrowInvalid as e:
+            # e.g. short rows, which pandas pads with missing values and Arrow rejects
+            log.warning("Arrow CSV parser failed (%s); using the pandas parser", e)
+    with open_source() as f:
+        parts = list(iter_chunks(f, header, states, chunk_size, has_header))
+    if not parts:
+        return empty_frame()
+    return concat_encoded(parts)
+
+def iter_chunks(source, header: list, states=None, chunk_size: Optional[int] = None, has_header: bool = True):
+    """Yield normalized, state-filtered chunks holding only DASHBOARD_COLUMNS"""
+    sources = [c for col, cands in COALESCE if col in DASHBOARD_COLUMNS for c in cands]
+    usecols = [c for c in header if c in DASHBOARD_COLUMNS or c in sources]
+    # Fix string dtypes up front so per-chunk inference can't turn an id into "123.0" in one chunk only.
+    dtype = {c: "string" for c in usecols if c in STRING_COLUMNS or c in sources}
+
+    reader = pd.read_csv(source, header=0 if has_header else None, names=header, usecols=usecols,
+                         dtype=dtype, chunksize=chunk_size or CHUNK_SIZE)
+    for chunk in reader:
+        chunk = _filter_states_timed(coalesce_columns(chunk), states)
+        if len(chunk):
+            chunk = cast_columns(chunk.copy())
+            yield encode_columns(chunk[[c for c in DASHBOARD_COLUMNS if c in chunk.columns]])
+
+def read_file(path: str, mode: Optional[str] = None, states=None, chunk_size: Optional[int] = None) -> pd.DataFrame:
+    """Normalized, state-filtered rows of one CSV or Parquet export, unsorted and without a fingerprint"""
+    mode, states = resolve_ingest(mode, states)
+    if not path.endswith(".parquet"):
+        return read_csv_chunked(path, states, chunk_size) if mode == "chunked" else read_csv(path, states)
+    if pq is None:
+        raise RuntimeError(f"reading {path} needs pyarrow")
+    df = drop_unused_categories(_filter_states_timed(normalize(pq.read_table(path).to_pandas()), states))
+    return df[[c for c in DASHBOARD_COLUMNS if c in df.columns]] if mode == "chunked" else df
+
+# ---------- Arrow parser ----------
+def _line_segments(source, has_header: bool):
+    """Yield ARROW_SEGMENT_BYTES-sized blocks of ``source`` cut at line ends"""
+    if has_header:
+        source.readline()
+    rest = b""
+    while True:
+        block = source.read(ARROW_SEGMENT_BYTES)
+        if not block:
+            break
+        block = rest + block
+        cut = block.rfind(b"\n") + 1
+        rest = block[cut:]
+        if cut:
+            yield block[:cut]
+    if rest.strip():
+        yield rest
+
+def _filter_states_arrow(table, states):
+    if not states:
+        return table
+    # Stripped and lower-cased like filter_states, so both parsers keep the same rows.
+    state = pc.utf8_lower(pc.utf8_trim_whitespace(table["state"]))
+    return table.filter(pc.is_in(state, value_set=pa.array(list(states))))
+
+def _arrow_dates(values, formats: list) -> pd.Series:
+    """pd.to_datetime(errors="coerce") semantics, parsing each distinct string once"""
+    uniques = pc.unique(values).drop_null()
+    strings = pd.Series(uniques.to_pylist(), dtype="string")
+    fmt = guess_datetime_format(strings.iloc[0]) if len(strings) else None
+    parsed = pd.to_datetime(strings, errors="coerce", format=fmt if fmt in formats else None)
+    # Missing strings map to the trailing NaT.
+    codes = pc.fill_null(pc.index_in(values, value_set=uniques), len(uniques)).to_numpy()
+    return pd.Series(np.append(parsed.to_numpy(), np.datetime64("NaT"))[codes])
+
+def read_csv_arrow(source, header: list, states=None, has_header: bool = True) -> pd.DataFrame:
+    """The chunked reader's frame, parsed by Arrow's multithreaded CSV reader from INGEST_SCHEMA.
+
+    Parsing, column projection and string conversion happen in one pass over each segment;
+    the state filter runs on Arrow arrays, so only kept rows ever reach pandas. Dates are
+    parsed once per distinct value and categories are encoded from Arrow dictionaries.
+    """
+    states = STATES if states is None else states
+    present = {name: [a for a in spec["aliases"] if a in header] for name, spec in INGEST_SCHEMA.items()}
+    usecols = list(dict.fromkeys(a for aliases in present.values() for a in aliases))
+    read = pacsv.ReadOptions(column_names=header, use_threads=True)
+    convert = pacsv.ConvertOptions(include_columns=usecols, column_types={c: pa.string() for c in usecols},
+                                   null_values=NA_VALUES, strings_can_be_null=True, quoted_strings_can_be_null=True)
+    tables = []
+    for segment in _line_segments(source, has_header):
+        t = pacsv.read_csv(pa.py_buffer(segment), read_options=read, convert_options=convert)
+        cols = {name: pc.coalesce(*[t[a] for a in aliases]) if aliases else pa.nulls(len(t), pa.string())
+                for name, aliases in present.items()}
+        with metrics.stage("state_filter") as s:
+            t = _filter_states_arrow(pa.table(cols), states)
+            s.add_rows(len(t))
+        if len(t):
+            tables.append(t)
+    if not tables:
+        return empty_frame()
+    table = pa.concat_tables(tables)
+
+    out = {}
+    for name, spec in INGEST_SCHEMA.items():
+        if spec["type"] == "datetime":
+            out[name] = _arrow_dates(table[name], spec["formats"])
+        else:
+            values = pd.Series(table[name].dictionary_encode().to_pandas())
+            out[name] = encode_categorical(values, lower=spec.get("lower", False))
+    return pd.DataFrame(out)
+
+class _Prefix(io.RawIOBase):
+    """Read-only view of the first ``limit`` bytes of a file"""
+    def __init__(self, f, limit: int):
+        self._f, self._left = f, limit
+    def readable(self):
+        return True
+    def readinto(self, b):
+        n = self._f.readinto(memoryview(b)[:max(0, min(len(b), self._left))])
+        self._left -= n
+        return n
+    def close(self):
+        self._f.close()
+        super().close()
+
+def open_prefix(path: str, size: Optional[int] = None):
+    """Open ``path`` for parsing, stopping at ``size`` bytes so rows appended mid-parse wait for the next refresh"""
+    f = open(path, "rb")
+    return f if size is None else io.BufferedReader(_Prefix(f, size), HASH_BLOCK)
+
+
+# ---------- Appends ----------
+def read_csv_tail(csv_path: str, offset: int, mode: str, states, chunk_size: Optional[int] = None):
+    """Parse only the complete lines written after byte ``offset``.
+
+    Returns (rows, end) where ``end`` is the offset just past the last complete line; a line
+    still being written stays for the next call.
+    """
+    with open(csv_path, "rb") as f:
+        f.seek(offset)
+        buf = f.read()
+    end = buf.rfind(b"\n") + 1
+    if end == 0:
+        return None, offset
+    header = read_header(csv_path)
+    if mode == "chunked":
+        rows = _read_chunks(lambda: io.BytesIO(buf[:end]), header, states, chunk_size, has_header=False)
+    else:
+        raw = pd.read_csv(io.BytesIO(buf[:end]), header=None, names=header)
+        rows = drop_unused_categories(_filter_states_timed(normalize(raw), states))
+    return rows, offset + end
+
+def read_csv_recent(csv_path: str, days: int, mode: Optional[str] = None, states=None,
+                    nbytes: int = PREVIEW_BYTES) -> pd.DataFrame:
+    """Rows of the last ``days`` days found in the final ``nbytes`` of the CSV, sorted by event_date.
+
+    A quick preview for an event log appended in date order; rows written out of order are
+    missed, and the full load replaces the preview anyway.
+    """
+    mode, states = resolve_ingest(mode, states)
+    with open(csv_path, "rb") as f:
+        f.seek(max(0, os.path.getsize(csv_path) - nbytes))
+        # Skip to the next line start: past a partial row, or past the header at offset 0.
+        f.readline()
+        start = f.tell()
+    rows, _ = read_csv_tail(csv_path, start, mode, states)
+    if rows is None or rows.empty or rows["event_date"].isna().all():
+        return pd.DataFrame(columns=DASHBOARD_COLUMNS)
+    rows = rows.loc[rows["event_date"] > rows["event_date"].max() - pd.Timedelta(days=days)]
+    return drop_unused_categories(rows.sort_values("event_date", kind="stable", ignore_index=True))
+
+def merge_rows(df: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    """Append encoded rows, keeping the frame sorted by event_date"""
+    if rows is None or rows.empty:
+        return df
+    if df.empty:
+        # Nothing loaded yet (a header-only CSV, or no row in DASHBOARD_STATES): the rows are the frame.
+        return rows.sort_values("event_date", kind="stable", na_position="last", ignore_index=True)
+    out = concat_encoded([df, rows[df.columns]])
+    # Rows without a date sort last, so new rows after them need a re-sort too.
+    if rows["event_date"].min() < df["event_date"].max() or pd.isna(df["event_date"].iloc[-1]):
+        out = out.sort_values("event_date", kind="stable", na_position="last", ignore_index=True)
+    return out
+
+def read_appended(csv_path: str, meta: dict, mode: Optional[str] = None, states=None,
+                  chunk_size: Optional[int] = None) -> Optional[tuple]:
+    """(rows, fingerprint) for the lines appended to the CSV since ``meta``, or None while the
+    only new bytes are an unfinished line. The caller must already have seen csv_status() == "appended".
+    """
+    mode, states = resolve_ingest(mode, states)
+    rows, end = read_csv_tail(csv_path, meta["size"], mode, states, chunk_size)
+    if end == meta["size"]:
+        return None
+    log.info("appended %s rows from %s (bytes %s-%s)", 0 if rows is None else len(rows), csv_path, meta["size"], end)
+    return rows, file_fingerprint(csv_path, with_hash=False, key=ingest_key(mode, states), size=end)
+
+def append_from_csv(df: pd.DataFrame, csv_path: str, mode: Optional[str] = None, states=None,
+                    chunk_size: Optional[int] = None):
+    """Extend ``df`` with rows appended to the CSV since it was built.
+
+    Returns (merged, new_rows), or (df, None) while the only new bytes are an unfinished line.
+    """
+    appended = read_appended(csv_path, df.attrs["fingerprint"], mode, states, chunk_size)
+    if appended is None:
+        return df, None
+    rows, fingerprint = appended
+    merged = merge_rows(df, rows)
+    if merged is df:
+        merged = df.copy(deep=False)
+    merged.attrs.update(source=df.attrs.get("source", "csv").split("+")[0] + "+append", fingerprint=fingerprint)
+    return merged, rows
+
+def merge_tiers(parts: tuple, merge) -> tuple:
+    """Merge the newest two parts while the older one is no longer than the newer.
+
+    Part sizes then at least double towards the oldest, so there are O(log n) parts and each
+    row is merged O(log n) times in all: an append costs its own rows, amortized.
+    """
+    parts = list(parts)
+    while len(parts) > 1 and len(parts[-2]) <= len(parts[-1]):
+        parts[-2:] = [merge(parts[-2], parts[-1])]
+    return tuple(parts)
+
+@dataclass(frozen=True)
+class ChunkedFrame:
+    """The loaded frame plus the rows appended to it since, as date-sorted ``parts``.
+
+    Appending adds a part instead of copying the rows already held and re-encoding their
+    categories, so a refresh costs the new rows (merge_tiers folds parts together as they
+    grow). ``attrs`` are the frame's attrs: source and the fingerprint it matches.
+    """
+    parts: tuple
+    attrs: dict = field(default_factory=dict)
+
+    @classmethod
+    def of(cls, df: pd.DataFrame) -> "ChunkedFrame":
+        return cls((df,), df.attrs)
+
+    def __len__(self) -> int:
+        return sum(len(p) for p in self.parts)
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    @property
+    def columns(self) -> pd.Index:
+        return self.parts[0].columns
+
+    def append(self, rows: Optional[pd.DataFrame], attrs: dict) -> "ChunkedFrame":
+        """This frame with ``rows`` added as a new part, described by ``attrs``"""
+        if rows is None or rows.empty:
+            return ChunkedFrame(self.parts, attrs)
+        if self.parts[0].empty:
+            parts = ()
+        else:
+            rows, parts = rows[self.columns], self.parts
+        rows = rows.sort_values("event_date", kind="stable", na_position="last", ignore_index=True)
+        return ChunkedFrame(merge_tiers(parts + (rows,), merge_rows), attrs)
+
+# ---------- Columnar sidecar ----------
+def sidecar_path(csv_path: str) -> str:
+    return csv_path + SIDECAR_SUFFIX
+
+def file_hash(path: str, size: Optional[int] = None) -> str:
+    h = hashlib.sha256()
+    with open_prefix(path, size) as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def resolve_ingest(mode: Optional[str] = None, states=None):
+    """Fill in the configured ingest mode and state list for arguments left as None"""
+    return mode or INGEST_MODE, STATES if states is None else tuple(s.lower() for s in states)
+
+def ingest_key(mode: str, states) -> dict:
+    """Settings that change the cached frame; a sidecar built with other settings is stale"""
+    return {"mode": mode, "states": sorted(states)}
+
+def tail_hash(path: str, size: int) -> str:
+    """Hash of the bytes just before ``size``; if they are unchanged the file was only appended to"""
+    with open(path, "rb") as f:
+        f.seek(max(0, size - TAIL_BYTES))
+        return hashlib.sha256(f.read(min(size, TAIL_BYTES))).hexdigest()
+
+def file_fingerprint(path: str, with_hash: bool = True, key: Optional[dict] = None,
+                     size: Optional[int] = None) -> dict:
+    """Identity of the first ``size`` bytes of ``path`` (the whole file by default)"""
+    st_ = os.stat(path)
+    size = st_.st_size if size is None else size
+    fp = {"version": LOADER_VERSION, "size": size, "mtime_ns": st_.st_mtime_ns, **(key or {}),
+          "tail_sha256": tail_hash(path, size), "terminated": ends_with_newline(path, size)}
+    if with_hash:
+        fp["sha256"] = file_hash(path, size)
+    return fp
+
+def ends_with_newline(path: str, size: int) -> bool:
+    if size == 0:
+        return True
+    with open(path, "rb") as f:
+        f.seek(size - 1)
+        return f.read(1) == b"\n"
+
+def csv_status(csv_path: str, meta: Optional[dict], key: dict) -> str:
+    """"unchanged", "appended" or "changed" for a frame built from the fingerprint ``meta``.
+
+    Size + mtime is the cheap check; the content hash settles it when only mtime moved
+    (deploys unzip the artifact, which resets mtimes on an unchanged data.csv). A larger
+    file whose bytes before the old end are untouched, and whose old end was a complete
+    line, only had rows appended.
+    """
+    if not meta or meta.get("version") != LOADER_VERSION:
+        return "changed"
+    if any(meta.get(k) != v for k, v in key.items()):
+        return "changed"
+    cur = os.stat(csv_path)
+    if cur.st_size == meta.get("size"):
+        if cur.st_mtime_ns == meta.get("mtime_ns"):
+            return "unchanged"
+        return "unchanged" if file_hash(csv_path) == meta.get("sha256") else "changed"
+    if (cur.st_size > meta.get("size", 0) and meta.get("terminated")
+            and tail_hash(csv_path, meta["size"]) == meta.get("tail_sha256")):
+        return "appended"
+    return "changed"
+
+def restamp(csv_path: str, meta: dict) -> Optional[dict]:
+    """``meta`` with the CSV's current mtime, or None when it already has it.
+
+    Only for a fingerprint csv_status() called "unchanged": a moved mtime means the content hash
+    matched, and writing the new mtime back spares the next cold start hashing the whole file.
+    """
+    cur = os.stat(csv_path)
+    if cur.st_mtime_ns == meta.get("mtime_ns") or cur.st_size != meta.get("size"):
+        return None
+    return {**meta, "mtime_ns": cur.st_mtime_ns}
+
+def sidecar_is_valid(csv_path: str, meta: Optional[dict], key: dict) -> bool:
+    return csv_status(csv_path, meta, key) == "unchanged"
+
+def read_sidecar_meta(path: str) -> Optional[dict]:
+    if pq is None or not os.path.exists(path):
+        return None
+    try:
+        raw = (pq.read_schema(path).metadata or {}).get(SIDECAR_META_KEY)
+        return json.loads(raw) if raw else None
+    except Exception as e:
+        log.warning("ignoring unreadable sidecar %s: %s", path, e)
+        return None
+
+def write_sidecar(csv_path: str, df: pd.DataFrame, fingerprint: dict) -> bool:
+    """Write the normalized frame next to the CSV; failures only cost the next cold start"""
+    if pq is None:
+        return False
+    path = sidecar_path(csv_path)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        meta = dict(table.schema.metadata or {})
+        meta[SIDECAR_META_KEY] = json.dumps(fingerprint).encode()
+        pq.write_table(table.replace_schema_metadata(meta), tmp)
+        os.replace(tmp, path)
+        return True
+    except Exception as e:
+        log.warning("could not write sidecar %s: %s", path, e)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+
+
+# ---------- Entry point ----------
+def load_dataset(csv_path: str = CSV_PATH, mode: Optional[str] = None, states=None,
+                 chunk_size: Optional[int] = None) -> pd.DataFrame:
+    """Return the normalized, state-filtered frame, from the sidecar when it still matches the CSV.
+
+    ``df.attrs["source"]`` records which path was taken ("sidecar" or "csv") and
+    ``df.attrs["fingerprint"]`` the CSV fingerprint the frame was built from.
+    """
+    mode, states = resolve_ingest(mode, states)
+    key = ingest_key(mode, states)
+
+    side = sidecar_path(csv_path)
+    meta = read_sidecar_meta(side)
+    status = csv_status(csv_path, meta, key)
+    if status != "changed":
+        try:
+            with metrics.stage("read_sidecar") as s:
+                df = pq.read_table(side).to_pandas()
+                s.add_rows(len(df))
+            fresh = restamp(csv_path, meta) if status == "unchanged" else None
+            if fresh is not None and write_sidecar(csv_path, df, fresh):
+                meta = fresh
+            df.attrs.update(source="sidecar", fingerprint=meta)
+            log.info("loaded %s rows from sidecar %s", len(df), side)
+            if status == "appended":
+                df, _ = append_from_csv(df, csv_path, mode, states, chunk_size)
+                maybe_rewrite_sidecar(csv_path, df, meta)
+            return df
+        except Exception as e:
+            log.warning("sidecar %s failed to load, falling back to CSV: %s", side, e)
+
+    # Fingerprint before parsing and parse only that many bytes, so rows appended meanwhile
+    # are picked up by the next append instead of being read twice.
+    fingerprint = file_fingerprint(csv_path, key=key)
+    with metrics.stage("parse_csv") as s:
+        if mode == "chunked":
+            df = read_csv_chunked(csv_path, states, chunk_size, size=fingerprint["size"])
+        else:
+            df = read_csv(csv_path, states, size=fingerprint["size"])
+        s.add_rows(len(df))
+    # Date-ordered rows let window queries use searchsorted instead of full boolean masks.
+    df = df.sort_values("event_date", kind="stable", na_position="last", ignore_index=True)
+    if not df.empty:
+        write_sidecar(csv_path, df, fingerprint)
+    df.attrs.update(source="csv", fingerprint=fingerprint)
+    log.info("loaded %s rows from CSV %s (%s ingest, states=%s)", len(df), csv_path, mode, ",".join(states) or "all")
+    return df
+
+def maybe_rewrite_sidecar(csv_path: str, df: pd.DataFrame, sidecar_meta: Optional[dict]) -> bool:
+    """Refresh the sidecar once enough has been appended that cold starts would parse a long tail"""
+    fp = df.attrs["fingerprint"]
+    written = (sidecar_meta or {}).get("size", 0)
+    if fp["size"] - written < SIDECAR_REWRITE_RATIO * fp["size"]:
+        return False
+    fp = {**fp, "sha256": file_hash(csv_path, fp["size"])}
+    df.attrs["fingerprint"] = fp
+    return write_sidecar(csv_path, df, fp)
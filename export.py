@@ -0,0 +1,100 @@
+# export.py — the rows behind the current view, streamed to CSV or Parquet for download or a local file
+#
+#   python export.py --tab "Link Clicks" --start 2025-01-01 --end 2025-03-31 --browser Chrome --out clicks.csv
+#
+# Rows are filtered exactly as the dashboard filters them (date range, browser, the tab's event
+# types) and written a slice at a time by the query engine, so memory does not grow with the
+# number of rows. Exports hold the dashboard's columns (COLUMNS) as the dashboard reads them:
+# state coalesced from its aliases, categories trimmed, event types lower-cased; other data.csv
+# columns are not exported. Downloads are written under static/exports/ and served by Streamlit's static
+# file server (server.enableStaticServing) straight from disk.
+import argparse
+import json
+import logging
+import os
+import re
+import secrets
+import shutil
+import time
+
+import pandas as pd
+
+import charts
+import data_loader
+import query_engine
+
+log = logging.getLogger("dashboard.export")
+
+FORMATS = ["csv", "parquet"]
+# The columns every export holds: the engines keep only these, normalized, not the source rows.
+COLUMNS = data_loader.DASHBOARD_COLUMNS
+EXPORT_DIR = os.path.join(data_loader.SCRIPT_DIR, "static", "exports")
+EXPORT_URL = "app/static/exports"
+# Seconds a prepared download stays on disk.
+EXPORT_TTL = float(os.environ.get("DASHBOARD_EXPORT_TTL", "3600"))
+# Streamlit's static file server refuses files above 200 MB; larger exports stay on the server.
+MAX_DOWNLOAD_BYTES = 200 << 20
+
+
+def export_name(tab: str, start, end, browser: str = "All", fmt: str = "csv") -> str:
+    parts = [tab, f"{pd.Timestamp(start):%Y-%m-%d}", f"{pd.Timestamp(end):%Y-%m-%d}"]
+    if browser != "All":
+        parts.append(browser)
+    return "_".join(re.sub(r"[^a-z0-9]+", "-", p.lower()).strip("-") for p in parts) + f".{fmt}"
+
+def export_rows(q, path: str, fmt: str, tab: str, start, end, browser: str = "All") -> int:
+    """Write the rows behind ``tab`` for the window to ``path``; returns the row count"""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r} (expected one of {', '.join(FORMATS)})")
+    t0 = time.perf_counter()
+    rows = q.export_rows(path, fmt, start, end, browser, charts.TAB_EVENT_TYPES[tab])
+    log.info("exported %s rows to %s in %.2fs", rows, path, time.perf_counter() - t0)
+    return rows
+
+
+# ---------- Downloads ----------
+def prune_exports(ttl: float = EXPORT_TTL):
+    """Remove prepared downloads older than ``ttl`` seconds"""
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    cutoff = time.time() - ttl
+    for entry in os.scandir(EXPORT_DIR):
+        if entry.is_dir() and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+def export_for_download(q, fmt: str, tab: str, start, end, browser: str = "All") -> dict:
+    """Write the export under an unguessable static/exports/<token>/ directory and describe it for the page"""
+    prune_exports()
+    token = secrets.token_urlsafe(16)
+    name = export_name(tab, start, end, browser, fmt)
+    os.makedirs(os.path.join(EXPORT_DIR, token))
+    path = os.path.join(EXPORT_DIR, token, name)
+    rows = export_rows(q, path, fmt, tab, start, end, browser)
+    size = os.path.getsize(path)
+    return {"path": path, "name": name, "url": f"{EXPORT_URL}/{token}/{name}", "rows": rows, "bytes": size,
+            "servable": size <= MAX_DOWNLOAD_BYTES}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export the rows behind a dashboard view")
+    ap.add_argument("--csv", default=data_loader.CSV_PATH, help="data.csv or a partition directory (default DASHBOARD_DATA)")
+    ap.add_argument("--tab", default=charts.TABS[0], choices=charts.TABS)
+    ap.add_argument("--start", help="first event_date (default the earliest)")
+    ap.add_argument("--end", help="last event_date (default the latest)")
+    ap.add_argument("--browser", default="All")
+    ap.add_argument("--format", choices=FORMATS, help="default from the --out extension, else csv")
+    ap.add_argument("--engine", choices=["pandas", "duckdb"], help="query engine (default DASHBOARD_QUERY_ENGINE, else duckdb for a partition directory)")
+    ap.add_argument("--out", required=True)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    fmt = args.format or ("parquet" if args.out.endswith(".parquet") else "csv")
+    q = query_engine.make_engine(args.engine, args.csv).view()
+    lo, hi = q.date_bounds()
+    start = pd.Timestamp(args.start) if args.start else lo
+    end = pd.Timestamp(args.end) if args.end else hi
+    rows = export_rows(q, args.out, fmt, args.tab, start, end, args.browser)
+    print(json.dumps({"rows": rows, "path": args.out, "bytes": os.path.getsize(args.out)}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# generate_data.py — write a synthetic data.csv at any scale for local runs and benchmarks
+#
+#   python generate_data.py --rows 1000000 --out data.csv
+#
+# Rows look like the real export, mess included: duplicate and upper-case headers, the state/city/zip
+# columns the loader coalesces, mixed-case values with stray spaces, and a share of bad dates.
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Header as exported: "EVENT_TYPE" and "State" differ only in case, "browser" appears twice,
+# and state/city/zip each come in the variants data_loader.COALESCE merges.
+HEADER = ["event_id", "event_timestamp", "event_date", "EVENT_TYPE", "State", "member_state", "state_code",
+          "city", "member_city", "zipcode", "zip", "member_zip", "user_id", "session_id",
+          "traffic_source", "utm_source", "utm_medium", "utm_campaign", "browser", "device_type",
+          "page_path", "landing_page", "retention_status", "program_activity", "program_destination",
+          "weight", "height", "browser"]
+
+EVENT_TYPES = (["crossover", "link_click", "signup", "improvement", "Link_Click", " crossover", "page_view"],
+               [.42, .25, .1, .05, .05, .03, .1])
+STATES = (["Kansas", "KS", "kansas ", "Missouri", "MO", "Texas", "Oklahoma"], [.3, .15, .05, .2, .1, .1, .1])
+BROWSERS = (["Chrome", "Safari", "Edge", "Firefox", " Chrome", "Samsung Internet"], [.45, .25, .12, .08, .05, .05])
+DESTINATIONS = (["Kansas", "Virta", "Virta ", None], [.4, .35, .05, .2])
+CITIES = ["Wichita", "Topeka", "Overland Park", "Kansas City", "Olathe", "Lawrence", "Springfield", "Dallas"]
+SOURCES = ["google", "facebook", "email", "direct", "partner"]
+CAMPAIGNS = ["spring_launch", "fall_outreach", "retention", "newsletter"]
+PAGES = ["/", "/enroll", "/programs", "/programs/virta", "/programs/kansas", "/faq"]
+
+
+def _pick(rng, choices, n, missing=0.0):
+    values, p = choices if isinstance(choices, tuple) else (choices, None)
+    out = rng.choice(np.array(values, dtype=object), n, p=p)
+    if missing:
+        out[rng.random(n) < missing] = None
+    return out
+
+def make_chunk(rng, start: int, n: int, users: int, days: pd.DatetimeIndex, bad_dates: float) -> pd.DataFrame:
+    """``n`` synthetic rows with ids starting at ``start``"""
+    day = days[rng.integers(0, len(days), n)]
+    ts = day + pd.to_timedelta(rng.integers(0, 86400, n), unit="s")
+    event_date = pd.Series(day.strftime("%Y-%m-%d"), dtype=object)
+    bad = rng.random(n) < bad_dates
+    event_date[bad] = rng.choice(["notadate", "2025-13-01", ""], int(bad.sum()))
+    state = _pick(rng, STATES, n, missing=.15)
+    # The loader takes the first non-empty state variant; fill the others only where State is blank.
+    blank = pd.isna(state)
+    member_state = np.where(blank, _pick(rng, STATES, n), None)
+    state_code = np.where(blank & (rng.random(n) < .5), _pick(rng, ["KS", "MO"], n), None)
+    browser = _pick(rng, BROWSERS, n, missing=.05)
+    zips = rng.integers(64000, 68000, n).astype(str)
+    return pd.DataFrame({
+        "event_id": np.arange(start, start + n),
+        "event_timestamp": ts.strftime("%Y-%m-%d %H:%M:%S"),
+        "event_date": event_date,
+        "EVENT_TYPE": _pick(rng, EVENT_TYPES, n),
+        "State": state,
+        "member_state": member_state,
+        "state_code": state_code,
+        "city": _pick(rng, CITIES, n, missing=.3),
+        "member_city": _pick(rng, CITIES, n, missing=.5),
+        "zipcode": np.where(rng.random(n) < .6, zips, None),
+        "zip": np.where(rng.random(n) < .3, zips, None),
+        "member_zip": np.where(rng.random(n) < .2, zips, None),
+        "user_id": np.char.add("u", rng.integers(0, users, n).astype(str)),
+        "session_id": np.char.add("s", rng.integers(0, users * 3, n).astype(str)),
+        "traffic_source": _pick(rng, SOURCES, n, missing=.35),
+        "utm_source": _pick(rng, SOURCES, n, missing=.5),
+        "utm_medium": _pick(rng, ["cpc", "social", "email", "referral"], n, missing=.5),
+        "utm_campaign": _pick(rng, CAMPAIGNS, n, missing=.5),
+        "browser": browser,
+        "device_type": _pick(rng, ["mobile", "desktop", "tablet"], n),
+        "page_path": _pick(rng, PAGES, n),
+        "landing_page": _pick(rng, PAGES, n),
+        "retention_status": _pick(rng, ["new", "returning", "lapsed"], n, missing=.2),
+        "program_activity": _pick(rng, ["enrolled", "browsing", "completed"], n, missing=.3),
+        "program_destination": _pick(rng, DESTINATIONS, n),
+        "weight": rng.normal(82, 14, n).round(1),
+        "height": rng.normal(1.71, .09, n).round(2),
+        "browser_dup": browser,
+    })
+
+def generate(path: str, rows: int, seed: int = 0, start: str = "2024-11-01", end: str = "2025-10-31",
+             users: int = 0, bad_dates: float = .01, chunk_rows: int = 500_000) -> int:
+    """Stream ``rows`` rows to ``path`` in chunks so 50M rows need no more memory than 500k; returns bytes written"""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(start, end)
+    users = users or max(1, rows // 5)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", newline="") as f:
+        f.write(",".join(HEADER) + "\n")
+        for offset in range(0, rows, chunk_rows):
+            chunk = make_chunk(rng, offset, min(chunk_rows, rows - offset), users, days, bad_dates)
+            chunk.to_csv(f, header=False, index=False)
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Write a synthetic dashboard CSV")
+    ap.add_argument("--rows", type=int, default=100_000, help="rows to write (default 100000)")
+    ap.add_argument("--out", default="data.csv", help="output path (default data.csv)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--start", default="2024-11-01", help="first event_date")
+    ap.add_argument("--end", default="2025-10-31", help="last event_date")
+    ap.add_argument("--users", type=int, default=0, help="distinct user_ids (default rows/5)")
+    ap.add_argument("--bad-dates", type=float, default=.01, help="share of unparseable event_date values")
+    ap.add_argument("--chunk-rows", type=int, default=500_000)
+    args = ap.parse_args(argv)
+    t = time.perf_counter()
+    size = generate(args.out, args.rows, args.seed, args.start, args.end, args.users, args.bad_dates, args.chunk_rows)
+    print(f"wrote {args.rows:,} rows ({size / 1e6:,.1f} MB) to {args.out} in {time.perf_counter() - t:.1f}s",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
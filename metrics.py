@@ -0,0 +1,184 @@
+# metrics.py — per-rerun stage timings and memory deltas, for logs, an admin panel and Prometheus
+import hmac
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from typing import Optional
+
+log = logging.getLogger("dashboard.metrics")
+
+# Off by default: every stage() call then returns one shared no-op context manager.
+ENABLED = os.environ.get("DASHBOARD_METRICS", "off").strip().lower() in ("1", "on", "true", "yes")
+# Prometheus text file for a local scraper (node_exporter textfile collector or similar);
+# "{pid}" in the path gives each server process its own file. Empty disables the file.
+METRICS_FILE = os.environ.get("DASHBOARD_METRICS_FILE",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics.prom"))
+# The ?debug=timings panel is only shown with &token=<this>; unset hides it entirely.
+ADMIN_TOKEN = os.environ.get("DASHBOARD_ADMIN_TOKEN", "")
+
+_local = threading.local()
+_lock = threading.Lock()
+_totals = {}   # stage -> [calls, seconds, max seconds, rss delta bytes, rows, payload bytes]
+_reruns = [0, 0.0]
+
+
+def setup_logging():
+    """Log the "dashboard.*" loggers to stderr at INFO; the page and app.py both call it, the first call wins"""
+    root = logging.getLogger("dashboard")
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+
+def process_rss() -> int:
+    """Current resident set size in bytes (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# ---------- Stages ----------
+class Stage:
+    """Wall time, RSS delta, rows and payload bytes for one named stage; re-entering the same name accumulates"""
+    __slots__ = ("name", "rows", "bytes", "seconds", "rss_delta", "calls", "_t", "_rss")
+
+    def __init__(self, name: str):
+        self.name, self.rows, self.bytes, self.seconds, self.rss_delta, self.calls = name, None, None, 0.0, 0, 0
+
+    def __enter__(self):
+        self._rss = process_rss()
+        self._t = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds += time.perf_counter() - self._t
+        self.rss_delta += process_rss() - self._rss
+        self.calls += 1
+        return False
+
+    def add_rows(self, n: int):
+        self.rows = (self.rows or 0) + int(n)
+
+    def add_bytes(self, n: int):
+        """Bytes this stage sends to the browser (e.g. serialized figure JSON)"""
+        self.bytes = (self.bytes or 0) + int(n)
+
+class _NullStage:
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+    def add_rows(self, n: int):
+        pass
+    def add_bytes(self, n: int):
+        pass
+
+_NULL = _NullStage()
+
+
+class Run:
+    """Stages of one script run; ``finish()`` logs it and folds it into the process totals.
+
+    ``event`` names other work timed the same way, e.g. "load" for the background data load;
+    its stages count towards the stage totals but it is not counted as a rerun.
+    """
+
+    def __init__(self, session_id: Optional[str] = None, enabled: bool = ENABLED, event: str = "rerun"):
+        self.session_id, self.enabled, self.event = session_id, enabled, event
+        self.stages = {}
+        self._t = time.perf_counter()
+        if enabled:
+            _local.run = self
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _NULL
+        s = self.stages.get(name)
+        if s is None:
+            s = self.stages[name] = Stage(name)
+        return s
+
+    def finish(self, **info) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        if getattr(_local, "run", None) is self:
+            _local.run = None
+        record = {"event": self.event, "session": self.session_id, "seconds": round(time.perf_counter() - self._t, 6),
+                  **info, "stages": [{"stage": s.name, "seconds": round(s.seconds, 6), "calls": s.calls,
+                                      "rss_delta_bytes": s.rss_delta, "rows": s.rows, "bytes": s.bytes}
+                                     for s in self.stages.values()]}
+        log.info(json.dumps(record, default=str))
+        with _lock:
+            if self.event == "rerun":
+                _reruns[0] += 1
+                _reruns[1] += record["seconds"]
+            for s in self.stages.values():
+                t = _totals.setdefault(s.name, [0, 0.0, 0.0, 0, 0, 0])
+                t[0] += s.calls; t[1] += s.seconds; t[2] = max(t[2], s.seconds)
+                t[3] += s.rss_delta; t[4] += s.rows or 0; t[5] += s.bytes or 0
+        write_prometheus()
+        return record
+
+def stage(name: str):
+    """Stage of the script run active on this thread, if any; lets library code report its own stages"""
+    run = getattr(_local, "run", None)
+    return run.stage(name) if run is not None else _NULL
+
+
+# ---------- Export ----------
+def prometheus_text() -> str:
+    """Process totals in the Prometheus text exposition format, one group per metric family"""
+    pid = os.getpid()
+    with _lock:
+        reruns, stages = list(_reruns), sorted((k, list(v)) for k, v in _totals.items())
+    families = [
+        ("dashboard_reruns_total", "counter", "Script reruns recorded by this process.", [("", None, reruns[0])]),
+        ("dashboard_rerun_seconds_total", "counter", "Wall time spent in recorded reruns.", [("", None, reruns[1])]),
+        ("dashboard_stage_seconds", "summary", "Wall time per rerun stage.",
+         [(suffix, n, v) for n, t in stages for suffix, v in (("_sum", t[1]), ("_count", t[0]))]),
+        ("dashboard_stage_seconds_max", "gauge", "Slowest single rerun per stage.", [("", n, t[2]) for n, t in stages]),
+        ("dashboard_stage_rss_delta_bytes_total", "counter", "Resident memory change summed per stage.",
+         [("", n, t[3]) for n, t in stages]),
+        ("dashboard_stage_rows_total", "counter", "Rows processed per stage.", [("", n, t[4]) for n, t in stages]),
+        ("dashboard_stage_payload_bytes_total", "counter", "Serialized bytes sent to the browser per stage.",
+         [("", n, t[5]) for n, t in stages if t[5]]),
+        ("dashboard_process_rss_bytes", "gauge", "Resident set size of this server process.", [("", None, process_rss())]),
+    ]
+    lines = []
+    for family, kind, help_, samples in families:
+        lines += [f"# HELP {family} {help_}", f"# TYPE {family} {kind}"]
+        for suffix, name, value in samples:
+            labels = f'pid="{pid}"' + (f',stage="{name}"' if name else "")
+            value = f"{value:.6g}" if isinstance(value, float) else value
+            lines.append(f"{family}{suffix}{{{labels}}} {value}")
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path: Optional[str] = None) -> bool:
+    path = (METRICS_FILE if path is None else path).replace("{pid}", str(os.getpid()))
+    if not path:
+        return False
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            f.write(prometheus_text())
+        os.replace(tmp, path)
+        return True
+    except OSError as e:
+        log.warning("could not write metrics file %s: %s", path, e)
+        return False
+
+def totals() -> list:
+    """Process-wide per-stage totals, for the admin panel"""
+    with _lock:
+        return [{"stage": name, "calls": calls, "mean_seconds": secs / calls if calls else 0.0,
+                 "max_seconds": peak, "rss_delta_bytes": rss, "rows": rows, "payload_bytes": payload}
+                for name, (calls, secs, peak, rss, rows, payload) in _totals.items()]
+
+def is_admin(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(str(token or ""), ADMIN_TOKEN)
@@ -0,0 +1,202 @@
+# partitions.py — a date-partitioned dataset directory, loaded in parallel with a cache per partition
+#
+#   data/event_date=2025-01/part-0.csv
+#   data/event_date=2025-02/export.parquet
+#   ...
+#
+# Each event_date=<period> directory (a month, or a day like 2025-01-15) is normalized on its own
+# and cached as _partition.cache.parquet inside it, so adding a month only ingests that month.
+# Files and directories starting with "_" or "." are ignored, as Hive-style readers do.
+import glob
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+import data_loader
+
+log = logging.getLogger("dashboard.partitions")
+
+PARTITION_RE = re.compile(r"^event_date=(\d{4}-\d{2}(?:-\d{2})?)$")
+DATA_PATTERNS = ["*.csv", "*.parquet"]
+CACHE_NAME = "_partition"  # + data_loader.SIDECAR_SUFFIX
+# Processes parsing uncached partitions at once; 0 uses every core, 1 parses in this process.
+WORKERS = int(os.environ.get("DASHBOARD_INGEST_WORKERS", "0"))
+
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    path: str
+    start: pd.Timestamp
+    end: pd.Timestamp
+    files: tuple
+
+    @property
+    def cache_path(self) -> str:
+        return data_loader.sidecar_path(os.path.join(self.path, CACHE_NAME))
+
+def is_partitioned(path: str) -> bool:
+    return os.path.isdir(path)
+
+def discover(root: str) -> list:
+    """Partitions under ``root`` in date order; directories without data files are skipped"""
+    parts = []
+    for entry in sorted(os.listdir(root)):
+        m = PARTITION_RE.match(entry)
+        path = os.path.join(root, entry)
+        if not m or not os.path.isdir(path):
+            continue
+        files = sorted(f for pat in DATA_PATTERNS for f in glob.glob(os.path.join(path, pat))
+                       if not os.path.basename(f).startswith(("_", ".")))
+        if files:
+            period = pd.Period(m.group(1), freq="D" if len(m.group(1)) == 10 else "M")
+            parts.append(Partition(entry, path, period.start_time, period.end_time, tuple(files)))
+    return sorted(parts, key=lambda p: p.start)
+
+def prune(parts: list, start=None, end=None) -> list:
+    """Partitions whose period overlaps [start, end]; a missing bound is open"""
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    return [p for p in parts if (start is None or p.end >= start) and (end is None or p.start <= end)]
+
+
+# ---------- Per-partition cache ----------
+def partition_fingerprint(part: Partition, key: dict) -> dict:
+    files = {}
+    for f in part.files:
+        st_ = os.stat(f)
+        files[os.path.basename(f)] = {"size": st_.st_size, "mtime_ns": st_.st_mtime_ns,
+                                      "sha256": data_loader.file_hash(f)}
+    return {"version": data_loader.LOADER_VERSION, **key, "files": files}
+
+def cache_is_valid(part: Partition, meta: Optional[dict], key: dict) -> bool:
+    """Same files, settings and loader version as when the cache was written.
+
+    As for data.csv, size + mtime is the cheap check and the content hash settles a file whose
+    mtime moved (deploys reset mtimes).
+    """
+    if not meta or meta.get("version") != data_loader.LOADER_VERSION:
+        return False
+    if any(meta.get(k) != v for k, v in key.items()):
+        return False
+    files = meta.get("files", {})
+    if sorted(files) != sorted(os.path.basename(f) for f in part.files):
+        return False
+    for f in part.files:
+        st_, m = os.stat(f), files[os.path.basename(f)]
+        if st_.st_size != m["size"]:
+            return False
+        if st_.st_mtime_ns != m["mtime_ns"] and data_loader.file_hash(f) != m["sha256"]:
+            return False
+    return True
+
+def restamp(part: Partition, meta: dict) -> Optional[dict]:
+    """``meta`` with the files' current mtimes, or None when none moved.
+
+    Only for a fingerprint cache_is_valid() accepted, so any moved mtime had its hash matched;
+    writing it back spares the next start hashing the file again.
+    """
+    files = {os.path.basename(f): {**meta["files"][os.path.basename(f)], "mtime_ns": os.stat(f).st_mtime_ns}
+             for f in part.files}
+    return None if files == meta["files"] else {**meta, "files": files}
+
+def read_cache(part: Partition, key: dict) -> Optional[tuple]:
+    """(frame, fingerprint) from the partition's cache, or None when it is missing or stale"""
+    meta = data_loader.read_sidecar_meta(part.cache_path)
+    if not cache_is_valid(part, meta, key):
+        return None
+    try:
+        df = data_loader.pq.read_table(part.cache_path).to_pandas()
+    except Exception as e:
+        log.warning("partition cache %s failed to load, re-parsing: %s", part.cache_path, e)
+        return None
+    fresh = restamp(part, meta)
+    if fresh is not None and data_loader.write_sidecar(os.path.join(part.path, CACHE_NAME), df, fresh):
+        meta = fresh
+    return df, meta
+
+def load_partition(part: Partition, mode: str, states, chunk_size: Optional[int] = None) -> tuple:
+    """(frame, fingerprint) for one partition, from its cache when still valid"""
+    key = data_loader.ingest_key(mode, states)
+    cached = read_cache(part, key)
+    if cached is not None:
+        return cached
+    # Fingerprint first, so a file rewritten mid-parse invalidates the cache on the next load.
+    fingerprint = partition_fingerprint(part, key)
+    frames = [f for f in (data_loader.read_file(f, mode, states, chunk_size) for f in part.files) if len(f)]
+    df = _concat(frames)
+    data_loader.write_sidecar(os.path.join(part.path, CACHE_NAME), df, fingerprint)
+    log.info("ingested partition %s (%s files, %s rows)", part.name, len(part.files), len(df))
+    return df, fingerprint
+
+def _load_partition_job(args):
+    return load_partition(*args)
+
+def _concat(frames: list) -> pd.DataFrame:
+    if not frames:
+        return data_loader.empty_frame()
+    # Files exported with different headers keep only the columns they all have.
+    common = [c for c in frames[0].columns if all(c in f.columns for f in frames[1:])]
+    return data_loader.concat_encoded([f[common] for f in frames])
+
+
+# ---------- Loading ----------
+def load_frames(parts: list, mode: Optional[str] = None, states=None, chunk_size: Optional[int] = None,
+                workers: Optional[int] = None) -> dict:
+    """{name: (frame, fingerprint)}: cached partitions read here, the rest parsed in a process pool"""
+    mode, states = data_loader.resolve_ingest(mode, states)
+    key = data_loader.ingest_key(mode, states)
+    out, todo = {}, []
+    for p in parts:
+        cached = read_cache(p, key)
+        if cached is not None:
+            out[p.name] = cached
+        else:
+            todo.append(p)
+    workers = min(len(todo), (workers if workers is not None else WORKERS) or os.cpu_count() or 1)
+    if workers > 1:
+        # Spawned rather than forked: a fork of the threaded Streamlit server can deadlock.
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=ctx) as pool:
+            jobs = [(p, mode, states, chunk_size) for p in todo]
+            for p, result in zip(todo, pool.map(_load_partition_job, jobs)):
+                out[p.name] = result
+    else:
+        for p in todo:
+            out[p.name] = load_partition(p, mode, states, chunk_size)
+    return {p.name: out[p.name] for p in parts}
+
+def load_partitioned(root: str, mode: Optional[str] = None, states=None, chunk_size: Optional[int] = None,
+                     start=None, end=None, names=None, workers: Optional[int] = None) -> pd.DataFrame:
+    """The normalized, state-filtered rows of the partitions overlapping [start, end] (all by default).
+
+    ``names`` restricts the load to those partitions. ``df.attrs["fingerprint"]`` maps each
+    loaded partition to the fingerprint its rows were built from.
+    """
+    mode, states = data_loader.resolve_ingest(mode, states)
+    parts = prune(discover(root), start, end)
+    if names is not None:
+        parts = [p for p in parts if p.name in names]
+    loaded = load_frames(parts, mode, states, chunk_size, workers)
+    df = _concat([f for f, _ in loaded.values() if len(f)])
+    df = df.sort_values("event_date", kind="stable", na_position="last", ignore_index=True)
+    df.attrs.update(source="partitions", fingerprint={**data_loader.ingest_key(mode, states),
+                                                      "partitions": {n: fp for n, (_, fp) in loaded.items()}})
+    log.info("loaded %s rows from %s partitions of %s", len(df), len(parts), root)
+    return df
+
+def changes(root: str, fingerprint: Optional[dict], key: dict) -> tuple:
+    """(added, changed) partition names since ``fingerprint``; removed partitions count as changed"""
+    have = (fingerprint or {}).get("partitions", {})
+    if not fingerprint or any(fingerprint.get(k) != v for k, v in key.items()):
+        return [], ["*"]
+    parts = {p.name: p for p in discover(root)}
+    added = [n for n in parts if n not in have]
+    changed = [n for n in have if n not in parts or not cache_is_valid(parts[n], have[n], key)]
+    return added, changed
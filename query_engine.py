@@ -0,0 +1,619 @@
+# query_engine.py — the queries behind the three tabs, over pandas or an embedded columnar engine
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import data_loader
+import metrics
+import partitions
+import shared_dataset
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet exports and the DuckDB engine need it; data_loader copes without
+    pa = pq = None
+
+log = logging.getLogger("dashboard.engine")
+
+# "pandas": in-memory frame + per-day cube (the default for data.csv).
+# "duckdb": DuckDB queries Parquet parts built from data.csv, multithreaded and spilling to
+#           disk, so the dataset never has to fit in the server's memory (the default for a
+#           partition directory, as only it skips the partitions outside a date range).
+ENGINE = os.environ.get("DASHBOARD_QUERY_ENGINE", "").strip().lower()
+DUCKDB_MEMORY_LIMIT = os.environ.get("DASHBOARD_DUCKDB_MEMORY", "")
+PARTS_SUFFIX = ".engine"
+MANIFEST = "manifest.json"
+SRC = "read_parquet($parts)"
+# Trailing appended parts smaller than COMPACT_BYTES are merged into one once there are
+# COMPACT_PARTS of them or they add up to COMPACT_BYTES, so frequent small appends keep the
+# number of files a query opens bounded.
+COMPACT_PARTS = 8
+COMPACT_BYTES = 64 << 20
+EXPORT_CHUNK_ROWS = 100_000  # rows per slice when the pandas engine streams an export
+EXPORT_DATE_FORMAT = "%Y-%m-%d"  # event_date in CSV exports, identical for both engines
+
+
+def options_from(df, primary, fallback=None):
+    for col in (primary, fallback):
+        if not col or col not in df.columns:
+            continue
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            # Encoded columns already carry their distinct, stripped, sorted values
+            vals = df[col].cat.categories.tolist()
+        else:
+            vals = sorted(df[col].dropna().astype("string").str.strip().unique().tolist())
+        if any(v != "" for v in vals):
+            return ["All"] + vals
+    return ["All"]
+
+
+# ---------- Export ----------
+def _plain(frame: pd.DataFrame, fmt: str) -> pd.DataFrame:
+    """Categoricals and objects as strings, so every slice of an export has the same schema"""
+    plain = frame.astype({c: "string" for c in frame.columns
+                          if isinstance(frame[c].dtype, pd.CategoricalDtype) or frame[c].dtype == object})
+    if fmt == "csv" and "event_date" in plain.columns:
+        plain["event_date"] = plain["event_date"].dt.strftime(EXPORT_DATE_FORMAT)
+    return plain
+
+def write_chunks(frames, path: str, fmt: str) -> int:
+    """Write an iterable of frames to one CSV or Parquet file, a slice at a time; returns the row count.
+
+    The first frame (possibly empty) sets the header and schema. The file appears at ``path``
+    only once complete.
+    """
+    tmp, rows, writer = path + ".tmp", 0, None
+    try:
+        with open(tmp, "w" if fmt == "csv" else "wb", newline="" if fmt == "csv" else None) as f:
+            for i, frame in enumerate(frames):
+                plain = _plain(frame, fmt)
+                if fmt == "csv":
+                    plain.to_csv(f, header=i == 0, index=False)
+                else:
+                    table = pa.Table.from_pandas(plain, preserve_index=False)
+                    if writer is None:
+                        # Plain string columns and no pandas metadata: the same file DuckDB's COPY writes.
+                        writer = pq.ParquetWriter(f, pa.schema([
+                            (fd.name, pa.string() if pa.types.is_large_string(fd.type) else fd.type)
+                            for fd in table.schema]))
+                    writer.write_table(table.cast(writer.schema))
+                rows += len(frame)
+            if writer is not None:
+                writer.close()
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return rows
+
+
+# ---------- pandas ----------
+class PandasView:
+    """One consistent (data, cube) snapshot; every method matches the original inline pandas.
+
+    ``distinct`` is "exact" or, on views from ``approximate()``, "approximate": unique-user
+    counts then come from the cube's HyperLogLog sketches, within ``distinct_error``.
+    """
+    distinct = "exact"
+
+    def __init__(self, version: int, data, cube: Optional[aggregates.Cube]):
+        if isinstance(data, pd.DataFrame):
+            data = data_loader.ChunkedFrame.of(data)
+        self.version, self.data, self.cube = version, data, cube
+
+    def approximate(self) -> Optional["PandasView"]:
+        """The same snapshot answering unique counts from sketches, or None when none were built"""
+        if self.cube is None or self.cube.precision is None:
+            return None
+        view = PandasView(self.version, self.data, self.cube)
+        view.distinct = "approximate"
+        return view
+
+    @property
+    def distinct_error(self) -> float:
+        """Relative standard error of unique counts (0.0 when exact)"""
+        return aggregates.hll_error(self.cube.precision) if self.distinct == "approximate" else 0.0
+
+    def is_empty(self) -> bool:
+        return self.data.empty
+
+    def date_bounds(self):
+        return aggregates.date_bounds(self.cube)
+
+    def options(self, column: str) -> list:
+        # Each part's categories are its own values; the options are their union.
+        vals = {v for part in self.data.parts for v in options_from(part, column)[1:]}
+        return ["All"] + sorted(vals)
+
+    def kpi_counts(self, start, end, browser="All") -> dict:
+        return aggregates.kpi_counts(self.cube, start, end, browser)
+
+    def monthly_unique(self, start, end, browser="All", event_type=None, by=None, freq="month") -> pd.DataFrame:
+        return aggregates.monthly_unique(self.cube, start, end, browser, event_type, by=by,
+                                         approximate=self.distinct == "approximate", freq=freq)
+
+    def unique_by(self, by, start, end, browser="All", event_type=None) -> pd.DataFrame:
+        return aggregates.unique_by(self.cube, by, start, end, browser, event_type,
+                                    approximate=self.distinct == "approximate")
+
+    def has_values(self, column, start, end, browser="All", event_type=None) -> bool:
+        return aggregates.has_values(self.cube, column, start, end, browser, event_type)
+
+    def export_rows(self, path: str, fmt: str, start, end, browser="All", event_types=None) -> int:
+        """Write the window's rows to ``path`` as CSV or Parquet; returns how many were written.
+
+        Each part of the data is sorted by event_date, so its window is two binary searches and
+        is filtered EXPORT_CHUNK_ROWS rows at a time: memory stays flat however many rows match.
+        """
+        types = [t.lower() for t in event_types or []]
+        # Only the dashboard's columns, whatever else the ingest mode kept (DuckDB's parts hold just these).
+        cols = data_loader.DASHBOARD_COLUMNS
+
+        def chunks():
+            yield self.data.parts[0].iloc[:0][cols]
+            for part in self.data.parts:
+                dates = part["event_date"].to_numpy()
+                lo = np.searchsorted(dates, pd.Timestamp(start).to_datetime64(), "left")
+                hi = np.searchsorted(dates, pd.Timestamp(end).to_datetime64(), "right")
+                for i in range(lo, hi, EXPORT_CHUNK_ROWS):
+                    # Rows first, then columns: selecting columns from the whole part would copy it
+                    # (pandas < 3 without copy-on-write, as in export.py).
+                    chunk = part.iloc[i:min(i + EXPORT_CHUNK_ROWS, hi)][cols]
+                    keep = np.ones(len(chunk), dtype=bool)
+                    if browser != "All":
+                        keep &= (chunk["browser"] == browser).to_numpy(dtype=bool, na_value=False)
+                    if types:
+                        keep &= chunk["event_type"].isin(types).to_numpy(dtype=bool)
+                    yield chunk[keep]
+        return write_chunks(chunks(), path, fmt)
+
+
+class PandasEngine:
+    """The process's in-memory dataset and cube (shared_dataset.DatasetStore).
+
+    A partition directory is loaded whole: every date range, narrowed or not, is answered from
+    the date-indexed cube. Partition directories therefore default to the DuckDB engine, which
+    prunes them by date range; this one only serves them when DASHBOARD_QUERY_ENGINE=pandas.
+    """
+
+    def __init__(self, csv_path: str = data_loader.CSV_PATH):
+        self.store = shared_dataset.DatasetStore(csv_path)
+
+    def refresh(self, force: bool = False) -> bool:
+        return self.store.refresh(force)
+
+    @property
+    def version(self) -> int:
+        return self.store.version
+
+    @property
+    def refresh_seconds(self) -> float:
+        return self.store.refresh_seconds
+
+    def view(self) -> PandasView:
+        return PandasView(*self.store.snapshot())
+
+    def is_cached(self) -> bool:
+        return shared_dataset.is_cached(self.store.csv_path)
+
+
+# ---------- DuckDB ----------
+def _to_arrow(df: pd.DataFrame):
+    """Categoricals back to strings and a fixed schema, so every Parquet part reads as one table"""
+    cols = data_loader.DASHBOARD_COLUMNS
+    schema = pa.schema([(c, pa.timestamp("us") if c == "event_date" else pa.string()) for c in cols])
+    plain = df.astype({c: "string" for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+    return pa.Table.from_pandas(plain[cols], preserve_index=False).cast(schema)
+
+class DuckDBView:
+    """The same queries as PandasView, answered by DuckDB straight from the Parquet parts"""
+    distinct = "exact"
+    distinct_error = 0.0
+
+    def __init__(self, version: int, con, parts: list, bounds: Optional[list] = None):
+        self.version, self._con, self._parts, self._bounds = version, con, parts, bounds
+
+    def approximate(self) -> None:
+        # Sketches live in the pandas cube; the DuckDB engine always counts exactly.
+        return None
+
+    def _query(self, sql: str, params: Optional[dict] = None) -> pd.DataFrame:
+        params = params or {}
+        parts = self._parts
+        if self._bounds is not None and "start" in params:
+            # Date partitions outside the window are never opened; one part keeps the query valid.
+            parts = [p for p, (lo, hi) in zip(self._parts, self._bounds)
+                     if hi >= params["start"] and lo <= params["end"]] or self._parts[:1]
+        cur = self._con.cursor()
+        try:
+            return cur.execute(sql, {"parts": parts, **params}).df()
+        finally:
+            cur.close()
+
+    @staticmethod
+    def _where(start, end, browser="All", event_type=None, column=None):
+        clauses = ["event_date BETWEEN $start AND $end"]
+        params = {"start": pd.Timestamp(start).to_pydatetime(), "end": pd.Timestamp(end).to_pydatetime()}
+        if browser != "All":
+            clauses.append("browser = $browser"); params["browser"] = browser
+        if event_type:
+            clauses.append("event_type = $event_type"); params["event_type"] = event_type.lower()
+        if column:
+            clauses.append(f'"{column}" IS NOT NULL')
+        return " AND ".join(clauses), params
+
+    def is_empty(self) -> bool:
+        return not self._parts or int(self._query(f"SELECT count(*) AS n FROM {SRC}")["n"].iloc[0]) == 0
+
+    def date_bounds(self):
+        r = self._query(f"SELECT min(event_date) AS lo, max(event_date) AS hi FROM {SRC}").iloc[0]
+        return pd.Timestamp(r["lo"]), pd.Timestamp(r["hi"])
+
+    def options(self, column: str) -> list:
+        vals = self._query(f'SELECT DISTINCT "{column}" AS v FROM {SRC} WHERE "{column}" IS NOT NULL ORDER BY v')["v"].tolist()
+        return ["All"] + vals if any(v != "" for v in vals) else ["All"]
+
+    def kpi_counts(self, start, end, browser="All") -> dict:
+        where, params = self._where(start, end, browser)
+        t = self._query(f"SELECT event_type, count(*) AS n, count(traffic_source) AS traffic FROM {SRC} "
+                        f"WHERE {where} GROUP BY event_type", params)
+        by_type = dict(zip(t["event_type"], t["n"]))
+        c = {e: int(by_type.get(e, 0)) for e in aggregates.EVENT_TYPES}
+        c.update(rows=int(t["n"].sum()), traffic=int(t["traffic"].sum()))
+        return aggregates.counts_from_totals(c)
+
+    def monthly_unique(self, start, end, browser="All", event_type=None, by=None, freq="month") -> pd.DataFrame:
+        if freq not in aggregates.GRANULARITIES:
+            raise ValueError(f"unknown granularity {freq!r} (expected one of {', '.join(aggregates.GRANULARITIES)})")
+        where, params = self._where(start, end, browser, event_type, by)
+        keys = "period" + (f', "{by}"' if by else "")
+        # date_trunc('week') is the ISO week, starting on Monday like pandas' weekly periods.
+        out = self._query(f"SELECT date_trunc('{freq}', event_date) AS {keys}, count(DISTINCT user_id) AS unique_ids "
+                          f"FROM {SRC} WHERE {where} GROUP BY {keys} ORDER BY {keys}", params)
+        # DuckDB hands timestamps back in microseconds; the pandas engine's periods are nanoseconds.
+        out["period"] = out["period"].astype("datetime64[ns]")
+        if by:
+            out[by] = out[by].astype("string")
+        return out
+
+    def unique_by(self, by, start, end, browser="All", event_type=None) -> pd.DataFrame:
+        where, params = self._where(start, end, browser, event_type, by)
+        out = self._query(f'SELECT "{by}", count(DISTINCT user_id) AS unique_ids FROM {SRC} WHERE {where} '
+                          f'GROUP BY "{by}" ORDER BY "{by}"', params)
+        out[by] = out[by].astype("string")
+        return out.sort_values("unique_ids", ascending=False)
+
+    def has_values(self, column, start, end, browser="All", event_type=None) -> bool:
+        where, params = self._where(start, end, browser, event_type, column)
+        return bool(self._query(f"SELECT count(*) > 0 AS ok FROM {SRC} WHERE {where}", params)["ok"].iloc[0])
+
+    def export_rows(self, path: str, fmt: str, start, end, browser="All", event_types=None) -> int:
+        """Same rows and columns as PandasView.export_rows, streamed by DuckDB's COPY.
+
+        Rows keep the order of the Parquet parts (data.csv order) rather than being sorted by date.
+        """
+        where, params = self._where(start, end, browser)
+        if event_types:
+            where += " AND list_contains($event_types, event_type)"
+            params["event_types"] = [t.lower() for t in event_types]
+        if fmt == "csv":
+            select = f"* REPLACE (strftime(event_date, '{EXPORT_DATE_FORMAT}') AS event_date)"
+            options = "FORMAT csv, HEADER"
+        else:
+            select, options = "*", "FORMAT parquet"
+        tmp = path + ".tmp"
+        target = tmp.replace("'", "''")
+        try:
+            out = self._query(f"COPY (SELECT {select} FROM {SRC} WHERE {where}) TO '{target}' ({options})", params)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return int(out.iloc[0, 0])
+
+
+class DuckDBEngine:
+    """Keeps ``data.csv.engine/`` in step with the CSV and hands out DuckDB views over it.
+
+    The CSV is converted once with the chunked loader (bounded memory), one Parquet row group
+    per chunk; appended rows become an extra part file, and a rewrite starts a new generation.
+    A directory of date partitions gets one part per partition, rewritten only when that
+    partition changes, and each query opens just the parts overlapping its date window.
+    """
+
+    def __init__(self, csv_path: str = data_loader.CSV_PATH, refresh_seconds: float = shared_dataset.REFRESH_SECONDS):
+        # Imported here rather than with the module, so a pandas-engine cold start never pays for it.
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("DASHBOARD_QUERY_ENGINE=duckdb needs the duckdb package") from None
+        self.csv_path = csv_path.rstrip(os.sep)
+        self.partitioned = partitions.is_partitioned(self.csv_path)
+        self.dir = self.csv_path + PARTS_SUFFIX
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._manifest = None
+        self.version = 0
+        self._con = duckdb.connect()
+        spill = os.path.join(self.dir, "spill").replace("'", "''")
+        self._con.execute(f"SET temp_directory = '{spill}'")
+        if DUCKDB_MEMORY_LIMIT:
+            limit = DUCKDB_MEMORY_LIMIT.replace("'", "''")
+            self._con.execute(f"SET memory_limit = '{limit}'")
+
+    def _key(self) -> dict:
+        return data_loader.ingest_key("chunked", data_loader.resolve_ingest()[1])
+
+    def _write_part(self, table, gen: int, seq: int) -> str:
+        path = os.path.join(self.dir, f"part-{gen:04d}-{seq:05d}.parquet")
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        return os.path.basename(path)
+
+    def _save(self, manifest: dict, changed: bool = True):
+        with open(os.path.join(self.dir, MANIFEST + ".tmp"), "w") as f:
+            json.dump(manifest, f)
+        os.replace(os.path.join(self.dir, MANIFEST + ".tmp"), os.path.join(self.dir, MANIFEST))
+        self._manifest = manifest
+        self.version += changed
+
+    def _rebuild(self, gen: int):
+        os.makedirs(self.dir, exist_ok=True)
+        fingerprint = data_loader.file_fingerprint(self.csv_path, key=self._key())
+        name = f"part-{gen:04d}-00000.parquet"
+        writer = None
+        with data_loader.open_prefix(self.csv_path, fingerprint["size"]) as f:
+            for chunk in data_loader.iter_chunks(f, data_loader.read_header(self.csv_path)):
+                table = _to_arrow(chunk)
+                if writer is None:
+                    writer = pq.ParquetWriter(os.path.join(self.dir, name + ".tmp"), table.schema)
+                writer.write_table(table)
+        parts = []
+        if writer is not None:
+            writer.close()
+            os.replace(os.path.join(self.dir, name + ".tmp"), os.path.join(self.dir, name))
+            parts.append(name)
+        self._save({"generation": gen, "fingerprint": fingerprint, "parts": parts})
+        for old in glob.glob(os.path.join(self.dir, "part-*.parquet")):
+            if int(os.path.basename(old).split("-")[1]) < gen - 1:
+                os.remove(old)
+        log.info("built %s from %s (generation %s)", self.dir, self.csv_path, gen)
+
+    def _sync_partitions(self):
+        if self._manifest is None:
+            try:
+                with open(os.path.join(self.dir, MANIFEST)) as f:
+                    self._manifest = json.load(f)
+                self.version += 1
+            except (OSError, ValueError):
+                pass
+        key = self._key()
+        m = self._manifest if self._manifest and self._manifest.get("key") == key else {"key": key, "partitions": {}}
+        have = m["partitions"]
+        current = {p.name: p for p in partitions.discover(self.csv_path)}
+        stale = [p for n, p in current.items()
+                 if n not in have or not partitions.cache_is_valid(p, have[n]["fingerprint"], key)]
+        if self._manifest is m and not stale and set(have) == set(current):
+            # Deploys reset mtimes: record the new ones once the hashes matched, without a new version.
+            fresh = {n: partitions.restamp(current[n], e["fingerprint"]) for n, e in have.items()}
+            if any(fresh.values()):
+                self._save({**m, "partitions": {n: {**e, "fingerprint": fresh[n]} if fresh[n] else e
+                                                for n, e in have.items()}}, changed=False)
+            return
+        os.makedirs(self.dir, exist_ok=True)
+        entries = {n: e for n, e in have.items() if n in current}
+        for name, (frame, fingerprint) in partitions.load_frames(stale, "chunked", key["states"]).items():
+            part = None
+            if len(frame):
+                part = f"part-{name}.parquet"
+                pq.write_table(_to_arrow(frame), os.path.join(self.dir, part + ".tmp"))
+                os.replace(os.path.join(self.dir, part + ".tmp"), os.path.join(self.dir, part))
+            entries[name] = {"fingerprint": fingerprint, "part": part,
+                             "start": str(current[name].start), "end": str(current[name].end)}
+        self._save({"key": key, "partitions": dict(sorted(entries.items()))})
+        for old in glob.glob(os.path.join(self.dir, "part-event_date=*.parquet")):
+            if os.path.basename(old)[len("part-"):-len(".parquet")] not in entries:
+                os.remove(old)
+        log.info("synced %s: %s of %s partitions rebuilt", self.dir, len(stale), len(current))
+
+    def _sync(self):
+        if self.partitioned:
+            return self._sync_partitions()
+        if self._manifest is None:
+            try:
+                with open(os.path.join(self.dir, MANIFEST)) as f:
+                    self._manifest = json.load(f)
+                self.version += 1
+            except (OSError, ValueError):
+                self._rebuild(0)
+                return
+        m = self._manifest
+        status = data_loader.csv_status(self.csv_path, m["fingerprint"], self._key())
+        if status == "unchanged":
+            fresh = data_loader.restamp(self.csv_path, m["fingerprint"])
+            if fresh is not None:
+                self._save({**m, "fingerprint": fresh}, changed=False)
+            return
+        if status == "changed":
+            self._rebuild(m["generation"] + 1)
+            return
+        rows, end = data_loader.read_csv_tail(self.csv_path, m["fingerprint"]["size"], "chunked", data_loader.resolve_ingest()[1])
+        if end == m["fingerprint"]["size"]:
+            return
+        parts, seq, retired = list(m["parts"]), m.get("seq", len(m["parts"])), m.get("retired", [])
+        if rows is not None and len(rows):
+            parts.append(self._write_part(_to_arrow(rows), m["generation"], seq))
+            seq += 1
+            small = self._small_parts(parts)
+            if len(small) >= COMPACT_PARTS or sum(small.values()) >= COMPACT_BYTES:
+                # Files merged last time go now; views taken before that compaction may still read them.
+                for old in retired:
+                    if os.path.exists(os.path.join(self.dir, old)):
+                        os.remove(os.path.join(self.dir, old))
+                merged = pa.concat_tables([pq.read_table(os.path.join(self.dir, p)) for p in small])
+                parts = parts[:-len(small)] + [self._write_part(merged, m["generation"], seq)]
+                seq, retired = seq + 1, list(small)
+                log.info("merged %s appended parts of %s", len(small), self.dir)
+        fingerprint = data_loader.file_fingerprint(self.csv_path, with_hash=False, key=self._key(), size=end)
+        self._save({**m, "fingerprint": fingerprint, "parts": parts, "seq": seq, "retired": retired})
+
+    def _small_parts(self, parts: list) -> dict:
+        """{name: bytes} of the trailing appended parts below COMPACT_BYTES, oldest first"""
+        small = {}
+        for name in reversed(parts[1:]):
+            size = os.path.getsize(os.path.join(self.dir, name))
+            if size >= COMPACT_BYTES:
+                break
+            small[name] = size
+        return dict(reversed(small.items()))
+
+    def refresh(self, force: bool = False) -> bool:
+        if self._manifest is None or (not force and (self.refresh_seconds <= 0 or
+                                                     time.time() - self._checked < self.refresh_seconds)):
+            return False
+        with self._lock:
+            before = self.version
+            self._checked = time.time()
+            self._sync()
+            return self.version != before
+
+    def is_cached(self) -> bool:
+        return os.path.exists(os.path.join(self.dir, MANIFEST))
+
+    def view(self) -> DuckDBView:
+        with self._lock:
+            if self._manifest is None:
+                self._checked = time.time()
+                self._sync()
+            m = self._manifest
+        if self.partitioned:
+            entries = [e for e in m["partitions"].values() if e["part"]]
+            return DuckDBView(self.version, self._con, [os.path.join(self.dir, e["part"]) for e in entries],
+                              [(pd.Timestamp(e["start"]).to_pydatetime(), pd.Timestamp(e["end"]).floor("us").to_pydatetime())
+                               for e in entries])
+        return DuckDBView(self.version, self._con, [os.path.join(self.dir, p) for p in m["parts"]])
+
+
+def engine_kind(csv_path: str = data_loader.CSV_PATH, kind: Optional[str] = None) -> str:
+    """``kind``, else DASHBOARD_QUERY_ENGINE, else "duckdb" for a partition directory and "pandas" for a CSV"""
+    return kind or ENGINE or ("duckdb" if partitions.is_partitioned(csv_path) else "pandas")
+
+def make_engine(kind: Optional[str] = None, csv_path: str = data_loader.CSV_PATH):
+    kind = engine_kind(csv_path, kind)
+    if kind == "duckdb":
+        return DuckDBEngine(csv_path)
+    if kind != "pandas":
+        raise ValueError(f"unknown DASHBOARD_QUERY_ENGINE {kind!r} (expected 'pandas' or 'duckdb')")
+    return PandasEngine(csv_path)
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_engine():
+    """The process's engine for DASHBOARD_DATA, created once; every session and the startup warm-up use it"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = make_engine(csv_path=data_loader.CSV_PATH)
+        return _shared
+
+
+# ---------- Background load ----------
+class BackgroundLoad:
+    """The shared engine's first load, run once in a background thread that every session polls.
+
+    Sessions never wait on it: until ``ready``, ``preview`` is a PandasView over the most recent
+    PREVIEW_DAYS days (only built when the load has no cache to start from, and None until then).
+    A failure is kept in ``error`` for every session to show; ``start(retry=True)`` runs it again.
+    """
+
+    def __init__(self, preview_days: int = shared_dataset.PREVIEW_DAYS):
+        self.preview_days = preview_days
+        self.engine = None
+        self.preview = None
+        self.error = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, retry: bool = False):
+        with self._lock:
+            if self._thread is not None and not (retry and self.error is not None):
+                return
+            self.error = None
+            self._thread = threading.Thread(target=self._run, name="dashboard-load", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        t0 = time.perf_counter()
+        # No script run is active on this thread, so the load records its own stages (ingest,
+        # state filter, cube), logged and exported like a rerun's (DASHBOARD_METRICS).
+        run = metrics.Run(event="load")
+        error = None
+        try:
+            self.engine = engine = shared_engine()
+            if self.preview_days > 0 and self.preview is None and not engine.is_cached():
+                try:
+                    with run.stage("load_preview") as s:
+                        preview = shared_dataset.load_preview(data_loader.CSV_PATH, self.preview_days)
+                        s.add_rows(len(preview[0]) if preview is not None else 0)
+                    if preview is not None:
+                        # Version 0: full views start at 1, so cached tabs never mix the two.
+                        self.preview = PandasView(0, *preview)
+                        log.info("preview of the last %s days ready in %.2fs (%s rows)", self.preview_days,
+                                 time.perf_counter() - t0, len(preview[0]))
+                except Exception as e:
+                    log.warning("preview failed, waiting for the full load: %s", e)
+            with run.stage("load_dataset") as s:
+                view = engine.view()
+                if hasattr(view, "data"):
+                    s.add_rows(len(view.data))
+            self._ready.set()
+            log.info("dataset loaded in %.2fs", time.perf_counter() - t0)
+        except Exception as e:
+            log.exception("loading %s failed", data_loader.CSV_PATH)
+            self.error = error = e
+        finally:
+            run.finish(engine=type(self.engine).__name__, data=data_loader.CSV_PATH,
+                       error=None if error is None else str(error))
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def status(self) -> str:
+        """One of "ready", "failed", "preview" or "loading"; sessions rerun when it changes"""
+        if self.ready:
+            return "ready"
+        if self.error is not None:
+            return "failed"
+        return "preview" if self.preview is not None else "loading"
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the current attempt finishes; True when the data is loaded"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.ready
+
+_load = None
+
+def shared_load() -> BackgroundLoad:
+    """The process's background load of the shared engine, started on first use"""
+    global _load
+    with _shared_lock:
+        if _load is None:
+            _load = BackgroundLoad()
+    _load.start()
+    return _load
@@ -0,0 +1,319 @@
+# shared_dataset.py — one copy of the dataset per process, or per host via a memory-mapped Arrow file
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import data_loader
+import metrics
+import partitions
+import snapshot
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+log = logging.getLogger("dashboard.shared")
+
+# "process": one in-memory frame per server process, handed to every session by reference.
+# "mmap": the frame is also written to data.csv.arrow and memory-mapped, so every process on
+#         the host shares the same physical pages through the OS page cache.
+SHARED_MODE = os.environ.get("DASHBOARD_SHARED", "process").strip().lower()
+ARROW_SUFFIX = ".arrow"
+ARROW_META_KEY = b"dashboard_mapped"
+SESSION_TTL = 600  # seconds without a rerun before a session stops counting as active
+# How often to look for rows appended to data.csv; 0 turns refresh off.
+REFRESH_SECONDS = float(os.environ.get("DASHBOARD_REFRESH_SECONDS", "60"))
+# Days of recent rows shown while a cold load (no snapshot or cache yet) runs; 0 turns the preview off.
+PREVIEW_DAYS = int(os.environ.get("DASHBOARD_PREVIEW_DAYS", "30"))
+
+_lock = threading.Lock()
+_sessions = {}
+_loaded_rss = None
+
+
+# ---------- Memory-mapped Arrow layout ----------
+# Columns are stored in the exact numpy layout pandas uses (categorical codes at pandas' code
+# width, datetimes as int64) so reading them back is np.frombuffer over the mapping, not a copy.
+# Categoricals are dictionary columns: their categories are an Arrow string array in the same
+# file, mapped too, so no process parses or holds its own copy of every user_id.
+def arrow_path(csv_path: str) -> str:
+    return csv_path + ARROW_SUFFIX
+
+def write_mapped(csv_path: str, df: pd.DataFrame) -> bool:
+    if pa is None or not df.attrs.get("fingerprint"):
+        return False
+    path = arrow_path(csv_path)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fields, arrays = [], []
+    try:
+        for c in df.columns:
+            s = df[c]
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                meta = {"categories_dtype": str(s.cat.categories.dtype)}
+                codes = s.cat.codes.to_numpy()
+                # Built from the buffers so missing values keep pandas' -1 code under the validity bitmap.
+                valid = pa.py_buffer(np.packbits(codes >= 0, bitorder="little"))
+                indices = pa.Array.from_buffers(pa.from_numpy_dtype(codes.dtype), len(codes),
+                                                [valid, pa.py_buffer(codes)])
+                arr = pa.DictionaryArray.from_arrays(indices, pa.array(s.cat.categories.to_numpy(), pa.string()))
+            elif s.dtype.kind == "M" and getattr(s.dtype, "tz", None) is None:
+                meta = {"datetime": str(s.dtype)}
+                arr = pa.array(s.to_numpy().view("int64"))
+            else:
+                meta = {}
+                arr = pa.array(s, from_pandas=True)
+            fields.append(pa.field(c, arr.type, metadata={b"pandas": json.dumps(meta).encode()}))
+            arrays.append(arr)
+        schema = pa.schema(fields, metadata={ARROW_META_KEY: json.dumps(df.attrs["fingerprint"]).encode()})
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        os.replace(tmp, path)
+        return True
+    except Exception as e:
+        log.warning("could not write mapped dataset %s: %s", path, e)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+
+def open_mapped(csv_path: str, key: dict) -> Optional[pd.DataFrame]:
+    """Zero-copy frame over data.csv.arrow, or None when it is missing or stale"""
+    path = arrow_path(csv_path)
+    if pa is None or not os.path.exists(path):
+        return None
+    try:
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        fingerprint = json.loads((table.schema.metadata or {}).get(ARROW_META_KEY, b"null"))
+        if not data_loader.sidecar_is_valid(csv_path, fingerprint, key):
+            return None
+        fresh = data_loader.restamp(csv_path, fingerprint)
+        cols, mapped = {}, 0
+        for field, col in zip(table.schema, table.columns):
+            meta = json.loads((field.metadata or {}).get(b"pandas", b"{}"))
+            if col.num_chunks != 1 or not meta:
+                cols[field.name] = col.to_pandas()
+                continue
+            if "categories_dtype" in meta:
+                arr = col.chunk(0)
+                # The codes are read straight from the index buffer, -1 for missing values included.
+                values = np.frombuffer(arr.indices.buffers()[1], dtype=arr.indices.type.to_pandas_dtype(),
+                                       count=len(arr), offset=arr.indices.offset * arr.indices.type.byte_width)
+                cats = pd.Index(arr.dictionary.to_pandas(), dtype=meta["categories_dtype"], copy=False)
+                mapped += values.nbytes + arr.dictionary.nbytes
+                cols[field.name] = pd.Series(pd.Categorical.from_codes(values, categories=cats), copy=False)
+            elif "categories" in meta:
+                # Written with the categories in the field metadata: rebuild it in the mapped layout.
+                return None
+            else:
+                values = col.chunk(0).to_numpy(zero_copy_only=True)
+                mapped += values.nbytes
+                cols[field.name] = pd.Series(values.view(meta["datetime"]), copy=False)
+        df = pd.DataFrame(cols, copy=False)
+        df.attrs.update(source="mmap", fingerprint=fingerprint, mapped_bytes=mapped)
+        if fresh is not None:
+            # Replaced, not rewritten in place: this mapping (and other processes') keeps the old file.
+            df.attrs["fingerprint"] = fresh
+            if not write_mapped(csv_path, df):
+                df.attrs["fingerprint"] = fingerprint
+        return df
+    except Exception as e:
+        log.warning("ignoring unreadable mapped dataset %s: %s", path, e)
+        return None
+
+
+# ---------- Entry point ----------
+def load_dataset(csv_path: str = data_loader.CSV_PATH, **kwargs) -> pd.DataFrame:
+    """data.csv through the loader, or a directory of date partitions through partitions.py"""
+    if partitions.is_partitioned(csv_path):
+        return partitions.load_partitioned(csv_path, **kwargs)
+    return data_loader.load_dataset(csv_path, **kwargs)
+
+def load_shared(csv_path: str = data_loader.CSV_PATH, mode: Optional[str] = None,
+                frame: Optional[pd.DataFrame] = None, **kwargs) -> pd.DataFrame:
+    """Load the dataset once for this process; callers must treat the frame as read-only.
+
+    ``frame`` is an already loaded dataset (e.g. from the snapshot) to share instead of loading one.
+    """
+    global _loaded_rss
+    mode = mode or SHARED_MODE
+    df = None
+    # The mapped file is validated against data.csv's fingerprint; partition directories load per process.
+    if mode == "mmap" and not partitions.is_partitioned(csv_path):
+        key = data_loader.ingest_key(*data_loader.resolve_ingest(kwargs.get("mode"), kwargs.get("states")))
+        df = open_mapped(csv_path, key)
+        if df is None:
+            built = frame if frame is not None else load_dataset(csv_path, **kwargs)
+            # Re-open through the mapping so this process drops its private copy as well.
+            if not built.empty and write_mapped(csv_path, built):
+                df = open_mapped(csv_path, key)
+            df = built if df is None else df
+        log.info("dataset for this process came from %s", df.attrs.get("source"))
+    else:
+        df = frame if frame is not None else load_dataset(csv_path, **kwargs)
+    _loaded_rss = metrics.process_rss()
+    return df
+
+def is_cached(csv_path: str = data_loader.CSV_PATH) -> bool:
+    """Whether a snapshot, sidecar or mapped file (or every partition's cache) is there to load from.
+
+    Only checks they exist; the load still validates them against the data.
+    """
+    if partitions.is_partitioned(csv_path):
+        return all(os.path.exists(p.cache_path) for p in partitions.discover(csv_path))
+    return any(os.path.exists(p) for p in (snapshot.snapshot_path(csv_path), data_loader.sidecar_path(csv_path),
+                                           arrow_path(csv_path)))
+
+def load_preview(csv_path: str = data_loader.CSV_PATH, days: int = PREVIEW_DAYS, mode: Optional[str] = None,
+                 states=None) -> Optional[tuple]:
+    """(data, cube) for the most recent ``days`` days, or None when there are none.
+
+    Reads the end of data.csv, or only the partitions covering those days, so it is ready long
+    before a cold full load.
+    """
+    mode, states = data_loader.resolve_ingest(mode, states)
+    if partitions.is_partitioned(csv_path):
+        parts = partitions.discover(csv_path)
+        if not parts:
+            return None
+        df = partitions.load_partitioned(csv_path, mode, states, start=parts[-1].end - pd.Timedelta(days=days))
+        if not df.empty and df["event_date"].notna().any():
+            df = df.loc[df["event_date"] > df["event_date"].max() - pd.Timedelta(days=days)].reset_index(drop=True)
+    else:
+        df = data_loader.read_csv_recent(csv_path, days, mode, states)
+    if df.empty or df["event_date"].isna().all():
+        return None
+    df.attrs.update(source="preview")
+    return df, aggregates.build_cube(df)
+
+
+class DatasetStore:
+    """The process-wide dataset and its cube, refreshed in place as data.csv grows.
+
+    Readers take ``snapshot()``, an immutable (version, data, cube) tuple; a refresh builds the
+    next tuple and swaps it in, so sessions mid-render keep a consistent view.
+    """
+
+    def __init__(self, csv_path: str = data_loader.CSV_PATH, refresh_seconds: float = REFRESH_SECONDS, **kwargs):
+        self.csv_path = csv_path
+        self.refresh_seconds = refresh_seconds
+        self.kwargs = kwargs
+        self._lock = threading.Lock()
+        self._state = None
+        self._checked = 0.0
+
+    def snapshot(self):
+        state = self._state
+        if state is None:
+            with self._lock:
+                if self._state is None:
+                    self._state = self._build(0)
+                state = self._state
+        return state
+
+    @property
+    def version(self) -> int:
+        return self._state[0] if self._state else 0
+
+    def _build(self, version: int):
+        # A snapshot built at deploy time skips both the ingest and the cube build.
+        with metrics.stage("read_snapshot"):
+            snap = snapshot.load(self.csv_path, **self.kwargs)
+        if snap is not None:
+            data = load_shared(self.csv_path, frame=snap[0], **self.kwargs)
+            cube = snap[1]
+        else:
+            data = load_shared(self.csv_path, **self.kwargs)
+            if data.empty:
+                # Typed columns even without rows, so exports and appended rows find them.
+                data = data_loader.empty_frame(data.attrs)
+            with metrics.stage("build_cube"):
+                cube = aggregates.build_cube(data)
+        self._checked = time.time()
+        return version + 1, data_loader.ChunkedFrame.of(data), cube
+
+    def refresh(self, force: bool = False) -> bool:
+        """Pick up appended rows (or a rewritten file) if the refresh interval has passed"""
+        if self._state is None or (not force and (self.refresh_seconds <= 0 or
+                                                  time.time() - self._checked < self.refresh_seconds)):
+            return False
+        with self._lock:
+            version, data, cube = self._state
+            self._checked = time.time()
+            mode, states = data_loader.resolve_ingest(self.kwargs.get("mode"), self.kwargs.get("states"))
+            if partitions.is_partitioned(self.csv_path):
+                return self._refresh_partitions(version, data, cube, mode, states)
+            status = data_loader.csv_status(self.csv_path, data.attrs.get("fingerprint"),
+                                            data_loader.ingest_key(mode, states))
+            if status == "unchanged":
+                # Only the mtime moved (the content hash matched): keep the new one, or every check re-hashes.
+                fresh = data_loader.restamp(self.csv_path, data.attrs["fingerprint"])
+                if fresh is not None:
+                    data.attrs["fingerprint"] = fresh
+                return False
+            if status == "appended":
+                # Only the new rows are read, grouped and merged; the held ones are not copied.
+                appended = data_loader.read_appended(self.csv_path, data.attrs["fingerprint"], mode, states,
+                                                     self.kwargs.get("chunk_size"))
+                if appended is None:
+                    return False
+                rows, fingerprint = appended
+                source = data.attrs.get("source", "csv").split("+")[0] + "+append"
+                self._state = (version + 1, data.append(rows, {**data.attrs, "source": source,
+                                                                "fingerprint": fingerprint}),
+                               aggregates.merge_cube(cube, rows))
+            else:
+                log.info("%s was truncated or rewritten; rebuilding", self.csv_path)
+                self._state = self._build(version)
+            return True
+
+    def _refresh_partitions(self, version, data, cube, mode, states) -> bool:
+        """New partitions are ingested and merged; a changed or removed one reloads (from the other partitions' caches)"""
+        fingerprint = data.attrs.get("fingerprint")
+        added, changed = partitions.changes(self.csv_path, fingerprint, data_loader.ingest_key(mode, states))
+        if changed:
+            log.info("partitions %s of %s changed; reloading", ", ".join(changed), self.csv_path)
+            self._state = self._build(version)
+            return True
+        if not added:
+            return False
+        rows = partitions.load_partitioned(self.csv_path, mode, states, self.kwargs.get("chunk_size"), names=added)
+        merged = data.append(rows, {**data.attrs, "fingerprint": {
+            **fingerprint, "partitions": {**fingerprint["partitions"], **rows.attrs["fingerprint"]["partitions"]}}})
+        log.info("added partitions %s (%s rows)", ", ".join(added), len(rows))
+        self._state = (version + 1, merged, aggregates.merge_cube(cube, rows))
+        return True
+
+
+# ---------- Memory accounting ----------
+def touch_session(session_id: str):
+    with _lock:
+        _sessions[session_id] = time.time()
+
+def active_sessions() -> int:
+    cutoff = time.time() - SESSION_TTL
+    with _lock:
+        for sid in [s for s, seen in _sessions.items() if seen < cutoff]:
+            del _sessions[sid]
+        return len(_sessions)
+
+def memory_report(df: Optional[data_loader.ChunkedFrame] = None) -> dict:
+    """Shared dataset size versus what the process grew by since loading it, per active session"""
+    rss = metrics.process_rss()
+    sessions = active_sessions()
+    growth = rss - _loaded_rss if _loaded_rss is not None else None
+    return {
+        "source": df.attrs.get("source") if df is not None else None,
+        "dataset_bytes": sum(int(p.memory_usage(deep=True).sum()) for p in df.parts) if df is not None else 0,
+        "mapped_bytes": int(df.attrs.get("mapped_bytes", 0)) if df is not None else 0,
+        "process_rss_bytes": rss,
+        "rss_growth_since_load_bytes": growth,
+        "active_sessions": sessions,
+        "per_session_overhead_bytes": int(growth / sessions) if growth is not None and sessions else None,
+    }
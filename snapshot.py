@@ -0,0 +1,207 @@
+# snapshot.py — precomputed dashboard snapshot (normalized rows + cube) for instant cold starts
+#
+#   python snapshot.py            # build data.csv.snapshot/ next to data.csv (run by the deploy workflow)
+#   python snapshot.py --check    # exit 1 unless the snapshot still matches data.csv
+#
+# The snapshot must be built with the same DASHBOARD_INGEST / DASHBOARD_STATES as the app;
+# a snapshot for other settings, another data.csv or an older format is ignored at startup.
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from typing import Optional
+
+import pandas as pd
+
+import aggregates
+import data_loader
+import partitions
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # without pyarrow the dashboard always computes live
+    pa = pq = None
+
+log = logging.getLogger("dashboard.snapshot")
+
+# Bump whenever the tables or manifest change shape; older snapshots are then ignored.
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".snapshot"
+MANIFEST = "manifest.json"
+TABLES = ["data", "events", "users"]
+# Columns the dashboard reads from each table, and the kind of dtype each must have.
+REQUIRED = {
+    "data": ["event_date", "event_type", "browser", "user_id", "program_destination", "traffic_source"],
+    "events": ["event_date", "event_type", "browser", "rows", "traffic"],
+    "users": ["event_date", *aggregates.DIMENSIONS, "user_id"],
+}
+
+
+def snapshot_path(csv_path: str) -> str:
+    return csv_path + SNAPSHOT_SUFFIX
+
+def schema_problem(name: str, df: pd.DataFrame) -> Optional[str]:
+    """Why table ``name`` can't back the dashboard, or None when its columns and dtypes fit"""
+    for c in REQUIRED[name]:
+        if c not in df.columns:
+            return f"{name} has no {c} column"
+        dtype = df[c].dtype
+        if c == "event_date":
+            ok = dtype.kind == "M"
+        elif c in ("rows", "traffic"):
+            ok = dtype.kind in "iu"
+        else:
+            ok = isinstance(dtype, pd.CategoricalDtype)
+        if not ok:
+            return f"{name}.{c} is {dtype}"
+    return None
+
+def _replace_dir(tmp: str, path: str):
+    old = f"{path}.{os.getpid()}.old"
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+# ---------- Build ----------
+def build(csv_path: str = data_loader.CSV_PATH, mode: Optional[str] = None, states=None,
+          chunk_size: Optional[int] = None) -> dict:
+    """Run the live ingest and cube build once and write both with a manifest; returns the manifest"""
+    if pq is None:
+        raise RuntimeError("building a snapshot needs pyarrow")
+    if partitions.is_partitioned(csv_path):
+        raise ValueError(f"{csv_path} is a partition directory; its partitions are cached individually")
+    mode, states = data_loader.resolve_ingest(mode, states)
+    df = data_loader.load_dataset(csv_path, mode, states, chunk_size)
+    fingerprint = df.attrs["fingerprint"]
+    if "sha256" not in fingerprint:
+        # Deploys reset mtimes, so the content hash is what proves the CSV unchanged.
+        fingerprint = {**fingerprint, "sha256": data_loader.file_hash(csv_path, fingerprint["size"])}
+    cube = aggregates.build_cube(df)
+    tables = {"data": df, "events": cube.events, "users": aggregates.users_table(cube)}
+
+    path = snapshot_path(csv_path)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        for name, table in tables.items():
+            pq.write_table(pa.Table.from_pandas(table, preserve_index=False), os.path.join(tmp, f"{name}.parquet"))
+        manifest = {
+            "snapshot_version": SNAPSHOT_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "fingerprint": fingerprint,
+            "key": data_loader.ingest_key(mode, states),
+            "rows": {name: len(table) for name, table in tables.items()},
+            "schema": {name: {c: str(table[c].dtype) for c in table.columns} for name, table in tables.items()},
+        }
+        with open(os.path.join(tmp, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=1)
+        _replace_dir(tmp, path)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    log.info("wrote snapshot %s (%s rows)", path, len(df))
+    return manifest
+
+
+# ---------- Load ----------
+def read_manifest(csv_path: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(snapshot_path(csv_path), MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_manifest(csv_path: str, manifest: dict) -> dict:
+    """Replace the manifest of an existing snapshot, e.g. with data.csv's new mtime once its hash matched"""
+    path = os.path.join(snapshot_path(csv_path), MANIFEST)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp, path)
+    except OSError as e:
+        # A read-only deploy keeps working; it just hashes data.csv on every cold start.
+        log.warning("could not update %s: %s", path, e)
+    return manifest
+
+def check(csv_path: str, manifest: Optional[dict], key: dict) -> tuple:
+    """(status, problem): the CSV status against the snapshot, and why it can't be used (or None)"""
+    if manifest is None:
+        return "changed", "no snapshot"
+    if manifest.get("snapshot_version") != SNAPSHOT_VERSION:
+        return "changed", f"snapshot format {manifest.get('snapshot_version')}, expected {SNAPSHOT_VERSION}"
+    status = data_loader.csv_status(csv_path, manifest.get("fingerprint"), key)
+    if status == "changed":
+        return status, "data.csv or the ingest settings changed since it was built"
+    return status, None
+
+def load(csv_path: str = data_loader.CSV_PATH, mode: Optional[str] = None, states=None,
+         chunk_size: Optional[int] = None):
+    """(data, cube) from the snapshot when it matches data.csv and this build's schema, else None.
+
+    Rows appended to data.csv after the snapshot was built are parsed and merged on top.
+    """
+    path = snapshot_path(csv_path)
+    if pq is None or not os.path.isdir(path):
+        return None
+    t = time.perf_counter()
+    mode, states = data_loader.resolve_ingest(mode, states)
+    manifest = read_manifest(csv_path)
+    status, problem = check(csv_path, manifest, data_loader.ingest_key(mode, states))
+    if problem is None:
+        try:
+            tables = {name: pq.read_table(os.path.join(path, f"{name}.parquet")).to_pandas() for name in TABLES}
+            problem = next(filter(None, (schema_problem(n, df) for n, df in tables.items())), None)
+        except Exception as e:
+            problem = f"unreadable ({e})"
+    if problem is not None:
+        log.warning("not using snapshot %s: %s; computing live", path, problem)
+        return None
+
+    fresh = data_loader.restamp(csv_path, manifest["fingerprint"]) if status == "unchanged" else None
+    if fresh is not None:
+        manifest = write_manifest(csv_path, {**manifest, "fingerprint": fresh})
+    data = tables["data"]
+    data.attrs.update(source="snapshot", fingerprint=manifest["fingerprint"])
+    cube = aggregates.assemble_cube(tables["events"], tables["users"])
+    if status == "appended":
+        data, rows = data_loader.append_from_csv(data, csv_path, mode, states, chunk_size)
+        cube = aggregates.merge_cube(cube, rows)
+    log.info("loaded snapshot %s (%s rows) in %.3fs", path, len(data), time.perf_counter() - t)
+    return data, cube
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Precompute the dashboard snapshot for data.csv")
+    ap.add_argument("--csv", default=data_loader.CSV_PATH, help="CSV to snapshot (default data.csv next to the app)")
+    ap.add_argument("--check", action="store_true", help="only report whether the existing snapshot is usable")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if partitions.is_partitioned(args.csv):
+        # Partition directories keep a cache per partition instead; warm those so startup only reads them.
+        df = partitions.load_partitioned(args.csv)
+        print(json.dumps({"partitions": len(df.attrs["fingerprint"]["partitions"]), "rows": len(df)}))
+        return
+
+    if args.check:
+        _, problem = check(args.csv, read_manifest(args.csv), data_loader.ingest_key(*data_loader.resolve_ingest()))
+        print(problem or "snapshot is current")
+        sys.exit(1 if problem else 0)
+
+    manifest = build(args.csv)
+    # The DuckDB engine queries its own Parquet parts; build those ahead of time too when it is the one in use.
+    import query_engine
+    if query_engine.engine_kind(args.csv) == "duckdb":
+        query_engine.DuckDBEngine(args.csv).view()
+    print(json.dumps({k: manifest[k] for k in ("snapshot_version", "created", "rows")}))
+
+if __name__ == "__main__":
+    main()
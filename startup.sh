@@ -4,5 +4,5 @@
 # Activate pre-built virtual environment from GitHub Actions
 source antenv/bin/activate
 
-# Run Streamlit app
-streamlit run streamlit_csv.py --server.port=8000 --server.address=0.0.0.0
+# Run Streamlit app (app.py serves streamlit_csv.py and warms the dataset and charts at startup)
+streamlit run app.py --server.port=8000 --server.address=0.0.0.0
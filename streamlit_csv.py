@@ -1,47 +1,50 @@
 # my_dashboard.py — Member Health Records Dashboard (API Version)
 import streamlit as st
 import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import date, timedelta
-import requests
-from typing import Optional
 import base64
 
+import charts
+import export
+import metrics
+import query_engine
+import shared_dataset
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
 st.set_page_config(page_title="Kansas Member Health Record Dashboard", layout="wide")
 
+# Sessions share one dataset (shared_dataset.py), so nothing may write through to it. pandas 3
+# always copies on write; older pandas needs the option, set here by the app rather than on import.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 # ---------- Logo ----------
 import os
 
+LOGO_FILE = "Stellarus_logo_2C_whiteype.png"
+
+@st.cache_resource
 def load_logo():
+    """The logo's <img> src, once per process: a static URL the browser caches when static serving
+    is on (.streamlit/config.toml), else the image inlined as base64"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    logo_path = os.path.join(script_dir, "static", LOGO_FILE)
+    if st.get_option("server.enableStaticServing") and os.path.exists(logo_path):
+        return f"app/static/{LOGO_FILE}"
     try:
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        logo_path = os.path.join(script_dir, "Stellarus_logo_2C_whiteype.png")
         with open(logo_path, "rb") as f:
-            return base64.b64encode(f.read()).decode()
+            return "data:image/png;base64," + base64.b64encode(f.read()).decode()
     except:
         return ""
 
-logo_base64 = load_logo()
+logo_src = load_logo()
 
 # ---------- Brand ----------
-BRAND = {
-    "primary":     "#436DB3",
-    "light_blue":  "#BFD0EE",
-    "danger":      "#F4454E",
-    "bg_soft":     "#F7F3EF",
-    "border":      "#EDEDED",
-    "ink":         "#0B1221",
-    "ok":          "#1A8E3B",
-    "link_blue":   "#0071BC",
-}
-BLUES = ["#436DB3", "#5B84C7", "#87A9DA", "#AFC5E8", "#D3E1F5"]
-CHART_TITLE_SIZE = 18
-PLOT_HEIGHT = 380  # same height for paired charts
+BRAND = charts.BRAND
 
 # ---------- CSS: compact, no "white strip" ----------
-st.markdown(f"""
+@st.cache_resource
+def page_css():
+    return f"""
 <style>
 @import url("https://fonts.googleapis.com/css2?family=Roboto:wght@300;400;500;700&display=swap");
 html, body, [class*="css"] {{
@@ -71,113 +74,33 @@ html, body, [class*="css"] {{
 /* no cards/borders around charts — just charts */
 .chart-wrap {{ margin:0; padding:0; }}
 </style>
-""", unsafe_allow_html=True)
+"""
 
-# ---------- Plotly helpers ----------
-px.defaults.template = "plotly_white"
-
-def style_layout(fig, title=None, *, legend_pos="top-right", hide_grid=True, bottom_legend=False, height=PLOT_HEIGHT):
-    if bottom_legend:
-        legend = dict(orientation="h", y=-0.25, x=0.5, xanchor="center"); bmargin = 70
-    elif legend_pos == "top-right":
-        legend = dict(orientation="h", y=1.02, x=1.0, xanchor="right"); bmargin = 10
-    else:
-        legend = dict(orientation="h", y=1.02, x=0.0, xanchor="left"); bmargin = 10
-
-    fig.update_layout(
-        title=title,
-        title_font=dict(size=CHART_TITLE_SIZE, family="Roboto", color=BRAND["ink"]),
-        font=dict(family="Roboto", size=12, color=BRAND["ink"]),
-        plot_bgcolor="#fff", paper_bgcolor="#fff",
-        margin=dict(l=8, r=8, t=45, b=bmargin),
-        legend=legend,
-        height=height
-    )
-    fig.update_xaxes(showgrid=(not hide_grid), gridcolor=BRAND["border"])
-    fig.update_yaxes(showgrid=(not hide_grid), gridcolor=BRAND["border"])
-    return fig
+st.markdown(page_css(), unsafe_allow_html=True)
 
 # ---------- Data loader from CSV ----------
-@st.cache_data
-def load_data_from_csv() -> pd.DataFrame:
-    """Load data from CSV file"""
+metrics.setup_logging()
+
+def load_data_from_csv(load):
+    """Query view over the CSV file (or its columnar sidecar), picking up appended rows.
+
+    Until the background load is ready: the preview of the most recent days, or None.
+    """
+    if not load.ready:
+        return load.preview
+    engine = load.engine
     try:
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        csv_path = os.path.join(script_dir, "data.csv")
-        df = pd.read_csv(csv_path)
+        engine.refresh()
+        return engine.view()
     except Exception as e:
         st.error(f"Error loading CSV file: {str(e)}")
-        return pd.DataFrame()
-    
-    if df.empty:
-        return df
-    
-    # ---------- Data cleaning and normalization ----------
-    def make_unique(cols):
-        seen, out = {}, []
-        for c in cols:
-            c = str(c).strip()
-            if c not in seen: seen[c]=1; out.append(c)
-            else: seen[c]+=1; out.append(f"{c}_{seen[c]}")
-        return out
-    
-    def lower_unique(cols):
-        seen, out = {}, []
-        for c in cols:
-            lc = c.lower().strip()
-            if lc not in seen: seen[lc]=1; out.append(lc)
-            else: seen[lc]+=1; out.append(f"{lc}_{seen[lc]}")
-        return out
-    
-    df.columns = lower_unique(make_unique(df.columns))
-    
-    # Coalesce columns
-    for new_col, candidates in [
-        ("state", ["state", "member_state", "state_code"]),
-        ("city", ["city", "member_city"]),
-        ("zipcode", ["zipcode", "zip", "member_zip"]),
-    ]:
-        found = [c for c in candidates if c in df.columns]
-        if found:
-            df[new_col] = df[found].bfill(axis=1).iloc[:, 0] if len(found) > 1 else df[found[0]]
-        elif new_col not in df.columns:
-            df[new_col] = pd.NA
-    
-    if "state" in df.columns:
-        df["state"] = df["state"].astype("string")
-    if "city" in df.columns:
-        df["city"] = df["city"].astype("string")
-    
-    if "weight" in df.columns and "height" in df.columns:
-        with np.errstate(divide="ignore", invalid="ignore"):
-            df["bmi"] = df["weight"] / (df["height"]**2)
-    
-    for c in ["event_type","traffic_source","utm_campaign","device_type","browser",
-              "zipcode","retention_status","program_activity","user_id","program_destination"]:
-        if c not in df.columns: df[c] = pd.NA
-        df[c] = df[c].astype("string")
-    
-    df["event_date"] = pd.to_datetime(df["event_date"], errors="coerce")
-    if "event_timestamp" in df.columns:
-        df["event_timestamp"] = pd.to_datetime(df["event_timestamp"], errors="coerce")
-    if "event_type" in df.columns:
-        df["event_type"] = df["event_type"].astype("string").str.strip().str.lower()
-    
-    return df
-
-# ---------- Load data ----------
-data = load_data_from_csv()
-
-if data.empty:
-    st.error("❌ No data available from CSV file")
-    st.stop()
-
-# Filter to Kansas only (if state column exists)
-if "state" in data.columns:
-    data = data.loc[data["state"].astype("string").str.lower().isin(["kansas","ks"])].copy()
+        return None
 
 # ---------- Header ----------
-st.markdown(f"""
+# Drawn before any data is needed, so a cold start shows the page straight away.
+@st.cache_resource
+def header_html(logo_src: str):
+    return f"""
 <style>
 .logo-invert {{
     height: 45px;
@@ -190,62 +113,89 @@ st.markdown(f"""
       <div class="title">Kansas Member Health Record Dashboard</div>
     </div>
     <div>
-      <img src="data:image/png;base64,{logo_base64}" class="logo-invert" />
+      <img src="{logo_src}" class="logo-invert" />
     </div>
   </div>
 </div>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(header_html(logo_src), unsafe_allow_html=True)
+
+# ---------- Load data ----------
+# Stage timings for this rerun (DASHBOARD_METRICS); a no-op unless enabled.
+_ctx = get_script_run_ctx()
+run = metrics.Run(_ctx.session_id if _ctx is not None else None)
+
+# One background load per process, shared by every session (app.py starts it with the server).
+# The page never waits on it: it renders the preview, then reruns once the full dataset is in.
+LOAD_POLL_SECONDS = 1
+load = query_engine.shared_load()
+load_status = load.status
+previewing = load_status != "ready"
+
+# Charts and KPIs below go through the query engine, never the raw rows.
+with run.stage("load_data_from_csv") as _s:
+    q = load_data_from_csv(load)
+    if hasattr(q, "data"):
+        _s.add_rows(len(q.data))
+
+if previewing:
+    @st.fragment(run_every=LOAD_POLL_SECONDS)
+    def wait_for_data():
+        if load.status != load_status:
+            st.rerun()
+    wait_for_data()
+
+if load_status == "failed":
+    # Every session sees the same failure; one retry restarts the shared load for all of them.
+    st.error(f"Error loading CSV file: {load.error}")
+    if st.button("Retry"):
+        load.start(retry=True)
+        st.rerun()
+    if q is None:
+        st.stop()
+elif load_status == "preview":
+    st.caption(f"Showing the last {load.preview_days} days of data while the full dataset loads…")
+elif load_status == "loading":
+    st.info("Loading data…")
+    st.stop()
+
+if q is None or q.is_empty():
+    st.error("❌ No data available from CSV file")
+    st.stop()
+
+if _ctx is not None:
+    shared_dataset.touch_session(_ctx.session_id)
 
 # ---------- Filters (Browser and Date Range only) ----------
-def options_from(df, primary, fallback=None):
-    if primary in df.columns and df[primary].dropna().astype("string").str.strip().ne("").any():
-        vals = sorted(df[primary].dropna().astype("string").str.strip().unique().tolist())
-        return ["All"] + vals
-    if fallback and fallback in df.columns and df[fallback].dropna().astype("string").str.strip().ne("").any():
-        vals = sorted(df[fallback].dropna().astype("string").str.strip().unique().tolist())
-        return ["All"] + vals
-    return ["All"]
-
-min_d, max_d = pd.to_datetime(data["event_date"]).min(), pd.to_datetime(data["event_date"]).max()
+with run.stage("filter_options"):
+    min_d, max_d = q.date_bounds()
+    browsers = q.options("browser")
 if pd.isna(min_d) or pd.isna(max_d):
     min_d = pd.Timestamp("2024-11-01"); max_d = min_d + pd.offsets.MonthEnd(11)
 
-frow = st.columns([1.5, 1.5, 2])
+frow = st.columns([1.5, 1.5, 1, 2])
 dr = frow[0].date_input("Date Range", (min_d, max_d), min_value=min_d, max_value=max_d)
 start_d, end_d = (pd.to_datetime(dr[0]), pd.to_datetime(dr[1])) if isinstance(dr, tuple) else (min_d, max_d)
 
-browser = frow[1].selectbox("Browser", options_from(data, "browser"), index=0)
+browser = frow[1].selectbox("Browser", browsers, index=0)
+# Trend charts per day, week or month; long daily series are downsampled before they are sent.
+freq = frow[2].selectbox("Granularity", charts.GRANULARITIES, index=charts.GRANULARITIES.index("month"),
+                         format_func=str.capitalize)
 
-# base (non-date) mask — used for current and prior windows
-base_mask = pd.Series(True, index=data.index)
-if browser != "All" and "browser" in data.columns:
-    base_mask &= data["browser"].astype("string").eq(browser)
-
-df = data.loc[base_mask & data["event_date"].between(start_d, end_d)].copy()
+# Unique-user charts can read HyperLogLog sketches instead of exact sets (DASHBOARD_SKETCHES=on).
+approx = q.approximate()
+if approx is not None and frow[3].toggle("Approximate unique users", value=False):
+    q = approx
+    frow[3].caption(f"Unique users are estimates, typically within ±{q.distinct_error:.1%} "
+                    f"(±{2 * q.distinct_error:.1%} for 95% of counts). KPI tiles stay exact.")
 
 # ---------- KPI + Funnel inference ----------
-EXPECTED = {"crossover","link_click","signup","improvement"}
-
-def compute_counts(frame: pd.DataFrame):
-    if "event_type" in frame.columns and frame["event_type"].dropna().isin(EXPECTED).any():
-        c = frame["event_type"].value_counts()
-        return {
-            "crossover": int(c.get("crossover", 0)),
-            "link_click": int(c.get("link_click", 0)),
-            "signup":    int(c.get("signup", 0)),
-            "improve":   int(c.get("improvement", 0)),
-        }
-    total = len(frame)
-    clicks = int(frame["traffic_source"].notna().sum()) if "traffic_source" in frame.columns else int(0.33*total)
-    signups = int(0.05*total)
-    improve = 0
-    return {"crossover": total, "link_click": clicks, "signup": signups, "improve": improve}
-
 def counts_for_window(s, e):
-    frame = data.loc[base_mask & data["event_date"].between(s, e)]
-    return compute_counts(frame)
+    return q.kpi_counts(s, e, browser)
 
-cur_counts = counts_for_window(start_d, end_d)
+with run.stage("counts_for_window"):
+    cur_counts = counts_for_window(start_d, end_d)
 
 # Calculate conversion percentage
 conversion_pct = (cur_counts["link_click"] / cur_counts["crossover"] * 100) if cur_counts["crossover"] > 0 else 0
@@ -274,219 +224,85 @@ for col, (label, icon, cur, is_percent) in zip([k1, k2, k3], KPI):
 left, main = st.columns([0.23, 1], gap="large")
 with left:
     st.markdown('<div class="left-radio">', unsafe_allow_html=True)
-    tab = st.radio("Navigation", ["Executive Overview", "Website Crossovers", "Link Clicks"], index=0)
+    tab = st.radio("Navigation", charts.TABS, index=0)
     st.markdown('</div>', unsafe_allow_html=True)
 
-# ---------- Helpers ----------
-def get_unique_ids_by_month(frame, event_filter=None):
-    """Get unique user_id counts by month, optionally filtered by event_type"""
-    if event_filter and "event_type" in frame.columns:
-        frame = frame[frame["event_type"].astype("string").str.lower() == event_filter.lower()]
-    
-    if "user_id" not in frame.columns:
-        # Fallback: count rows
-        monthly = (frame.assign(period=frame["event_date"].dt.to_period("M").dt.to_timestamp())
-                   .groupby("period").size().reset_index(name="unique_ids"))
-    else:
-        monthly = (frame.assign(period=frame["event_date"].dt.to_period("M").dt.to_timestamp())
-                   .groupby("period")["user_id"].nunique().reset_index(name="unique_ids"))
-    return monthly
-
-def smooth_line(df_line, y_cols, title, color_seq=None, height=PLOT_HEIGHT):
-    fig = px.line(
-        df_line if "period" in df_line.columns else df_line.reset_index(), 
-        x="period", y=y_cols, markers=True,
-        line_shape="spline",
-        color_discrete_sequence=color_seq or [BRAND["primary"], BRAND["light_blue"], BRAND["danger"]]
-    )
-    fig.update_traces(line=dict(width=2.6))
-    fig.update_xaxes(title="")
-    return style_layout(fig, title, legend_pos="top-right", hide_grid=True, height=height)
-
 # ---------- Tabs ----------
+# Revisiting a tab or a recent filter combination reuses its aggregations and figures.
+_, figs = charts.tab_view(q, tab, start_d, end_d, browser, freq)
 with main:
     if tab == "Executive Overview":
         # Stacked bar chart showing conversion trend (full width)
-        crossover_monthly = get_unique_ids_by_month(df, "crossover")
-        link_click_monthly = get_unique_ids_by_month(df, "link_click")
-        
-        # Merge the two dataframes
-        monthly_data = crossover_monthly.merge(link_click_monthly, on="period", how="outer", suffixes=("_crossover", "_click")).fillna(0)
-        monthly_data.columns = ["period", "Website Crossovers", "Link Clicks"]
-        
-        # Create overlapping bar chart
-        fig = go.Figure()
-        
-        # Add Website Crossovers bars (lighter color, in the back)
-        fig.add_trace(go.Bar(
-            x=monthly_data["period"],
-            y=monthly_data["Website Crossovers"],
-            name="Website Crossovers",
-            marker=dict(color=BRAND["light_blue"]),
-            hovertemplate="<b>%{x|%b %Y}</b><br>Website Crossovers: %{y:,.0f}<extra></extra>"
-        ))
-        
-        # Add Link Clicks bars (darker color, in the front, overlapping)
-        fig.add_trace(go.Bar(
-            x=monthly_data["period"],
-            y=monthly_data["Link Clicks"],
-            name="Link Clicks",
-            marker=dict(color=BRAND["primary"]),
-            hovertemplate="<b>%{x|%b %Y}</b><br>Link Clicks: %{y:,.0f}<extra></extra>"
-        ))
-        
-        # Add Conversion Rate line on secondary axis
-        conversion_rate = (monthly_data["Link Clicks"] / monthly_data["Website Crossovers"] * 100).fillna(0)
-        fig.add_trace(go.Scatter(
-            x=monthly_data["period"],
-            y=conversion_rate,
-            name="Click Conversion",
-            line=dict(color=BRAND["danger"], width=2.6),
-            mode="lines+markers",
-            yaxis="y2",
-            hovertemplate="<b>%{x|%b %Y}</b><br>Click Conversion: %{y:.1f}%<extra></extra>"
-        ))
-        
-        fig.update_layout(
-            barmode="overlay",
-            yaxis=dict(title="Unique Users", showgrid=True, gridcolor=BRAND["border"]),
-            yaxis2=dict(
-                title="% Conversion Rate",
-                overlaying="y",
-                side="right",
-                showgrid=False,
-                range=[0, 100]
-            ),
-            margin=dict(l=60, r=90, t=60, b=100),
-            xaxis=dict(tickangle=-45, showgrid=False)
-        )
-        
-        fig = style_layout(fig, "Conversion Trend", legend_pos="top-right", hide_grid=True, height=PLOT_HEIGHT, bottom_legend=True)
-        st.plotly_chart(fig, width="stretch")
-
-    elif tab == "Website Crossovers":
-        w1, w2 = st.columns([1.2, 0.9])
-        
-        with w1:
-            # Trending line chart of website crossovers (unique IDs per month)
-            crossover_monthly = get_unique_ids_by_month(df, "crossover")
-            
-            fig = smooth_line(crossover_monthly, ["unique_ids"], 
-                            "Website Crossovers (Unique IDs per Month)", 
-                            color_seq=[BRAND["primary"]], height=PLOT_HEIGHT)
-            st.plotly_chart(fig, width="stretch")
-        
-        with w2:
-            # Donut chart showing % by Browser (total count by unique IDs)
-            if "browser" in df.columns and df["browser"].notna().any():
-                # Filter to crossover events
-                crossover_df = df[df["event_type"].astype("string").str.lower() == "crossover"] if "event_type" in df.columns else df
-                
-                # Count unique IDs by browser
-                browser_data = (crossover_df.groupby("browser")["user_id"].nunique().reset_index(name="unique_ids")
-                                             .sort_values("unique_ids", ascending=False))
-            else:
-                # Fallback data
-                browser_data = pd.DataFrame({
-                    "browser": ["Chrome", "Safari", "Edge", "Firefox"],
-                    "unique_ids": [45, 30, 15, 10]
-                })
-            
-            fig = px.pie(
-                browser_data, values="unique_ids", names="browser", hole=0.62,
-                color="browser",
-                color_discrete_sequence=BLUES
-            )
-            fig.update_traces(textinfo="percent+label")
-            fig = style_layout(fig, "Crossovers by Browser", bottom_legend=True, height=PLOT_HEIGHT)
-            st.plotly_chart(fig, width="stretch")
-
-    elif tab == "Link Clicks":
-        a1, a2 = st.columns([1.2, 0.9])
-        
-        with a1:
-            # Trending line chart of link clicks to Virta and Kansas using program_destination column
-            link_click_df = df[df["event_type"].astype("string").str.lower() == "link_click"].copy() if "event_type" in df.columns else df.copy()
-            
-            if "program_destination" in link_click_df.columns and link_click_df["program_destination"].notna().any():
-                # Get monthly unique IDs by program_destination
-                monthly_dest = (link_click_df.assign(period=link_click_df["event_date"].dt.to_period("M").dt.to_timestamp())
-                                             .groupby(["period", "program_destination"])["user_id"].nunique().reset_index(name="unique_ids"))
-                
-                # Pivot to get Virta and Kansas columns
-                monthly_pivot = monthly_dest.pivot(index="period", columns="program_destination", values="unique_ids").fillna(0).reset_index()
-                
-                # Ensure we have Virta and Kansas columns
-                for col in ["Virta", "Kansas"]:
-                    if col not in monthly_pivot.columns:
-                        monthly_pivot[col] = 0
-                
-                # Create line chart with custom colors
-                fig = go.Figure()
-                
-                fig.add_trace(go.Scatter(
-                    x=monthly_pivot["period"],
-                    y=monthly_pivot["Kansas"],
-                    name="Kansas",
-                    line=dict(color=BRAND["primary"], width=2.6),
-                    mode="lines+markers",
-                    hovertemplate="<b>%{x|%b %Y}</b><br>Kansas: %{y:,.0f}<extra></extra>"
-                ))
-                
-                fig.add_trace(go.Scatter(
-                    x=monthly_pivot["period"],
-                    y=monthly_pivot["Virta"],
-                    name="Virta",
-                    line=dict(color=BRAND["danger"], width=2.6),
-                    mode="lines+markers",
-                    hovertemplate="<b>%{x|%b %Y}</b><br>Virta: %{y:,.0f}<extra></extra>"
-                ))
-            else:
-                # Fallback: simple line chart
-                link_click_monthly = get_unique_ids_by_month(df, "link_click")
-                fig = go.Figure()
-                fig.add_trace(go.Scatter(
-                    x=link_click_monthly["period"],
-                    y=link_click_monthly["unique_ids"],
-                    name="Link Clicks",
-                    line=dict(color=BRAND["primary"], width=2.6),
-                    mode="lines+markers"
-                ))
-            
-            fig.update_layout(
-                margin=dict(l=50, r=50, t=60, b=70)
-            )
-            fig = style_layout(fig, "Link Clicks Trends", legend_pos="top-right", hide_grid=True, height=PLOT_HEIGHT, bottom_legend=True)
-            st.plotly_chart(fig, width="stretch")
-        
-        with a2:
-            # Donut chart showing % by Virta vs Kansas using program_destination column
-            link_click_df = df[df["event_type"].astype("string").str.lower() == "link_click"].copy() if "event_type" in df.columns else df.copy()
-            
-            if "program_destination" in link_click_df.columns and link_click_df["program_destination"].notna().any():
-                # Count unique IDs by program_destination
-                dest_data = (link_click_df.groupby("program_destination")["user_id"].nunique().reset_index(name="unique_ids")
-                                          .sort_values("unique_ids", ascending=False))
-            else:
-                # Fallback data
-                dest_data = pd.DataFrame({
-                    "program_destination": ["Virta", "Kansas"],
-                    "unique_ids": [50, 35]
-                })
-            
-            # Custom colors matching line chart: Kansas=primary blue, Virta=danger red
-            fig = px.pie(
-                dest_data, values="unique_ids", names="program_destination", hole=0.62,
-                color="program_destination",
-                color_discrete_map={"Kansas": BRAND["primary"], "Virta": BRAND["danger"]}
-            )
-            fig.update_traces(
-                textinfo="percent+label",
-                textfont=dict(size=14),
-                hovertemplate="<b>%{label}</b><br>Count: %{value:,.0f}<br>Percentage: %{percent}<extra></extra>"
-            )
-            fig.update_layout(
-                margin=dict(l=20, r=20, t=60, b=70)
-            )
-            fig = style_layout(fig, "Link Clicks by Program", bottom_legend=True, height=PLOT_HEIGHT)
-            st.plotly_chart(fig, width="stretch")
+        with run.stage("plotly_chart") as _s:
+            st.plotly_chart(figs[0], width="stretch")
+            if run.enabled:
+                _s.add_bytes(charts.figure_bytes(figs[0]))
+    else:
+        # Trend line on the left, donut on the right
+        for col, fig in zip(st.columns([1.2, 0.9]), figs):
+            with col, run.stage("plotly_chart") as _s:
+                st.plotly_chart(fig, width="stretch")
+                if run.enabled:
+                    _s.add_bytes(charts.figure_bytes(fig))
+
+# ---------- Export ----------
+# The rows behind this view, written to disk a slice at a time and served as a static file.
+with main, st.expander("Export rows"):
+    st.caption(f"{tab} events from {start_d:%b %d, %Y} to {end_d:%b %d, %Y}"
+               + (f" in {browser}" if browser != "All" else ""))
+    fmt = st.radio("Format", export.FORMATS, horizontal=True, format_func=str.upper)
+    st.caption(f"Columns: {', '.join(export.COLUMNS)}, normalized as the charts read them "
+               "(state coalesced, values trimmed, event types lower-cased). Other data.csv columns are not exported.")
+    if previewing:
+        st.caption("Exports are available once the full dataset has loaded.")
+    # A prepared file belongs to one selection and data version; changing either hides its link.
+    export_key = (tab, start_d, end_d, browser, fmt, q.version)
+    if st.button("Prepare export", disabled=previewing):
+        with st.spinner("Writing rows…"), run.stage("export") as _s:
+            st.session_state["export"] = (export_key, export.export_for_download(q, fmt, tab, start_d, end_d, browser))
+            _s.add_rows(st.session_state["export"][1]["rows"])
+    key, prepared = st.session_state.get("export", (None, None))
+    if key != export_key:
+        prepared = None
+    if prepared and os.path.exists(prepared["path"]):
+        if prepared["servable"] and st.get_option("server.enableStaticServing"):
+            st.markdown(f'<a href="{prepared["url"]}" download="{prepared["name"]}">Download {prepared["name"]}</a> '
+                        f'({prepared["rows"]:,} rows, {prepared["bytes"] / 1e6:,.1f} MB)', unsafe_allow_html=True)
+        else:
+            # Too large for Streamlit's static file server, or static serving is turned off.
+            st.info(f"{prepared['rows']:,} rows ({prepared['bytes'] / 1e6:,.1f} MB) written to "
+                    f"`{prepared['path']}` on the server. `python export.py` writes exports to any local path.")
+
+# ---------- Live refresh ----------
+# Rerun this session when another session (or this timer) has merged newly appended rows.
+if not previewing and load.engine.refresh_seconds > 0:
+    @st.fragment(run_every=load.engine.refresh_seconds)
+    def watch_for_new_data():
+        engine = load.engine
+        engine.refresh()
+        if engine.version != q.version:
+            st.rerun()
+    watch_for_new_data()
+
+# ---------- Memory diagnostics (?debug=memory&token=..., admin only) ----------
+if st.query_params.get("debug") == "memory" and metrics.is_admin(st.query_params.get("token")):
+    with st.expander("Memory", expanded=True):
+        st.json(shared_dataset.memory_report(getattr(q, "data", None)))
+
+# ---------- Rerun timings (?debug=timings&token=..., admin only) ----------
+record = run.finish(tab=tab, browser=browser, start=start_d.date(), end=end_d.date(), data_version=q.version,
+                    freq=freq, distinct=q.distinct)
+if record is not None:
+    history = st.session_state.setdefault("rerun_timings", [])
+    history[:] = (history + [record])[-20:]
+if st.query_params.get("debug") == "timings" and metrics.is_admin(st.query_params.get("token")):
+    with st.expander("Rerun timings", expanded=True):
+        if not run.enabled:
+            st.info("Set DASHBOARD_METRICS=on to record stage timings.")
+        else:
+            st.caption("This session, latest rerun first")
+            for r in reversed(st.session_state["rerun_timings"]):
+                st.markdown(f"**{r['seconds'] * 1000:,.0f} ms** · {r['tab']} · {r['browser']} · {r['start']} – {r['end']} · {r['freq']}")
+                st.dataframe(pd.DataFrame(r["stages"]), hide_index=True)
+            st.caption("This process, all sessions")
+            st.dataframe(pd.DataFrame(metrics.totals()), hide_index=True)
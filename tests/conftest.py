@@ -0,0 +1,34 @@
+# Shared fixtures: a small synthetic data.csv from generate_data.py, messy headers and values included.
+import os
+import shutil
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_loader  # noqa: E402
+import generate_data  # noqa: E402
+
+ROWS = 20_000
+
+
+@pytest.fixture(scope="session")
+def generated_csv(tmp_path_factory) -> str:
+    """Read-only: tests that write caches next to the CSV take ``data_csv`` instead"""
+    path = str(tmp_path_factory.mktemp("generated") / "data.csv")
+    generate_data.generate(path, ROWS, seed=1)
+    return path
+
+@pytest.fixture
+def data_csv(generated_csv, tmp_path) -> str:
+    """A private copy of the generated CSV, so sidecars and engine directories don't leak between tests"""
+    path = str(tmp_path / "data.csv")
+    shutil.copy(generated_csv, path)
+    return path
+
+def plain_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """The dashboard columns as strings in a fixed row order, comparable across parsers and loads"""
+    cols = data_loader.DASHBOARD_COLUMNS
+    return df[cols].astype("string").sort_values(cols, na_position="last", ignore_index=True)
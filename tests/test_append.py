@@ -0,0 +1,110 @@
+# Rows appended to data.csv end up exactly as a full reload would read them: sidecar, pandas and DuckDB engines.
+import os
+
+import pandas as pd
+import pytest
+
+import data_loader
+import query_engine
+from conftest import plain_rows
+
+
+def write_split(tmp_path, header: bytes, head: bytes, rest: bytes) -> tuple:
+    """(head/data.csv holding ``header + head``, full/data.csv with ``rest`` after it too, ``rest``)"""
+    paths = []
+    for name, body in [("head", header + head), ("full", header + head + rest)]:
+        os.makedirs(tmp_path / name)
+        paths.append(str(tmp_path / name / "data.csv"))
+        with open(paths[-1], "wb") as f:
+            f.write(body)
+    return paths[0], paths[1], rest
+
+@pytest.fixture
+def split_csv(generated_csv, tmp_path):
+    """(head.csv holding the first ~60% of lines, full.csv, the remaining bytes)"""
+    with open(generated_csv, "rb") as f:
+        raw = f.read()
+    header, cut = raw.index(b"\n") + 1, raw.index(b"\n", len(raw) * 3 // 5) + 1
+    return write_split(tmp_path, raw[:header], raw[header:cut], raw[cut:])
+
+@pytest.fixture(params=["header_only", "no_state_rows"])
+def empty_csv(request, generated_csv, tmp_path):
+    """Like split_csv, but the head has no rows the dashboard keeps: none at all, or none in DASHBOARD_STATES"""
+    with open(generated_csv, "rb") as f:
+        header, *lines = f.read().splitlines(keepends=True)
+    if request.param == "header_only":
+        return write_split(tmp_path, header, b"", b"".join(lines))
+    raw = pd.read_csv(generated_csv, usecols=["State", "member_state", "state_code"], dtype="string")
+    state = raw["State"].fillna(raw["member_state"]).fillna(raw["state_code"]).str.strip().str.lower()
+    kept = state.isin(data_loader.STATES).to_numpy()
+    head = [line for line, k in zip(lines, kept) if not k][:500]
+    rest = [line for line, k in zip(lines, kept) if k]
+    return write_split(tmp_path, header, b"".join(head), b"".join(rest))
+
+def append(path: str, data: bytes):
+    with open(path, "ab") as f:
+        f.write(data)
+
+@pytest.mark.parametrize("mode", ["full", "chunked"])
+def test_sidecar_append_matches_full_reload(split_csv, mode):
+    head, full, rest = split_csv
+    first = data_loader.load_dataset(head, mode=mode)
+    assert first.attrs["source"] == "csv"
+    # An unfinished last line is left for the next load.
+    partial = rest.index(b"\n") // 2
+    append(head, rest[:partial])
+    assert len(data_loader.load_dataset(head, mode=mode)) == len(first)
+    append(head, rest[partial:])
+    appended = data_loader.load_dataset(head, mode=mode)
+    assert appended.attrs["source"] == "sidecar+append"
+    reloaded = data_loader.load_dataset(full, mode=mode)
+    assert len(appended) > len(first)
+    assert appended["event_date"].dropna().is_monotonic_increasing
+    pd.testing.assert_frame_equal(plain_rows(appended), plain_rows(reloaded))
+
+def make_engine(kind: str, path: str):
+    if kind == "duckdb":
+        return query_engine.DuckDBEngine(path, refresh_seconds=0)
+    return query_engine.PandasEngine(path)
+
+def assert_refresh_matches_full_reload(kind: str, head: str, full: str, rest: bytes, appends: int = 3):
+    engine = make_engine(kind, head)
+    before = engine.view()
+    # Appends of shrinking size, so the pandas engine holds several parts and cube segments.
+    lines = rest.splitlines(keepends=True)
+    cuts = [0] + [len(lines) - len(lines) // 2 ** i for i in range(1, appends)] + [len(lines)]
+    for lo, hi in zip(cuts, cuts[1:]):
+        append(head, b"".join(lines[lo:hi]))
+        assert engine.refresh(force=True)
+    after, fresh = engine.view(), make_engine(kind, full).view()
+    assert after.version > before.version
+    assert after.date_bounds() == fresh.date_bounds()
+    assert after.options("program_destination") == fresh.options("program_destination")
+    lo, hi = fresh.date_bounds()
+    for browser in ["All", "Chrome"]:
+        assert after.kpi_counts(lo, hi, browser) == fresh.kpi_counts(lo, hi, browser)
+        pd.testing.assert_frame_equal(after.monthly_unique(lo, hi, browser, "crossover").reset_index(drop=True),
+                                      fresh.monthly_unique(lo, hi, browser, "crossover").reset_index(drop=True))
+        pd.testing.assert_frame_equal(
+            after.unique_by("program_destination", lo, hi, browser, "link_click").reset_index(drop=True),
+            fresh.unique_by("program_destination", lo, hi, browser, "link_click").reset_index(drop=True))
+    return engine
+
+@pytest.mark.parametrize("kind", ["pandas", "duckdb"])
+def test_engine_refresh_matches_full_reload(split_csv, kind):
+    assert_refresh_matches_full_reload(kind, *split_csv)
+
+@pytest.mark.parametrize("kind", ["pandas", "duckdb"])
+def test_refresh_after_an_empty_load(empty_csv, kind):
+    head = empty_csv[0]
+    assert make_engine(kind, head).view().is_empty()
+    assert_refresh_matches_full_reload(kind, *empty_csv)
+
+def test_duckdb_appended_parts_are_merged(split_csv, monkeypatch):
+    monkeypatch.setattr(query_engine, "COMPACT_PARTS", 3)
+    engine = assert_refresh_matches_full_reload("duckdb", *split_csv, appends=7)
+    parts = engine._manifest["parts"]
+    assert len(parts) < 4
+    # Only the files merged away by the last compaction are left besides the live parts.
+    on_disk = {p for p in os.listdir(engine.dir) if p.endswith(".parquet")}
+    assert on_disk == set(parts) | set(engine._manifest["retired"])
@@ -0,0 +1,63 @@
+# Trend downsampling keeps a series' shape within MAX_POINTS, and cached tabs never outlive their dataset.
+import numpy as np
+import pandas as pd
+import pytest
+
+import aggregates
+import charts
+import data_loader
+import query_engine
+
+
+def daily(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"period": pd.date_range("2020-01-01", periods=n, freq="D").astype("datetime64[ns]"),
+                         "a": rng.integers(0, 100, n), "b": rng.integers(0, 100, n)})
+
+def test_lttb_keeps_the_ends_and_the_peaks():
+    x = np.arange(5_000, dtype=float)
+    y = np.sin(x / 50)
+    y[1234] = 10.0
+    keep = charts.lttb(x, y, 200)
+    assert len(keep) == 200
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert (np.diff(keep) > 0).all()
+    assert 1234 in keep
+
+@pytest.mark.parametrize("n", [1, 2, 10])
+def test_lttb_leaves_short_series_alone(n):
+    assert charts.lttb(np.arange(n), np.ones(n), 10).tolist() == list(range(n))
+
+def test_downsample_returns_max_points_rows():
+    frame = daily(charts.MAX_POINTS * 3)
+    out = charts.downsample(frame, ["a", "b"])
+    assert len(out) == charts.MAX_POINTS
+    assert out.iloc[0].equals(frame.iloc[0]) and out.iloc[-1].equals(frame.iloc[-1])
+    assert out["period"].is_monotonic_increasing
+
+def test_downsample_leaves_short_frames_alone():
+    frame = daily(charts.MAX_POINTS)
+    assert charts.downsample(frame, ["a", "b"]) is frame
+
+def test_lru_evicts_the_least_recently_used():
+    cache = charts.LRUCache(2)
+    cache.put((1, "a"), "A")
+    cache.put((1, "b"), "B")
+    assert cache.get((1, "a")) == "A"
+    cache.put((1, "c"), "C")
+    assert cache.get((1, "b")) is None
+    assert cache.get((1, "a")) == "A" and cache.get((1, "c")) == "C"
+    assert len(cache) == 2
+
+def test_tab_cache_drops_an_older_data_version(data_csv):
+    df = data_loader.load_dataset(data_csv)
+    cube = aggregates.build_cube(df)
+    old, new = query_engine.PandasView(1, df, cube), query_engine.PandasView(2, df, cube)
+    lo, hi = old.date_bounds()
+    cache = charts.LRUCache(8)
+    frames, _ = charts.tab_view(old, charts.TABS[0], lo, hi, cache=cache)
+    assert charts.tab_view(old, charts.TABS[0], lo, hi, cache=cache)[0] is frames
+    assert charts.tab_view(new, charts.TABS[0], lo, hi, cache=cache)[0] is not frames
+    # Only the new version's entry is left, so a session still on version 1 recomputes.
+    assert len(cache) == 1
+    assert cache.get((1, pd.Timestamp(lo), pd.Timestamp(hi), "All", charts.TABS[0], "month", "exact")) is None
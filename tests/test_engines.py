@@ -0,0 +1,51 @@
+# The pandas and DuckDB engines answer every dashboard query with the same numbers.
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import query_engine
+
+
+def plain(frame: pd.DataFrame) -> pd.DataFrame:
+    """A query result with string keys, int counts and a fixed row order, comparable across engines"""
+    keys = [c for c in frame.columns if c != "unique_ids"]
+    out = frame.astype({c: "string" for c in keys if c != "period"}).astype({"unique_ids": "int64"})
+    return out.sort_values(keys, ignore_index=True)
+
+@pytest.fixture
+def views(data_csv):
+    return query_engine.PandasEngine(data_csv).view(), query_engine.DuckDBEngine(data_csv, refresh_seconds=0).view()
+
+def test_bounds_and_options_match(views):
+    pv, dv = views
+    assert pv.date_bounds() == dv.date_bounds()
+    for column in ["browser", "program_destination"]:
+        assert pv.options(column) == dv.options(column)
+
+@pytest.mark.parametrize("browser", ["All", "Chrome", "Netscape"])
+def test_queries_match(views, browser):
+    pv, dv = views
+    lo, hi = pv.date_bounds()
+    for start, end in [(lo, hi), (lo + (hi - lo) / 3, hi - (hi - lo) / 3), (hi, hi)]:
+        assert pv.kpi_counts(start, end, browser) == dv.kpi_counts(start, end, browser)
+        for event_type in [None, "crossover", "link_click"]:
+            for freq in ["day", "week", "month"]:
+                pd.testing.assert_frame_equal(plain(pv.monthly_unique(start, end, browser, event_type, freq=freq)),
+                                              plain(dv.monthly_unique(start, end, browser, event_type, freq=freq)))
+            pd.testing.assert_frame_equal(
+                plain(pv.monthly_unique(start, end, browser, event_type, by="program_destination")),
+                plain(dv.monthly_unique(start, end, browser, event_type, by="program_destination")))
+            for by in ["browser", "program_destination"]:
+                pd.testing.assert_frame_equal(plain(pv.unique_by(by, start, end, browser, event_type)),
+                                              plain(dv.unique_by(by, start, end, browser, event_type)))
+                assert pv.has_values(by, start, end, browser, event_type) == \
+                    dv.has_values(by, start, end, browser, event_type)
+
+def test_duckdb_takes_a_path_with_a_quote(data_csv, tmp_path):
+    path = str(tmp_path / "member's data" / "data.csv")
+    os.makedirs(os.path.dirname(path))
+    shutil.copy(data_csv, path)
+    dv = query_engine.DuckDBEngine(path, refresh_seconds=0).view()
+    assert dv.date_bounds() == query_engine.PandasEngine(data_csv).view().date_bounds()
@@ -0,0 +1,49 @@
+# Exports hold exactly the rows the KPI tiles count, with the same columns, for both engines and formats.
+import pandas as pd
+import pytest
+
+import charts
+import data_loader
+import export
+import query_engine
+
+KPI_TYPES = {"Executive Overview": ["crossover", "link_click"], "Website Crossovers": ["crossover"],
+             "Link Clicks": ["link_click"]}
+
+
+def make_view(kind: str, path: str):
+    if kind == "duckdb":
+        return query_engine.DuckDBEngine(path, refresh_seconds=0).view()
+    return query_engine.PandasEngine(path).view()
+
+@pytest.fixture(params=["pandas", "duckdb"])
+def view(request, data_csv):
+    return make_view(request.param, data_csv)
+
+@pytest.mark.parametrize("fmt", export.FORMATS)
+@pytest.mark.parametrize("browser", ["All", "Chrome"])
+def test_export_rows_match_kpi_counts(view, fmt, browser, tmp_path):
+    lo, hi = view.date_bounds()
+    start, end = lo + (hi - lo) / 4, hi - (hi - lo) / 4
+    kpi = view.kpi_counts(start, end, browser)
+    for tab in charts.TABS:
+        path = str(tmp_path / export.export_name(tab, start, end, browser, fmt))
+        rows = export.export_rows(view, path, fmt, tab, start, end, browser)
+        written = pd.read_csv(path) if fmt == "csv" else pd.read_parquet(path)
+        assert rows == len(written) == sum(kpi[t] for t in KPI_TYPES[tab]) > 0
+        assert list(written.columns) == export.COLUMNS
+        assert set(written["event_type"]) <= set(charts.TAB_EVENT_TYPES[tab])
+        if browser != "All":
+            assert set(written["browser"]) == {browser}
+
+@pytest.mark.parametrize("kind", ["pandas", "duckdb"])
+@pytest.mark.parametrize("fmt", export.FORMATS)
+def test_full_ingest_exports_only_dashboard_columns(data_csv, monkeypatch, kind, fmt, tmp_path):
+    # The "full" ingest keeps every data.csv column in memory; exports still hold COLUMNS only.
+    monkeypatch.setattr(data_loader, "INGEST_MODE", "full")
+    view = make_view(kind, data_csv)
+    lo, hi = view.date_bounds()
+    path = str(tmp_path / export.export_name(charts.TABS[0], lo, hi, "All", fmt))
+    assert export.export_rows(view, path, fmt, charts.TABS[0], lo, hi) > 0
+    written = pd.read_csv(path) if fmt == "csv" else pd.read_parquet(path)
+    assert list(written.columns) == export.COLUMNS
@@ -0,0 +1,50 @@
+# Full, chunked (pandas) and Arrow ingest must keep the same rows with the same values.
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import data_loader
+import shared_dataset
+from conftest import plain_rows
+
+STATES = ("kansas", "ks")
+
+
+@pytest.mark.parametrize("states", [STATES, ()])
+def test_parsers_keep_the_same_rows(generated_csv, states):
+    full = data_loader.read_csv(generated_csv, states)
+    chunked = data_loader.read_csv_chunked(generated_csv, states, chunk_size=3_000, parser="pandas")
+    arrow = data_loader.read_csv_chunked(generated_csv, states, parser="arrow")
+    assert len(full) == len(chunked) == len(arrow) > 0
+    pd.testing.assert_frame_equal(plain_rows(chunked), plain_rows(full))
+    pd.testing.assert_frame_equal(plain_rows(arrow), plain_rows(full))
+
+def test_state_filter_strips_and_lowercases(generated_csv):
+    raw = pd.read_csv(generated_csv, usecols=["State", "member_state", "state_code"], dtype="string")
+    state = raw["State"].fillna(raw["member_state"]).fillna(raw["state_code"])
+    expected = state.str.strip().str.lower().isin(STATES).sum()
+    assert (state == "kansas ").any()
+    for parser in ["pandas", "arrow"]:
+        df = data_loader.read_csv_chunked(generated_csv, STATES, parser=parser)
+        assert len(df) == expected
+        assert set(df["state"].dropna().unique()) == set(STATES)
+    assert len(data_loader.read_csv(generated_csv, STATES)) == expected
+
+@pytest.mark.parametrize("parser", ["pandas", "arrow"])
+def test_no_matching_rows_keep_the_dtypes(generated_csv, parser):
+    df = data_loader.read_csv_chunked(generated_csv, ("nowhere",), parser=parser)
+    assert df.empty
+    pd.testing.assert_frame_equal(df, data_loader.empty_frame())
+
+def test_mapped_frame_matches_the_load(data_csv):
+    df = data_loader.load_dataset(data_csv)
+    assert shared_dataset.write_mapped(data_csv, df)
+    mapped = shared_dataset.open_mapped(data_csv, data_loader.ingest_key(*data_loader.resolve_ingest()))
+    assert mapped.attrs["source"] == "mmap"
+    # The categories are a string array in the file, mapped like the codes, not field metadata.
+    schema = pa.ipc.open_file(shared_dataset.arrow_path(data_csv)).schema
+    assert pa.types.is_dictionary(schema.field("user_id").type)
+    codes = sum(df[c].cat.codes.nbytes for c in df.columns[1:])
+    assert mapped.attrs["mapped_bytes"] > df["event_date"].to_numpy().nbytes + codes
+    assert df["browser"].isna().any()
+    pd.testing.assert_frame_equal(mapped, df)
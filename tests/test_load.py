@@ -0,0 +1,65 @@
+# The background load runs once per process for every session, and a failed load can be retried.
+import shutil
+import threading
+
+import pytest
+
+import data_loader
+import query_engine
+
+
+@pytest.fixture
+def shared(monkeypatch):
+    """A fresh process-wide engine and load for DASHBOARD_DATA set by the test"""
+    monkeypatch.setattr(query_engine, "ENGINE", "pandas")
+    monkeypatch.setattr(query_engine, "_shared", None)
+    monkeypatch.setattr(query_engine, "_load", None)
+    return lambda path: monkeypatch.setattr(data_loader, "CSV_PATH", path)
+
+def test_sessions_share_one_load(data_csv, shared, monkeypatch):
+    shared(data_csv)
+    runs, release = [], threading.Event()
+    run = query_engine.BackgroundLoad._run
+
+    def held_run(self):
+        runs.append(self)
+        release.wait(30)
+        run(self)
+    monkeypatch.setattr(query_engine.BackgroundLoad, "_run", held_run)
+
+    # Sessions arriving while the first load is still running all poll the same one.
+    loads = [None] * 8
+    def session(i):
+        loads[i] = query_engine.shared_load()
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(len(loads))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    load = loads[0]
+    assert all(l is load for l in loads)
+    assert not load.ready and load.status in ("loading", "preview")
+    release.set()
+    assert load.wait(60)
+    assert load.status == "ready" and load.error is None
+    assert query_engine.shared_load() is load
+    assert len(runs) == 1
+    assert not load.engine.view().is_empty()
+
+def test_retry_after_a_failed_load(data_csv, shared, tmp_path):
+    broken = str(tmp_path / "broken.csv")
+    open(broken, "w").close()  # no header: the loader can't parse it
+    shared(broken)
+    load = query_engine.BackgroundLoad(preview_days=0)
+    load.start()
+    assert not load.wait(60)
+    assert load.status == "failed" and load.error is not None
+    # Without retry a failed load stays failed, so every session shows the same error.
+    load.start()
+    assert not load.wait(60) and load.status == "failed"
+
+    shutil.copy(data_csv, broken)
+    load.start(retry=True)
+    assert load.wait(60)
+    assert load.status == "ready" and load.error is None
+    assert not load.engine.view().is_empty()
@@ -0,0 +1,102 @@
+# A directory of monthly partitions loads the same rows as one CSV, prunes by date and picks up new months.
+import os
+
+import pandas as pd
+import pytest
+
+import aggregates
+import data_loader
+import partitions
+import query_engine
+import shared_dataset
+from conftest import plain_rows
+
+
+@pytest.fixture
+def months(generated_csv) -> tuple:
+    """(header, {"YYYY-MM": [lines]}) of the generated rows with a valid event_date"""
+    with open(generated_csv, "rb") as f:
+        header, *lines = f.read().splitlines(keepends=True)
+    dates = pd.to_datetime(pd.read_csv(generated_csv, usecols=["event_date"], dtype="string")["event_date"],
+                           format="%Y-%m-%d", errors="coerce")
+    out = {}
+    for line, date in zip(lines, dates):
+        if not pd.isna(date):
+            out.setdefault(date.strftime("%Y-%m"), []).append(line)
+    return header, out
+
+def write_csv(path: str, header: bytes, lines: list, mode: str = "wb"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode) as f:
+        f.write((header if mode == "wb" else b"") + b"".join(lines))
+
+def write_partitions(root: str, header: bytes, months: dict):
+    for month, lines in months.items():
+        # Two files in the first partition, as a month exported in parts.
+        files = [lines[:len(lines) // 2], lines[len(lines) // 2:]] if month == min(months) else [lines]
+        for i, chunk in enumerate(files):
+            write_csv(os.path.join(root, f"event_date={month}", f"part-{i}.csv"), header, chunk)
+
+@pytest.fixture
+def dataset(months, tmp_path) -> tuple:
+    """(partition directory, the same rows as one flat CSV)"""
+    header, by_month = months
+    root, flat = str(tmp_path / "data"), str(tmp_path / "flat.csv")
+    write_partitions(root, header, by_month)
+    write_csv(flat, header, [line for lines in by_month.values() for line in lines])
+    return root, flat
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_partitions_match_the_flat_csv(dataset, workers):
+    root, flat = dataset
+    df = partitions.load_partitioned(root, workers=workers)
+    assert len(df.attrs["fingerprint"]["partitions"]) == len(partitions.discover(root)) > 2
+    assert df["event_date"].is_monotonic_increasing
+    pd.testing.assert_frame_equal(plain_rows(df), plain_rows(data_loader.load_dataset(flat)))
+    # The second load comes from the per-partition caches.
+    pd.testing.assert_frame_equal(partitions.load_partitioned(root, workers=workers), df)
+
+def test_duckdb_opens_only_the_partitions_in_the_window(dataset, monkeypatch):
+    root, flat = dataset
+    monkeypatch.setattr(query_engine, "ENGINE", "")
+    engine = query_engine.make_engine(csv_path=root)
+    assert isinstance(engine, query_engine.DuckDBEngine)
+    view = engine.view()
+    # Every part but one month's is gone: a query that opened any other would fail.
+    month = partitions.discover(root)[1]
+    for name in os.listdir(engine.dir):
+        if name.endswith(".parquet") and name != f"part-{month.name}.parquet":
+            os.remove(os.path.join(engine.dir, name))
+    start, end = month.start + pd.Timedelta(days=3), (month.end - pd.Timedelta(days=3)).normalize()
+    df = data_loader.load_dataset(flat)
+    expected = query_engine.PandasView(1, df, aggregates.build_cube(df))
+    for browser in ["All", "Chrome"]:
+        assert view.kpi_counts(start, end, browser) == expected.kpi_counts(start, end, browser)
+        assert view.unique_by("browser", start, end, browser).reset_index(drop=True).equals(
+            expected.unique_by("browser", start, end, browser).reset_index(drop=True))
+
+@pytest.mark.parametrize("change", ["added", "appended"])
+def test_refresh_picks_up_partition_changes(months, tmp_path, monkeypatch, change):
+    monkeypatch.setattr(partitions, "WORKERS", 1)
+    header, by_month = months
+    root, flat = str(tmp_path / "data"), str(tmp_path / "flat.csv")
+    last = max(by_month)
+    # The last month arrives later, whole or as rows appended to its file.
+    kept = [] if change == "added" else by_month[last][:len(by_month[last]) // 2]
+    held = by_month[last][len(kept):]
+    write_partitions(root, header, {m: kept if m == last else lines for m, lines in by_month.items()
+                                    if m != last or kept})
+    store = shared_dataset.DatasetStore(root, refresh_seconds=0)
+    before = store.snapshot()
+    assert not store.refresh(force=True)
+
+    write_csv(os.path.join(root, f"event_date={last}", "part-0.csv"), header, held,
+              "wb" if change == "added" else "ab")
+    assert store.refresh(force=True)
+    version, data, cube = store.snapshot()
+    assert version > before[0]
+    write_csv(flat, header, [line for lines in by_month.values() for line in lines])
+    full = data_loader.load_dataset(flat)
+    pd.testing.assert_frame_equal(plain_rows(pd.concat(data.parts)), plain_rows(full))
+    lo, hi = aggregates.date_bounds(cube)
+    assert aggregates.kpi_counts(cube, lo, hi) == aggregates.kpi_counts(aggregates.build_cube(full), lo, hi)
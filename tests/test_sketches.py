@@ -0,0 +1,50 @@
+# Approximate unique counts stay within the sketch error of the exact ones, however they were built.
+import numpy as np
+import pytest
+
+import aggregates
+import data_loader
+
+
+@pytest.fixture(scope="module")
+def frame(generated_csv):
+    return data_loader.load_dataset(generated_csv, "chunked", ("kansas", "ks"))
+
+def sketched_cube(frame, precision=11):
+    cube = aggregates.build_cube(frame)
+    users = aggregates.users_table(cube)
+    return aggregates.assemble_cube(cube.events, users, aggregates.build_sketches(users, precision))
+
+@pytest.mark.parametrize("browser", ["All", "Chrome"])
+def test_estimates_track_exact_counts(frame, browser):
+    cube = sketched_cube(frame)
+    start, end = aggregates.date_bounds(cube)
+    exact = aggregates.unique_by(cube, "program_destination", start, end, browser, "link_click")
+    approx = aggregates.unique_by(cube, "program_destination", start, end, browser, "link_click", approximate=True)
+    merged = exact.merge(approx, on="program_destination", suffixes=("_exact", "_approx"))
+    assert len(merged) == len(exact) > 0
+    error = np.abs(merged["unique_ids_approx"] / merged["unique_ids_exact"] - 1)
+    assert (error < 4 * aggregates.hll_error(11)).all()
+
+def test_sparse_and_dense_groups_agree(frame):
+    # Precision 4 has 16 registers, so most groups are stored densely; 11 keeps them sparse.
+    users = aggregates.users_table(aggregates.build_cube(frame))
+    for precision in (4, 11):
+        sk = aggregates.build_sketches(users, precision)
+        assert 0 < len(sk.dense) if precision == 4 else len(sk.dense) < len(sk.keys)
+        dense = np.zeros((len(sk.keys), 1 << precision), dtype=np.uint8)
+        gid, bucket, rank = aggregates._to_pairs(sk)
+        dense[gid, bucket] = rank
+        groups = np.arange(len(sk.keys))
+        np.testing.assert_array_equal(aggregates.merge_registers(sk, groups, groups, len(groups)), dense)
+
+def test_merged_sketches_match_a_fresh_build(frame):
+    half = len(frame) // 2
+    head = sketched_cube(frame.iloc[:half].reset_index(drop=True))
+    merged = aggregates.merge_cube(head, frame.iloc[half:].reset_index(drop=True))
+    fresh = sketched_cube(frame)
+    start, end = aggregates.date_bounds(fresh)
+    for freq in aggregates.GRANULARITIES:
+        a = aggregates.monthly_unique(merged, start, end, approximate=True, freq=freq)
+        b = aggregates.monthly_unique(fresh, start, end, approximate=True, freq=freq)
+        assert a.reset_index(drop=True).equals(b.reset_index(drop=True))
@@ -0,0 +1,71 @@
+# A deploy-time snapshot loads the same rows and cube as the live ingest, and is never used stale.
+import os
+
+import pandas as pd
+import pytest
+
+import aggregates
+import data_loader
+import query_engine
+import shared_dataset
+import snapshot
+from conftest import plain_rows
+
+
+def assert_same_answers(view, expected):
+    lo, hi = expected.date_bounds()
+    assert view.date_bounds() == (lo, hi)
+    for browser in ["All", "Chrome"]:
+        assert view.kpi_counts(lo, hi, browser) == expected.kpi_counts(lo, hi, browser)
+        pd.testing.assert_frame_equal(view.monthly_unique(lo, hi, browser, "crossover"),
+                                      expected.monthly_unique(lo, hi, browser, "crossover"))
+        pd.testing.assert_frame_equal(view.unique_by("program_destination", lo, hi, browser, "link_click"),
+                                      expected.unique_by("program_destination", lo, hi, browser, "link_click"))
+
+def live_view(path: str, **kwargs) -> query_engine.PandasView:
+    df = data_loader.load_dataset(path, **kwargs)
+    return query_engine.PandasView(1, df, aggregates.build_cube(df))
+
+def test_snapshot_matches_the_live_load(data_csv):
+    manifest = snapshot.build(data_csv)
+    data, cube = snapshot.load(data_csv)
+    assert data.attrs["source"] == "snapshot"
+    assert manifest["rows"]["data"] == len(data) > 0
+    live = live_view(data_csv)
+    pd.testing.assert_frame_equal(plain_rows(data), plain_rows(live.data.parts[0]))
+    assert_same_answers(query_engine.PandasView(1, data, cube), live)
+
+def rewrite_head(path: str):
+    """data.csv with only its first half of rows: neither unchanged nor appended to"""
+    with open(path, "rb") as f:
+        raw = f.read()
+    with open(path, "wb") as f:
+        f.write(raw[:raw.index(b"\n", len(raw) // 2) + 1])
+
+@pytest.mark.parametrize("change", ["csv", "states", "version"])
+def test_stale_snapshot_falls_back_to_the_live_load(data_csv, monkeypatch, change):
+    snapshot.build(data_csv)
+    kwargs = {}
+    if change == "csv":
+        rewrite_head(data_csv)
+    elif change == "states":
+        kwargs["states"] = ("kansas",)
+    else:
+        monkeypatch.setattr(snapshot, "SNAPSHOT_VERSION", snapshot.SNAPSHOT_VERSION + 1)
+    assert snapshot.load(data_csv, **kwargs) is None
+    view = query_engine.PandasView(*shared_dataset.DatasetStore(data_csv, refresh_seconds=0, **kwargs).snapshot())
+    assert view.data.attrs["source"] != "snapshot"
+    assert_same_answers(view, live_view(data_csv, **kwargs))
+
+def test_moved_mtime_restamps_the_manifest(data_csv, monkeypatch):
+    snapshot.build(data_csv)
+    expected, _ = snapshot.load(data_csv)
+    # A deploy unzips an identical data.csv with a new mtime: the hash proves it unchanged once.
+    st_ = os.stat(data_csv)
+    os.utime(data_csv, ns=(st_.st_atime_ns, st_.st_mtime_ns + 10**9))
+    data, _ = snapshot.load(data_csv)
+    pd.testing.assert_frame_equal(data, expected)
+    assert snapshot.read_manifest(data_csv)["fingerprint"]["mtime_ns"] == st_.st_mtime_ns + 10**9
+    # The next cold start takes the cheap size + mtime check and hashes nothing.
+    monkeypatch.setattr(data_loader, "file_hash", lambda *a, **k: pytest.fail("data.csv hashed again"))
+    assert snapshot.load(data_csv) is not None